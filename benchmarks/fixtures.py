@@ -0,0 +1,213 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import base64
+import gzip
+import hashlib
+import json
+import os
+import stat
+import struct
+import typing
+
+RPM_KEY_ID = "24c6a8a7f4a80eb5"
+
+
+def _write(path: str, content: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def _write_executable(path: str, content: str) -> str:
+    _write(path, content)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def make_repositories(directory: str, files_count: int, repositories_per_file: int = 3) -> None:
+    """Repository files of a heavily customized server: mirrors, IP and local repositories, duplicates"""
+    for file_index in range(files_count):
+        sections = []
+        for repo_index in range(repositories_per_file):
+            repo_id = f"repo-{file_index}-{repo_index}"
+            if file_index % 97 == 0 and repo_index == 0:
+                # A few duplicated ids, the same way copies of repo files look like
+                repo_id = f"repo-{file_index - 1}-0"
+
+            if file_index % 50 == 0:
+                link = f"baseurl=http://10.0.{file_index % 256}.{repo_index + 1}/centos/$releasever/os/$basearch/"
+            elif file_index % 75 == 0:
+                link = f"baseurl=file:///var/local/repo-{file_index}/"
+            elif repo_index % 2:
+                link = f"mirrorlist=http://mirrorlist.example.com/?release=$releasever&arch=$basearch&repo={repo_id}"
+            else:
+                link = f"baseurl=http://mirror{file_index % 40}.example.com/centos/$releasever/{repo_id}/$basearch/"
+
+            sections.append(f"""[{repo_id}]
+name=Synthetic repository {repo_id}
+{link}
+enabled={1 if repo_index != 2 else 0}
+gpgcheck=1
+gpgkey=file:///etc/pki/rpm-gpg/RPM-GPG-KEY-{file_index}
+""")
+        _write(os.path.join(directory, f"synthetic-{file_index}.repo"), "\n".join(sections))
+
+
+def make_awstats_configs(directory: str, domains_count: int) -> None:
+    for index in range(domains_count):
+        domain = f"domain{index}.example.com"
+        for protocol in ("http", "https"):
+            _write(os.path.join(directory, f"awstats.{domain}-{protocol}.conf"), f"""Include "/etc/awstats/awstats.model.conf"
+SiteDomain="{domain}"
+HostAliases="www.{domain}"
+LogFile="/var/www/vhosts/system/{domain}/logs/access_{protocol}_log.processed"
+DirData="/var/www/vhosts/system/{domain}/statistics/webstat"
+""")
+
+
+def make_named_config(root: str, chroot_directory: str, includes_count: int) -> str:
+    """named.conf with the included files present both in the root and in the chroot,
+    the same way Plesk keeps them
+    """
+    includes = []
+    for index in range(includes_count):
+        path = os.path.join(root, "etc", "named-zones", f"zone{index}.conf")
+        content = f'zone "domain{index}.example.com" {{ type master; file "domain{index}.example.com"; }};\n'
+        _write(path, content)
+        _write(chroot_directory + path, content)
+        includes.append(f'include "{path}";')
+
+    named_conf = os.path.join(root, "etc", "named.conf")
+    content = "options {\n\tdirectory \"/var\";\n};\n" + "\n".join(includes) + "\n"
+    _write(named_conf, content)
+    _write(chroot_directory + named_conf, content)
+    return named_conf
+
+
+def make_perl_modules(directory: str, modules_count: int) -> typing.List[str]:
+    modules = []
+    for index in range(modules_count):
+        relative_path = os.path.join(f"Vendor{index % 100}", f"Group{index % 7}", f"Module{index}.pm")
+        _write(os.path.join(directory, relative_path), f"package Vendor{index % 100}::Group{index % 7}::Module{index};\n1;\n")
+        modules.append(relative_path)
+    return modules
+
+
+def make_provides_index(path: str, module_names: typing.Iterable[str]) -> None:
+    _write(path, "".join(f"{name}\tperl-{name.replace('::', '-')}\n" for name in sorted(module_names)))
+
+
+def make_primary_xml(path: str, packages_count: int, provides_per_package: int = 5) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<metadata xmlns="http://linux.duke.edu/metadata/common" '
+                f'xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="{packages_count}">\n')
+        for index in range(packages_count):
+            entries = "".join(f'<rpm:entry name="perl(Synthetic{index}::Part{part})"/>' for part in range(provides_per_package))
+            f.write(f"""<package type="rpm"><name>perl-Synthetic{index}</name><arch>noarch</arch>
+<version epoch="0" ver="1.0" rel="1.el8"/><summary>Synthetic package {index}</summary>
+<format><rpm:license>GPL</rpm:license><rpm:provides>{entries}<rpm:entry name="perl(:MODULE_COMPAT_5.26.3)"/></rpm:provides></format>
+</package>
+""")
+        f.write("</metadata>\n")
+
+
+def make_pes_events(path: str, entries_count: int) -> None:
+    packageinfo = []
+    for index in range(entries_count):
+        packageinfo.append({
+            "id": index,
+            "action": 1 if index % 3 else 3,
+            "architectures": ["x86_64"],
+            "initial_release": {"major_version": 7, "minor_version": 9, "os_name": "CentOS"},
+            "release": {"major_version": 8, "minor_version": 0, "os_name": "AlmaLinux"},
+            "in_packageset": {"package": [{"name": f"package{index}", "repository": "base"}], "set_id": index * 2},
+            "out_packageset": {"package": [{"name": f"package{index}", "repository": "almalinux8-appstream"},
+                                           {"name": f"package{index}-libs", "repository": "almalinux8-baseos"}],
+                               "set_id": index * 2 + 1},
+            "modulestream_maps": [],
+        })
+    _write(path, json.dumps({"packageinfo": packageinfo}, indent=4))
+
+
+def _mpi(value: bytes) -> bytes:
+    value = value.lstrip(b"\0")
+    return struct.pack(">H", len(value) * 8 - (8 - value[0].bit_length())) + value
+
+
+def make_signature_packet(key_id: str) -> bytes:
+    """Old format v4 RSA signature packet, the way rpm stores it in the RSAHEADER tag"""
+    hashed = bytes([5, 2]) + struct.pack(">I", 1704067200)
+    unhashed = bytes([9, 16]) + bytes.fromhex(key_id)
+    body = (bytes([4, 0, 1, 8]) + struct.pack(">H", len(hashed)) + hashed + struct.pack(">H", len(unhashed)) + unhashed
+            + b"\xab\xcd" + _mpi(hashlib.sha512(key_id.encode()).digest() * 4))
+    return bytes([0x89]) + struct.pack(">H", len(body)) + body
+
+
+def make_public_key(path: str) -> str:
+    """Armored v4 RSA public key, returns its key id"""
+    modulus = hashlib.sha512(b"modulus").digest() * 4
+    body = bytes([4]) + struct.pack(">I", 1704067200) + bytes([1]) + _mpi(modulus) + _mpi(b"\x01\x00\x01")
+    packet = bytes([0x99]) + struct.pack(">H", len(body)) + body
+    encoded = base64.b64encode(packet).decode()
+    lines = [encoded[index:index + 64] for index in range(0, len(encoded), 64)]
+    _write(path, "-----BEGIN PGP PUBLIC KEY BLOCK-----\n\n" + "\n".join(lines) + "\n-----END PGP PUBLIC KEY BLOCK-----\n")
+    return hashlib.sha1(packet).digest()[-8:].hex()
+
+
+def make_rpm_query_output(path: str, packages_count: int, kernel_key_id: str = RPM_KEY_ID) -> None:
+    """'rpm -qa' output with raw signature tags, the same key signs everything but kernels"""
+    signature = make_signature_packet(RPM_KEY_ID).hex()
+    kernel_signature = make_signature_packet(kernel_key_id).hex()
+    lines = []
+    for index in range(packages_count):
+        lines.append("\t".join([
+            f"package{index}", "(none)" if index % 5 else "1", f"{index % 10}.{index % 7}", f"{index % 3 + 1}.el7",
+            "x86_64" if index % 4 else "noarch", str(1024 * (index % 1000)),
+            "(none)", signature,
+        ]))
+    for index in range(3):
+        lines.append("\t".join(["kernel", "(none)", "3.10.0", f"{1160 + index}.el7", "x86_64", "67108864", "(none)", kernel_signature]))
+    _write(path, "\n".join(lines) + "\n")
+
+
+def make_check_update_output(path: str, updates_count: int) -> None:
+    lines = [""]
+    for index in range(updates_count):
+        name_arch = f"package{index}.x86_64"
+        if index % 10 == 0:
+            # Long names make yum wrap the line
+            name_arch = f"package{index}-with-a-very-long-name-to-wrap-the-line.x86_64"
+            lines.append(name_arch)
+            lines.append(f"    {index % 10}.{index % 7}-{index % 3 + 2}.el7    updates")
+            continue
+        lines.append(f"{name_arch:<40} {index % 10}.{index % 7}-{index % 3 + 2}.el7    updates")
+    lines += ["Obsoleting Packages", "package1.x86_64    2.0-1.el7    updates", "    package1-old.x86_64    1.0-1.el7    @base"]
+    _write(path, "\n".join(lines) + "\n")
+
+
+def make_feedback_files(directory: str, files_count: int, log_size: int) -> typing.List[str]:
+    paths = []
+    # Every tenth file duplicates another one, like repository files and their backups
+    unique_count = max(1, files_count - files_count // 10)
+    for index in range(files_count):
+        content = f"configuration file {index % unique_count}\n" * 20
+        paths.append(_write(os.path.join(directory, "configs", f"file{index}.conf"), content))
+
+    log_path = os.path.join(directory, "logs", "leapp-upgrade.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    line = "2024-01-01 00:00:00.000 DEBUG    PID: 1000 leapp.workflow.actor: synthetic log line of the upgrade\n"
+    with open(log_path, "w") as f:
+        for _ in range(log_size // len(line)):
+            f.write(line)
+    paths.append(log_path)
+    return paths
+
+
+def make_stub_binaries(directory: str, rpm_output: str, check_update_output: str) -> typing.Dict[str, str]:
+    """Replacements for rpm, yum and systemctl answering immediately with prepared output"""
+    return {
+        "rpm": _write_executable(os.path.join(directory, "rpm"), f"#!/bin/sh\ncat '{rpm_output}'\n"),
+        "yum": _write_executable(os.path.join(directory, "yum"), f"#!/bin/sh\ncat '{check_update_output}'\nexit 100\n"),
+        "systemctl": _write_executable(os.path.join(directory, "systemctl"), "#!/bin/sh\nexit 0\n"),
+    }
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+"""Benchmarks of pre-checks and file processing of actions on synthetic fixtures of a big server.
+
+Fixtures are generated in a temporary directory, and rpm, yum and systemctl are replaced by stubs
+answering with prepared output, so nothing on the host is touched. Every item reports the best time
+of several runs and the peak memory allocated by python code. When a baseline is stored, items
+slower or hungrier than the baseline by more than the tolerance fail the run:
+
+    PYTHONPATH=.:dist-upgrader python3 benchmarks/run.py --update-baseline
+    PYTHONPATH=.:dist-upgrader python3 benchmarks/run.py
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures  # noqa: E402
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Differences below these values are noise for any item
+TIME_SLACK = 0.05
+MEMORY_SLACK = 1024 * 1024
+
+
+class Environment:
+    """Fixtures shared by all benchmarks. Items that change files work on their own copies."""
+
+    def __init__(self, root: str, scale: float):
+        self.root = root
+
+        def count(value: int) -> int:
+            return max(1, int(value * scale))
+
+        self.repositories_directory = os.path.join(root, "etc", "yum.repos.d")
+        fixtures.make_repositories(self.repositories_directory, count(500))
+
+        self.awstats_directory = os.path.join(root, "usr", "local", "psa", "etc", "awstats")
+        fixtures.make_awstats_configs(self.awstats_directory, count(5000))
+
+        self.named_chroot = os.path.join(root, "var", "named", "chroot")
+        self.named_conf = fixtures.make_named_config(root, self.named_chroot, count(10000))
+
+        self.perl_directory = os.path.join(root, "usr", "local", "lib64", "perl5")
+        perl_modules = fixtures.make_perl_modules(self.perl_directory, count(20000))
+        self.state_dir = os.path.join(root, "state")
+        # Most of modules are known to the index, so the check succeeds without network access
+        fixtures.make_provides_index(os.path.join(self.state_dir, "centos2alma_perl_provides.tsv"),
+                                     (path[:-len(".pm")].replace(os.sep, "::") for path in perl_modules))
+        self.primary_xml = os.path.join(root, "repodata", "primary.xml.gz")
+        fixtures.make_primary_xml(self.primary_xml, count(30000))
+
+        self.pes_events = os.path.join(root, "etc", "leapp", "files", "pes-events.json")
+        fixtures.make_pes_events(self.pes_events, count(20000))
+
+        # Kernels are signed by the key from the file, the way the CentOS key is installed on the server
+        self.centos_gpg_key = os.path.join(root, "etc", "pki", "rpm-gpg", "RPM-GPG-KEY-CentOS-7")
+        self.rpm_output = os.path.join(root, "rpm-qa.txt")
+        fixtures.make_rpm_query_output(self.rpm_output, count(3000), fixtures.make_public_key(self.centos_gpg_key))
+        self.check_update_output = os.path.join(root, "check-update.txt")
+        fixtures.make_check_update_output(self.check_update_output, count(3000))
+        self.binaries = fixtures.make_stub_binaries(os.path.join(root, "bin"), self.rpm_output, self.check_update_output)
+        self.rpmdb_file = os.path.join(root, "var", "lib", "rpm", "Packages")
+        os.makedirs(os.path.dirname(self.rpmdb_file))
+        open(self.rpmdb_file, "w").close()
+
+        self.feedback_files = fixtures.make_feedback_files(os.path.join(root, "feedback"), count(2000), count(64 * 1024 * 1024))
+
+    def copy(self, path: str) -> str:
+        target = tempfile.mkdtemp(dir=self.root, prefix="copy-")
+        if os.path.isdir(path):
+            target = os.path.join(target, os.path.basename(path))
+            shutil.copytree(path, target)
+            return target
+        return shutil.copy2(path, target)
+
+
+class Benchmark:
+    name: str
+
+    def __init__(self, name: str, setup: typing.Callable[[Environment, contextlib.ExitStack], typing.Callable[[], typing.Any]]):
+        self.name = name
+        self.setup = setup
+
+
+BENCHMARKS: typing.List[Benchmark] = []
+
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup))
+        return setup
+    return register
+
+
+def _patch_repositories(env: Environment, stack: contextlib.ExitStack) -> None:
+    from centos2almaconverter.common import repositories
+    # Every run starts with a cold inventory, the same way every conversion does
+    stack.enter_context(mock.patch.dict(repositories._inventories, clear=True))
+    repositories._inventories[repositories.REPOSITORIES_DIRECTORY] = repositories.RepositoryInventory(env.repositories_directory)
+
+
+def _patch_rpm(env: Environment, stack: contextlib.ExitStack) -> None:
+    from centos2almaconverter.common import rpmdb
+    stack.enter_context(mock.patch.object(rpmdb, "RPM_BINARY", env.binaries["rpm"]))
+    stack.enter_context(mock.patch.object(rpmdb, "RPMDB_FILES", [env.rpmdb_file]))
+    stack.enter_context(mock.patch.object(rpmdb, "_snapshot", None))
+    stack.enter_context(mock.patch.dict(os.environ, {"PATH": os.path.dirname(env.binaries["rpm"]) + os.pathsep + os.environ.get("PATH", "")}))
+
+
+@benchmark("repositories inventory")
+def bench_repositories_inventory(env, stack):
+    from centos2almaconverter.common import repositories
+    return lambda: repositories.RepositoryInventory(env.repositories_directory).ids()
+
+
+def _repository_check(check_name: str):
+    def setup(env, stack):
+        from centos2almaconverter import actions
+        _patch_repositories(env, stack)
+        check = getattr(actions, check_name)()
+        return check._do_check
+    return setup
+
+
+for _check_name in [
+    "AssertLocalRepositoryNotPresent",
+    "AssertThereIsNoRepositoryDuplicates",
+    "AssertPleskRepositoriesNotNoneLink",
+    "AssertIPRepositoryNotPresent",
+    "AssertCentosEOLedRepositoriesNotPresent",
+]:
+    benchmark(f"check {_check_name}")(_repository_check(_check_name))
+
+
+@benchmark("check AssertThereIsNoUnknownPerlCpanModules")
+def bench_perl_modules_check(env, stack):
+    from centos2almaconverter import actions
+    from centos2almaconverter.actions import perl
+    from centos2almaconverter.common import perl_modules
+    stack.enter_context(mock.patch.object(perl, "CPAN_MODULES_DIRECTORY", env.perl_directory))
+    stack.enter_context(mock.patch.dict(perl_modules._manifests, clear=True))
+    return actions.AssertThereIsNoUnknownPerlCpanModules(env.state_dir)._do_check
+
+
+@benchmark("perl provides index from primary.xml")
+def bench_perl_provides_index(env, stack):
+    from centos2almaconverter.common import perl_modules
+    return lambda: perl_modules.parse_primary_provides(env.primary_xml, {})
+
+
+@benchmark("perl modules directory fingerprint")
+def bench_perl_directory_fingerprint(env, stack):
+    from centos2almaconverter.common import precheck_cache
+    return precheck_cache.DirectoryInput(env.perl_directory, recursive=True).fingerprint
+
+
+@benchmark("awstats domains listing")
+def bench_awstats_domains(env, stack):
+    from centos2almaconverter.common import awstats
+    stack.enter_context(mock.patch.object(awstats, "DOMAINS_AWSTATS_DIRECTORY", env.awstats_directory))
+    return awstats.get_awstats_domains
+
+
+@benchmark("awstats configurations recreation with stubbed webstatmng")
+def bench_awstats_recreation(env, stack):
+    from pleskdistup.common import log
+    from centos2almaconverter.common import awstats
+    stack.enter_context(mock.patch.object(awstats, "DOMAINS_AWSTATS_DIRECTORY", env.awstats_directory))
+    stack.enter_context(mock.patch.object(awstats, "recreate_domain_configuration", lambda domain: None))
+    stack.enter_context(mock.patch.object(log, "info", lambda message: None))
+    checkpoint = awstats.Checkpoint(os.path.join(tempfile.mkdtemp(dir=env.root), awstats.CHECKPOINT_FILE))
+    domains = awstats.get_awstats_domains()
+    return lambda: awstats.recreate_configurations(domains, 8, checkpoint)
+
+
+@benchmark("named.conf includes resolution")
+def bench_named_includes(env, stack):
+    from pleskdistup.common import dns
+    return lambda: list(dns.get_all_includes_from_bind_config(env.named_conf, chroot_dir=env.named_chroot))
+
+
+@benchmark("pes-events.json edit session")
+def bench_pes_events(env, stack):
+    from centos2almaconverter.common import leapp_session
+    path = env.copy(env.pes_events)
+
+    def run():
+        pes_events = leapp_session.PesEvents(path)
+        for index in range(0, 1000):
+            pes_events.set_package_repository(f"package{index}", "alma-extras")
+            pes_events.set_package_action(f"package{index + 1000}", 7)
+            pes_events.remove_package_action(f"package{index + 2000}-libs", "almalinux8-baseos")
+        pes_events.save()
+    return run
+
+
+@benchmark("rpm database snapshot with stubbed rpm")
+def bench_rpmdb(env, stack):
+    from centos2almaconverter.common import rpmdb
+    _patch_rpm(env, stack)
+    return rpmdb.load_installed_packages
+
+
+@benchmark("check AssertCentosSignedKernelInstalled")
+def bench_kernel_signature_check(env, stack):
+    from centos2almaconverter import actions
+    _patch_rpm(env, stack)
+    stack.enter_context(mock.patch.object(actions.AssertCentosSignedKernelInstalled, "CENTOS_GPG_KEY_PATH", env.centos_gpg_key))
+    check = actions.AssertCentosSignedKernelInstalled()
+
+    def run():
+        if not check._do_check():
+            raise RuntimeError("Kernel signed by the fixture key is not recognized")
+    return run
+
+
+@benchmark("outdated packages with stubbed yum")
+def bench_package_updates(env, stack):
+    from centos2almaconverter.common import metadata
+    _patch_repositories(env, stack)
+    _patch_rpm(env, stack)
+    cache = metadata.MetadataCache(env.binaries["yum"])
+    return lambda: metadata.get_package_updates(cache)
+
+
+@benchmark("feedback archive")
+def bench_feedback_archive(env, stack):
+    from centos2almaconverter.common import feedback_archive
+    archive_path = os.path.join(tempfile.mkdtemp(dir=env.root), "feedback.zip")
+    return lambda: feedback_archive.write_archive(archive_path, env.feedback_files)
+
+
+def measure(env: Environment, bench: Benchmark, repeat: int) -> typing.Dict[str, float]:
+    # Memory is measured by a separate run, tracing makes the code noticeably slower
+    with contextlib.ExitStack() as stack:
+        target = bench.setup(env, stack)
+        tracemalloc.start()
+        try:
+            target()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        with contextlib.ExitStack() as stack:
+            target = bench.setup(env, stack)
+            started_at = time.perf_counter()
+            target()
+            times.append(time.perf_counter() - started_at)
+
+    return {"time": min(times), "peak_memory": peak_memory}
+
+
+def compare(results: typing.Dict[str, typing.Dict[str, float]], baseline: typing.Dict[str, typing.Dict[str, float]],
+            tolerance: float) -> typing.List[str]:
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["time"] > expected["time"] * (1 + tolerance) + TIME_SLACK:
+            regressions.append(f"{name}: {result['time']:.3f}s against {expected['time']:.3f}s in the baseline")
+        if result["peak_memory"] > expected["peak_memory"] * (1 + tolerance) + MEMORY_SLACK:
+            regressions.append(f"{name}: {result['peak_memory'] / 1024 / 1024:.1f} MiB against "
+                               f"{expected['peak_memory'] / 1024 / 1024:.1f} MiB in the baseline")
+    return regressions
+
+
+def main(args: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of centos2alma checks and actions on synthetic fixtures of a big server.")
+    parser.add_argument("--filter", default=None, help="Run only benchmarks with the substring in the name.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs of every benchmark, the best one is reported.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for sizes of fixtures.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Path to the baseline file.")
+    parser.add_argument("--update-baseline", action="store_true", default=False, help="Store results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed relative increase of time and memory against the baseline.")
+    options = parser.parse_args(args)
+
+    benchmarks = [bench for bench in BENCHMARKS if options.filter is None or options.filter in bench.name]
+    root = tempfile.mkdtemp(prefix="centos2alma-benchmarks-")
+    try:
+        started_at = time.monotonic()
+        env = Environment(root, options.scale)
+        print(f"Fixtures generated in {time.monotonic() - started_at:.1f} seconds")
+
+        results = {}
+        errors = []
+        for bench in benchmarks:
+            try:
+                results[bench.name] = measure(env, bench, max(1, options.repeat))
+            except Exception as e:
+                errors.append(bench.name)
+                print(f"{bench.name:<70} failed: {e}")
+                continue
+            print(f"{bench.name:<70} {results[bench.name]['time']:>8.3f}s {results[bench.name]['peak_memory'] / 1024 / 1024:>8.1f} MiB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if options.update_baseline:
+        with open(options.baseline, "w") as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline stored in {options.baseline}")
+        return 1 if errors else 0
+
+    if not os.path.exists(options.baseline):
+        print(f"There is no baseline {options.baseline}, store one with --update-baseline")
+        return 1 if errors else 0
+
+    with open(options.baseline, "r") as f:
+        regressions = compare(results, json.load(f), options.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if errors or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
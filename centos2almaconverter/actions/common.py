@@ -6,12 +6,15 @@ import typing
 
 from pleskdistup.common import action, dns, files, log, motd, rpm, util
 
+from centos2almaconverter.common import awstats, deferred, scheduler, timings
+
 
 class FixNamedConfig(action.ActiveAction):
     def __init__(self):
         self.name = "fix named configuration"
         self.named_conf = "/etc/named.conf"
         self.chrooted_configuration_path = "/var/named/chroot"
+        self.resources = [scheduler.path(self.named_conf), scheduler.path(self.chrooted_configuration_path)]
 
     def _is_required(self) -> bool:
         return os.path.exists(self.named_conf) and os.path.exists(os.path.join(self.chrooted_configuration_path, self.named_conf))
@@ -59,10 +62,13 @@ class FixNamedConfig(action.ActiveAction):
 
 
 class DisableSuspiciousKernelModules(action.ActiveAction):
+    disruptive = False
+
     def __init__(self):
         self.name = "rule suspicious kernel modules"
         self.suspicious_modules = ["pata_acpi", "btrfs", "floppy"]
         self.modules_konfig_path = "/etc/modprobe.d/pataacpibl.conf"
+        self.resources = [scheduler.path(self.modules_konfig_path)]
 
     def _get_enabled_modules(self, lookup_modules: typing.List[str]) -> typing.List[str]:
         modules = []
@@ -108,6 +114,7 @@ class FixSyslogLogrotateConfig(action.ActiveAction):
         self.name = "fix logrotate config for rsyslog"
         self.config_path = "/etc/logrotate.d/syslog"
         self.path_to_backup = store_dir + "/syslog.logrotate.bak"
+        self.resources = [scheduler.path(self.config_path), scheduler.RESOURCE_MOTD]
         self.right_logrotate_config = """
 /var/log/cron
 /var/log/messages
@@ -145,19 +152,30 @@ class FixSyslogLogrotateConfig(action.ActiveAction):
 
 
 class RecreateAwstatConfigurationFiles(action.ActiveAction):
-    def __init__(self):
+    # Approximate time of one 'webstatmng --set-configs' call on a regular server
+    DOMAIN_RECREATION_TIME = 1.5
+    timing_feature = timings.FEATURE_DOMAINS
+    resources = [
+        scheduler.path(os.path.dirname(awstats.AWSTATS_MODEL_CONFIG)),
+        scheduler.path(awstats.DOMAINS_AWSTATS_DIRECTORY),
+    ]
+
+    state_dir: str
+    jobs: int
+    defer: bool
+
+    def __init__(self, state_dir: str, jobs: int = 1, defer: bool = False):
         self.name = "recreate awstat configuration files for domains"
+        self.state_dir = state_dir
+        self.jobs = jobs
+        # Deferred recreation runs by the deferred tasks queue, when Plesk is available again
+        self.defer = defer
 
     def _is_required(self) -> bool:
-        return os.path.exists("/etc/awstats/awstats.model.conf")
+        return os.path.exists(awstats.AWSTATS_MODEL_CONFIG)
 
     def get_awstat_domains(self) -> typing.Set[str]:
-        domains_awstats_directory = "/usr/local/psa/etc/awstats/"
-        domains = set()
-        for awstat_config_file in os.listdir(domains_awstats_directory):
-            if awstat_config_file.startswith("awstats.") and awstat_config_file.endswith("-http.conf"):
-                domains.add(awstat_config_file.split("awstats.")[-1].rsplit("-http.conf")[0])
-        return domains
+        return awstats.get_awstats_domains()
 
     def _prepare_action(self) -> action.ActionResult:
         return action.ActionResult()
@@ -165,19 +183,55 @@ class RecreateAwstatConfigurationFiles(action.ActiveAction):
     def _post_action(self) -> action.ActionResult:
         rpm.handle_all_rpmnew_files("/etc/awstats")
 
-        for domain in self.get_awstat_domains():
-            log.info(f"Recreating awstat configuration for domain: {domain}")
-            util.logged_check_call(
-                [
-                    "/usr/sbin/plesk", "sbin", "webstatmng", "--set-configs",
-                    "--stat-prog", "awstats", "--domain-name", domain
-                ], stdin=subprocess.DEVNULL
-            )
+        if self.defer:
+            awstats.defer_recreation(self.state_dir, self.jobs)
+            return action.ActionResult()
+
+        checkpoint = awstats.Checkpoint(os.path.join(self.state_dir, awstats.CHECKPOINT_FILE))
+        errors = awstats.recreate_configurations(self.get_awstat_domains(), self.jobs, checkpoint)
+        if errors:
+            # Successfully processed domains are kept in the checkpoint, so the next attempt continues from here
+            raise Exception("Unable to recreate awstats configuration for domains: {}".format(", ".join(sorted(errors))))
+
+        checkpoint.clear()
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_post_time(self) -> int:
+        if self.defer:
+            return 1
+        pending = len(self.get_awstat_domains()) - len(awstats.Checkpoint(os.path.join(self.state_dir, awstats.CHECKPOINT_FILE)).load())
+        return int(max(0, pending) * self.DOMAIN_RECREATION_TIME / max(1, self.jobs)) + 5
+
+
+class StartDeferredTasks(action.ActiveAction):
+    """Starts tasks deferred by other actions of the finishing stage in the background.
+    Should be executed after all actions that defer tasks, so it is placed in the first stage.
+    """
+    disruptive = False
+    script_path: str
+
+    def __init__(self, script_path: str):
+        self.name = "starting deferred tasks"
+        self.script_path = script_path
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        queue = deferred.get_queue()
+        if not queue.has_pending():
+            return action.ActionResult()
+
+        deferred.install_service(self.script_path)
+        deferred.start_in_background(self.script_path)
+        log.info(f"Deferred tasks are started in the background, use '{self.script_path} --status' to see the progress")
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
         return action.ActionResult()
 
     def estimate_post_time(self) -> int:
-        # Estimate 100 ms per configuration we have to recreate
-        return int(len(self.get_awstat_domains()) / 10) + 5
+        return 1
@@ -1,12 +1,15 @@
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
 
-import collections
 import os
 import platform
 import shutil
 import subprocess
+import time
+import typing
 
-from pleskdistup.common import action, dist, files, log, version
+from pleskdistup.common import action, dist, log, version
+
+from centos2almaconverter.common import metadata, network, precheck_cache, repositories, rpmdb
 
 
 # Todo. Action is not relevant now, because we checking the same thing of framework side
@@ -37,6 +40,8 @@ class AssertDistroIsAlmalinux8(action.CheckAction):
 
 
 class AssertNoMoreThenOneKernelNamedNIC(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput("/sys/class/net", stat=False)]
+
     def __init__(self):
         self.name = "checking if there is more than one NIC interface using kernel-name"
         self.description = """The system has one or more network interface cards (NICs) using kernel-names (ethX).
@@ -61,6 +66,7 @@ class AssertNoMoreThenOneKernelNamedNIC(action.CheckAction):
 
 # ToDo. Implement for deb-based and move to common part. Might be useful for distupgrade/other converters
 class AssertLastInstalledKernelInUse(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.RpmdbInput(), precheck_cache.CommandInput(["/usr/bin/uname", "-r"])]
     no_kernel_installed_message: str = """There is no appropriate kernel package installed.
 \tTo proceed with the conversion, install a kernel by running: 'yum install kernel kernel-tools kernel-tools-libs'
 """
@@ -78,11 +84,8 @@ class AssertLastInstalledKernelInUse(action.CheckAction):
         return version.KernelVersion(curr_kernel)
 
     def _get_last_installed_kernel_version(self) -> version.KernelVersion:
-        versions = subprocess.check_output(
-            [
-                "/usr/bin/rpm", "-q", "-a", "kernel", "kernel-plus", "kernel-rt-core"
-            ], universal_newlines=True
-        ).splitlines()
+        installed_packages = rpmdb.get_installed_packages()
+        versions = [package.nvra for name in ("kernel", "kernel-plus", "kernel-rt-core") for package in installed_packages.get(name)]
 
         if not versions:
             return None
@@ -107,6 +110,8 @@ class AssertLastInstalledKernelInUse(action.CheckAction):
 
 
 class AssertRedHatKernelInstalled(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.RpmdbInput()]
+
     def __init__(self):
         self.name = "checking if the Red Hat kernel is installed"
         self.description = """No Red Hat signed kernel is installed.
@@ -119,15 +124,13 @@ class AssertRedHatKernelInstalled(action.CheckAction):
 """
 
     def _do_check(self) -> bool:
-        redhat_kernel_packages = subprocess.check_output(
-            [
-                "/usr/bin/rpm", "-q", "-a", "kernel", "kernel-rt"
-            ], universal_newlines=True
-        ).splitlines()
-        return len(redhat_kernel_packages) > 0
+        installed_packages = rpmdb.get_installed_packages()
+        return installed_packages.is_installed("kernel") or installed_packages.is_installed("kernel-rt")
 
 
 class AssertLocalRepositoryNotPresent(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(repositories.REPOSITORIES_DIRECTORY)]
+
     def __init__(self):
         self.name = "checking if the local repository is present"
         self.description = """There are rpm repository with local storage present. Leapp does support such kind of repositories.
@@ -135,18 +138,11 @@ class AssertLocalRepositoryNotPresent(action.CheckAction):
 \t- {}
 """
 
-    def _is_repo_contains_local_storage(self, repo_file) -> bool:
-        with open(repo_file) as f:
-            repository_content = f.read()
-            return ("baseurl=file:" in repository_content or "baseurl = file:" in repository_content or
-                    "metalink=file:" in repository_content or "metalink = file:" in repository_content or
-                    "mirrorlist=file:" in repository_content or "mirrorlist = file:" in repository_content)
-
     def _do_check(self) -> bool:
         # CentOS-Media.repo is a special file which is created by default on CentOS 7. It contains a local repository
         # but leapp allows it anyway. So we could skip it.
-        local_repositories_files = [file for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["*.repo"])
-                                    if os.path.basename(file) != "CentOS-Media.repo" and self._is_repo_contains_local_storage(file)]
+        local_repositories_files = sorted(set(file for file, _ in repositories.get_inventory().by_scheme("file")
+                                              if os.path.basename(file) != "CentOS-Media.repo"))
 
         if len(local_repositories_files) == 0:
             return True
@@ -156,6 +152,8 @@ class AssertLocalRepositoryNotPresent(action.CheckAction):
 
 
 class AssertThereIsNoRepositoryDuplicates(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(repositories.REPOSITORIES_DIRECTORY)]
+
     def __init__(self):
         self.name = "checking if there are duplicate repositories"
         self.description = """There are duplicate repositories present:
@@ -165,16 +163,7 @@ class AssertThereIsNoRepositoryDuplicates(action.CheckAction):
 """
 
     def _do_check(self) -> bool:
-        repositories = []
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", ["*.repo"])
-        for repofile in repofiles:
-            with open(repofile, "r") as f:
-                for line in f.readlines():
-                    line = line.strip()
-                    if line.startswith("[") and line.endswith("]"):
-                        repositories.append(line)
-
-        duplicates = [repository for repository, count in collections.Counter(repositories).items() if count > 1]
+        duplicates = [f"[{repo_id}]" for repo_id, records in repositories.get_inventory().ids().items() if len(records) > 1]
         if len(duplicates) == 0:
             return True
 
@@ -182,15 +171,84 @@ class AssertThereIsNoRepositoryDuplicates(action.CheckAction):
         return False
 
 
+class AssertEnabledRepositoriesAvailable(action.CheckAction):
+    def __init__(self, probes_cache_path: typing.Optional[str] = None, jobs: int = 8):
+        self.name = "checking if enabled repositories are accessible"
+        self.description = """Some of the enabled repositories are not accessible:
+\t- {}
+
+\tPlease fix or disable the repositories to proceed the conversion.
+"""
+        self.probes_cache_path = probes_cache_path
+        self.jobs = jobs
+
+    def _do_check(self) -> bool:
+        repository_urls = {}
+        for repofile, repo in repositories.get_inventory().by_enabled(True):
+            urls = repositories.get_repository_probe_urls(repo)
+            if urls:
+                repository_urls[(repofile, repo.id)] = urls
+
+        client = network.HttpClient(cache_path=self.probes_cache_path, jobs=self.jobs)
+        try:
+            results = client.probe_many(url for urls in repository_urls.values() for url in urls)
+        finally:
+            client.close()
+
+        # Repository is fine if at least one of baseurl, metalink and mirrorlist is reachable, like for yum itself
+        broken = []
+        for (repofile, repo_id), urls in repository_urls.items():
+            if not any(results[url].ok for url in urls):
+                broken.append(f"[{repo_id}] from {repofile}: " + "; ".join(str(results[url]) for url in urls))
+
+        if len(broken) == 0:
+            return True
+
+        self.description = self.description.format("\n\t- ".join(broken))
+        return False
+
+
 class AssertPackagesUpToDate(action.CheckAction):
-    def __init__(self):
+    # The check cleans and downloads yum metadata, so it holds the yum lock for a while
+    exclusive: bool = True
+
+    def __init__(self, metadata_max_age: typing.Optional[int] = None):
         self.name = "checking if all packages are up to date"
         self.description = "There are packages which are not up to date. Call `yum update -y && reboot` to update the packages.\n"
+        # Metadata is downloaded again on every check, unless the maximum age in seconds is given
+        self.metadata_max_age = metadata_max_age
 
     def _do_check(self) -> bool:
-        subprocess.check_call(["/usr/bin/yum", "clean", "all"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        checker = subprocess.run(["/usr/bin/yum", "check-update"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return checker.returncode == 0
+        # Metadata is refreshed once here, so package operations made later in this phase could use the cache
+        cache = metadata.get_metadata_cache(metadata.YUM_BINARY)
+        started_at = time.monotonic()
+        try:
+            cache.warm(refresh=True, max_age=self.metadata_max_age)
+            refreshed_at = time.monotonic()
+            updates = metadata.get_package_updates(cache)
+        except subprocess.CalledProcessError as e:
+            self.description += f"\tUnable to check for package updates, '{' '.join(e.cmd)}' exited with code {e.returncode}: {(e.stderr or '').strip()}\n"
+            return False
+        except ValueError as e:
+            self.description += f"\t{e}\n"
+            return False
+        log.info(f"Metadata refresh took {refreshed_at - started_at:.2f} seconds, "
+                 f"looking for package updates took {time.monotonic() - refreshed_at:.2f} seconds")
+
+        if len(updates) == 0:
+            return True
+
+        self.description += "\tOutdated packages:\n\t- " + "\n\t- ".join(str(update) for update in updates) + "\n"
+        return False
+
+
+def huminize_size(size) -> str:
+    original = size
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{original} B"
 
 
 class AssertAvailableSpaceForLocation(action.CheckAction):
@@ -203,14 +261,6 @@ class AssertAvailableSpaceForLocation(action.CheckAction):
 \tFree up enough disk space and try again.
 """
 
-    def _huminize_size(self, size) -> str:
-        original = size
-        for unit in ("B", "KB", "MB", "GB", "TB"):
-            if size < 1024:
-                return f"{size:.2f} {unit}"
-            size /= 1024
-        return f"{original} B"
-
     def _do_check(self) -> bool:
         if not os.path.exists(self.location):
             self.description = f"The leapp required location '{self.location}' does not exist. To proceed with the conversion, create the directory."
@@ -220,7 +270,7 @@ class AssertAvailableSpaceForLocation(action.CheckAction):
         if available_space >= self.required_space:
             return True
 
-        self.description = self.description.format(self._huminize_size(self.required_space), self.location, self._huminize_size(available_space))
+        self.description = self.description.format(huminize_size(self.required_space), self.location, huminize_size(available_space))
         return False
 
 
@@ -2,15 +2,19 @@
 import os
 import shutil
 
-from pleskdistup.common import action, leapp_configs, files
+from pleskdistup.common import action, files
+
+from centos2almaconverter.common import leapp_session, repositories, scheduler
 
 
 class PrepareLeappConfigurationBackup(action.ActiveAction):
+    resources = [scheduler.RESOURCE_LEAPP_CONFIGS]
+
     def __init__(self):
         self.name = "prepare leapp configuration backup"
-        self.leapp_configs = ["/etc/leapp/files/leapp_upgrade_repositories.repo",
-                              "/etc/leapp/files/repomap.csv",
-                              "/etc/leapp/files/pes-events.json"]
+        self.leapp_configs = [leapp_session.LEAPP_REPOS_FILE_PATH,
+                              leapp_session.LEAPP_MAP_FILE_PATH,
+                              leapp_session.LEAPP_PKGS_CONF_PATH]
 
     def _prepare_action(self) -> action.ActionResult:
         for file in self.leapp_configs:
@@ -27,6 +31,8 @@ class PrepareLeappConfigurationBackup(action.ActiveAction):
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
+        # Changes that were not committed yet are only in memory, so they are just dropped
+        leapp_session.get_session().rollback()
         for file in self.leapp_configs:
             if os.path.exists(file):
                 files.restore_file_from_backup(file)
@@ -34,15 +40,40 @@ class PrepareLeappConfigurationBackup(action.ActiveAction):
         return action.ActionResult()
 
 
+class CommitLeappConfiguration(action.ActiveAction):
+    """Writes leapp configuration changes made by previous actions of the stage.
+    Should be the last action of every stage changing leapp configuration files.
+    """
+    resources = [scheduler.RESOURCE_LEAPP_CONFIGS]
+
+    def __init__(self):
+        self.name = "writing leapp configuration"
+
+    def _prepare_action(self) -> action.ActionResult:
+        leapp_session.get_session().commit()
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        leapp_session.get_session().rollback()
+        return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        return 5
+
+
 class LeapReposConfiguration(action.ActiveAction):
+    resources = [scheduler.RESOURCE_LEAPP_CONFIGS, scheduler.shared(scheduler.RESOURCE_REPOSITORIES)]
 
     def __init__(self):
         self.name = "map plesk repositories for leapp"
 
     def _prepare_action(self) -> action.ActionResult:
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*.repo", "epel.repo"])
+        repofiles = repositories.get_inventory().find_files(["plesk*.repo", "epel.repo"])
 
-        leapp_configs.add_repositories_mapping(repofiles, ignore=[
+        leapp_session.get_session().add_repositories_mapping(repofiles, ignore=[
             "PLESK_17_PHP52", "PLESK_17_PHP53", "PLESK_17_PHP54", "PLESK_17_PHP55",
         ])
         return action.ActionResult()
@@ -60,6 +91,7 @@ class LeapChoicesConfiguration(action.ActiveAction):
     def __init__(self):
         self.name = "configure leapp user choices"
         self.answer_file_path = "/var/log/leapp/answerfile.userchoices"
+        self.resources = [scheduler.path(self.answer_file_path)]
 
     def _prepare_action(self) -> action.ActionResult:
         try:
@@ -88,6 +120,7 @@ class UseSystemResolveForLeappContainer(action.ActiveAction):
         self.name = "configure leapp container to use host's /etc/resolv.conf"
         self.path_to_resolve = "/etc/resolv.conf"
         self.path_to_src = "/etc/leapp/files/resolv.conf"
+        self.resources = [scheduler.path(self.path_to_src)]
 
     def is_required(self) -> bool:
         return os.path.exists(self.path_to_resolve)
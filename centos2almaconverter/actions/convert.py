@@ -1,10 +1,13 @@
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
-from pleskdistup.common import action, leapp_configs, systemd, util
+from pleskdistup.common import action, leapp_configs, log, systemd, util
 
 import os
 import subprocess
+import threading
 import typing
 
+from centos2almaconverter.common import leapp_output, timings
+
 
 class LeappPreupgradeRisksPreventedException(Exception):
     def __init__(self, inhibitors: typing.List[str], original_exception: Exception = None):
@@ -22,26 +25,138 @@ class LeappPreupgradeRisksPreventedException(Exception):
         return f"{super().__str__()}\n{original_exception_str}The preventing factors are:\n{inhibitors_str}"
 
 
-class DoCentos2AlmaConvert(action.ActiveAction):
-    LEAPP_RESUME_SERVICE = "leapp_resume.service"
+class DoLeappPreupgrade(action.ActiveAction):
+    """Runs 'leapp preupgrade' to find inhibitors without starting the conversion.
+    Leapp only checks the system here, so it could be done while Plesk services are running.
+    """
+    LEAPP_STATE_FILE = leapp_output.STATE_FILE
+    DATABASE_POLL_INTERVAL = 5
+    timing_feature = timings.FEATURE_PACKAGES
+    disruptive = False
     leapp_ovl_size: int
+    abort_on_inhibitor: bool
+    state_dir: typing.Optional[str]
+    advisory: bool
 
-    def __init__(self, leapp_ovl_size: int = 4096):
-        self.name = "doing the conversion"
+    def __init__(self, leapp_ovl_size: int = 4096, abort_on_inhibitor: bool = False, state_dir: typing.Optional[str] = None,
+                 advisory: bool = False):
+        self.name = "checking the conversion with leapp preupgrade"
         self.leapp_ovl_size = leapp_ovl_size
-
-    def _prepare_action(self) -> action.ActionResult:
+        # Stop leapp preupgrade as soon as the first inhibitor is found, instead of waiting for all actors
+        self.abort_on_inhibitor = abort_on_inhibitor
+        self.state_dir = state_dir
+        # Inhibitors are only reported. Used when the check runs before actions that change the system
+        # the way leapp sees it, e.g. remove packages or adjust leapp configuration, so 'leapp upgrade' decides
+        self.advisory = advisory
+
+    def _leapp_env(self) -> typing.Dict[str, str]:
         env_vars = os.environ.copy()
         env_vars["LEAPP_OVL_SIZE"] = str(self.leapp_ovl_size)
+        return env_vars
+
+    def _save_state(self, status: str, parser: leapp_output.LeappOutputParser, inhibitors: typing.List[leapp_output.Inhibitor]) -> None:
+        if self.state_dir is not None:
+            leapp_output.save_state(os.path.join(self.state_dir, self.LEAPP_STATE_FILE), status, parser.phase, parser.actor, inhibitors)
+
+    def _run_preupgrade(self, env_vars: typing.Dict[str, str]) -> None:
+        parser = leapp_output.LeappOutputParser()
+        watcher = leapp_output.LeappDatabaseWatcher()
+        inhibitors: typing.List[leapp_output.Inhibitor] = []
+        lock = threading.Lock()
+        finished = threading.Event()
+        aborted = threading.Event()
+
+        process = subprocess.Popen(["/usr/bin/leapp", "preupgrade"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   universal_newlines=True, env=env_vars)
+
+        def on_inhibitors(found: typing.List[leapp_output.Inhibitor]) -> None:
+            with lock:
+                new = [inhibitor for inhibitor in found if inhibitor.title not in set(known.title for known in inhibitors)]
+                inhibitors.extend(new)
+                for inhibitor in new:
+                    log.warn(f"Leapp inhibitor found by {inhibitor.actor or 'leapp'}: {inhibitor}")
+                if new:
+                    self._save_state("running", parser, inhibitors)
+                if new and self.abort_on_inhibitor and not aborted.is_set():
+                    log.err("Stopping leapp preupgrade because of the inhibitor, as requested")
+                    aborted.set()
+                    process.terminate()
+
+        def watch_database() -> None:
+            while not finished.wait(self.DATABASE_POLL_INTERVAL):
+                on_inhibitors(watcher.poll())
+
+        watcher_thread = threading.Thread(target=watch_database, name="leapp-reports-watcher", daemon=True)
+        watcher_thread.start()
+        try:
+            for line in process.stdout:
+                log.info(line.rstrip("\n"))
+                phase, actor = parser.phase, parser.actor
+                inhibitor = parser.feed(line)
+                if inhibitor is not None:
+                    on_inhibitors([inhibitor])
+                elif (phase, actor) != (parser.phase, parser.actor):
+                    with lock:
+                        self._save_state("running", parser, inhibitors)
+            returncode = process.wait()
+        finally:
+            finished.set()
+            watcher_thread.join()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        on_inhibitors(watcher.poll())
+        with lock:
+            all_inhibitors = leapp_output.merge_inhibitors(inhibitors, leapp_output.load_report_inhibitors())
+            self._save_state("failed" if returncode != 0 or aborted.is_set() else "finished", parser, all_inhibitors)
+
+        if aborted.is_set():
+            raise LeappPreupgradeRisksPreventedException([str(inhibitor) for inhibitor in all_inhibitors])
+        if returncode != 0:
+            e = subprocess.CalledProcessError(returncode, process.args)
+            # Framework extraction is kept as a fallback for report formats we don't know
+            inhibitors_descriptions = [str(inhibitor) for inhibitor in all_inhibitors] or leapp_configs.extract_leapp_report_inhibitors()
+            if inhibitors_descriptions:
+                raise LeappPreupgradeRisksPreventedException(inhibitors_descriptions, e)
+            raise e
 
+    def _prepare_action(self) -> action.ActionResult:
         try:
-            util.log_outputs_check_call(["/usr/bin/leapp", "preupgrade"], collect_return_stdout=False, env=env_vars)
-        except subprocess.CalledProcessError as e:
-            inhibitors = leapp_configs.extract_leapp_report_inhibitors()
-            if inhibitors:
-                raise LeappPreupgradeRisksPreventedException(inhibitors, e)
-            else:
-                raise e
+            self._run_preupgrade(self._leapp_env())
+        except (LeappPreupgradeRisksPreventedException, subprocess.CalledProcessError) as e:
+            if not self.advisory:
+                raise
+            log.warn(f"Leapp preupgrade found problems, the conversion continues since they could be resolved "
+                     f"by the following actions. 'leapp upgrade' will repeat the checks. {e}")
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        return 10 * 60
+
+
+class DoCentos2AlmaConvert(DoLeappPreupgrade):
+    LEAPP_RESUME_SERVICE = "leapp_resume.service"
+    disruptive = True
+    run_preupgrade: bool
+
+    def __init__(self, leapp_ovl_size: int = 4096, abort_on_inhibitor: bool = False, state_dir: typing.Optional[str] = None,
+                 run_preupgrade: bool = True):
+        super().__init__(leapp_ovl_size, abort_on_inhibitor, state_dir)
+        self.name = "doing the conversion"
+        # Could be skipped when DoLeappPreupgrade was executed before, 'leapp upgrade' repeats the checks anyway
+        self.run_preupgrade = run_preupgrade
+
+    def _prepare_action(self) -> action.ActionResult:
+        env_vars = self._leapp_env()
+        if self.run_preupgrade:
+            self._run_preupgrade(env_vars)
 
         util.log_outputs_check_call(["/usr/bin/leapp", "upgrade"], collect_return_stdout=False, env=env_vars)
         return action.ActionResult()
@@ -61,4 +176,6 @@ class DoCentos2AlmaConvert(action.ActiveAction):
         return action.ActionResult()
 
     def estimate_prepare_time(self) -> int:
+        if not self.run_preupgrade:
+            return 15 * 60
         return 25 * 60
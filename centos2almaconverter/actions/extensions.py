@@ -1,30 +1,52 @@
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import os
+import shutil
+import typing
 
-from pleskdistup import actions as common_actions
-from pleskdistup.common import action, util, leapp_configs, files, rpm, packages, systemd
+from pleskdistup.common import action, leapp_configs, files, rpm, packages, systemd
+
+from centos2almaconverter.common import gpg_keys, leapp_session, offline_bundle, repositories, scheduler, transactions
+
+
+CLOUDLINUX_GPG_KEY_PATTERN = ".*CloudLinux.*"
+CLOUDLINUX_GPG_KEY_PATH = "/etc/leapp/files/vendors.d/rpm-gpg/RPM-GPG-KEY-CloudLinux"
 
 
 class FixupImunify(action.ActiveAction):
-    def __init__(self):
+    resources = [
+        scheduler.RESOURCE_LEAPP_CONFIGS,
+        scheduler.shared(scheduler.RESOURCE_REPOSITORIES),
+        scheduler.shared(scheduler.RESOURCE_RPMDB),
+        scheduler.path("/etc/leapp/files/vendors.d"),
+    ]
+
+    def __init__(self, gpg_keys_cache: gpg_keys.KeyCache):
         self.name = "fixing up imunify360"
+        self.gpg_keys_cache = gpg_keys_cache
 
     def _is_required(self) -> bool:
-        return len(files.find_files_case_insensitive("/etc/yum.repos.d", ["imunify*.repo"])) > 0
+        return len(repositories.get_inventory().find_files(["imunify*.repo"])) > 0
 
     def _prepare_action(self) -> action.ActionResult:
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", ["imunify*.repo"])
+        repofiles = repositories.get_inventory().find_files(["imunify*.repo"])
 
-        leapp_configs.add_repositories_mapping(repofiles)
+        session = leapp_session.get_session()
+        session.add_repositories_mapping(repofiles)
 
         if "/etc/yum.repos.d/imunify360-alt-php.repo" in repofiles:
             # The alt-php repository uses gpg key protected by password authentication,
             # so since we have no way to pass the credentials to Leapp,
             # we need to extract gpg key from rpm database and use it instead.
-            rpm.extract_gpgkey_from_rpm_database(".*CloudLinux.*", "/etc/leapp/files/vendors.d/rpm-gpg/RPM-GPG-KEY-CloudLinux")
-            files.replace_string(
-                "/etc/leapp/files/leapp_upgrade_repositories.repo",
+            key_path = self.gpg_keys_cache.fetch_local(
+                "rpmdb:" + CLOUDLINUX_GPG_KEY_PATTERN,
+                lambda target: rpm.extract_gpgkey_from_rpm_database(CLOUDLINUX_GPG_KEY_PATTERN, target),
+            )
+            os.makedirs(os.path.dirname(CLOUDLINUX_GPG_KEY_PATH), exist_ok=True)
+            shutil.copy(key_path, CLOUDLINUX_GPG_KEY_PATH)
+            session.replace_string(
+                leapp_session.LEAPP_REPOS_FILE_PATH,
                 "gpgkey=http://repo.alt.cloudlinux.com/el/alt-php/install/centos/RPM-GPG-KEY-CloudLinux",
-                "gpgkey=file:///etc/leapp/files/vendors.d/rpm-gpg/RPM-GPG-KEY-CloudLinux"
+                "gpgkey=file://" + CLOUDLINUX_GPG_KEY_PATH,
             )
 
         # libssh2 and libunwind are needed for imunify360, so we must configure actions for them.
@@ -32,12 +54,13 @@ class FixupImunify(action.ActiveAction):
         # Additionally, we must remove the actions for libssh2 from the sl repo and
         # libunwind from the appstream repo. For some reason, leapp checks all actions
         # and becomes confused by these actions.
-        leapp_configs.set_package_mapping("libssh2", "base", "libssh2", "el8-epel")
-        leapp_configs.remove_package_action("libssh2", "sl")
+        pes_events = session.pes_events()
+        pes_events.set_package_mapping("libssh2", "base", "libssh2", "el8-epel")
+        pes_events.remove_package_action("libssh2", "sl")
 
-        leapp_configs.set_package_action("libunwind", leapp_configs.LeappActionType.REPLACED)
-        leapp_configs.set_package_mapping("libunwind", "base", "libunwind", "el8-epel")
-        leapp_configs.remove_package_action("libunwind", "almalinux8-appstream")
+        pes_events.set_package_action("libunwind", leapp_configs.LeappActionType.REPLACED)
+        pes_events.set_package_mapping("libunwind", "base", "libunwind", "el8-epel")
+        pes_events.remove_package_action("libunwind", "almalinux8-appstream")
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -48,25 +71,27 @@ class FixupImunify(action.ActiveAction):
 
 
 class AdoptKolabRepositories(action.ActiveAction):
+    resources = [scheduler.RESOURCE_LEAPP_CONFIGS, scheduler.RESOURCE_REPOSITORIES, scheduler.RESOURCE_PACKAGE_TRANSACTIONS]
+
     def __init__(self):
         self.name = "adopting kolab repositories"
 
     def _is_required(self) -> bool:
-        return len(files.find_files_case_insensitive("/etc/yum.repos.d", ["kolab*.repo"])) > 0
+        return len(repositories.get_inventory().find_files(["kolab*.repo"])) > 0
 
     def _prepare_action(self) -> action.ActionResult:
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", ["kolab*.repo"])
+        repofiles = repositories.get_inventory().find_files(["kolab*.repo"])
 
-        leapp_configs.add_repositories_mapping(repofiles, ignore=["kolab-16-source",
-                                                                  "kolab-16-testing-source",
-                                                                  "kolab-16-testing-candidate-source"])
+        leapp_session.get_session().add_repositories_mapping(repofiles, ignore=["kolab-16-source",
+                                                                                "kolab-16-testing-source",
+                                                                                "kolab-16-testing-candidate-source"])
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["kolab*.repo"]):
+        for file in repositories.get_inventory().find_files(["kolab*.repo"]):
             leapp_configs.adopt_repositories(file)
 
-        util.logged_check_call(["/usr/bin/dnf", "-y", "update"])
+        transactions.get_planner().update(requester=self.name)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
@@ -76,31 +101,113 @@ class AdoptKolabRepositories(action.ActiveAction):
         return 30
 
     def estimate_post_time(self) -> int:
-        return 2 * 60
+        return 5
 
 
-class FetchKernelCareGPGKey(common_actions.FetchGPGKeyForLeapp):
-    def __init__(self):
-        self.name = "fetching KernelCare GPG key"
-        self.target_repository_files_regex = ["kernelcare*.repo"]
-        super().__init__()
+LEAPP_GPG_KEYS_DIRECTORY = "/etc/leapp/repos.d/system_upgrade/common/files/rpm-gpg/8"
+FETCH_GPG_KEYS_RESOURCES = [
+    scheduler.shared(scheduler.RESOURCE_REPOSITORIES),
+    scheduler.shared(scheduler.RESOURCE_NETWORK),
+    scheduler.path(LEAPP_GPG_KEYS_DIRECTORY),
+]
 
 
-class FetchPleskGPGKey(common_actions.FetchGPGKeyForLeapp):
-    def __init__(self):
-        self.name = "fetching Plesk GPG key"
-        self.target_repository_files_regex = ["plesk*.repo"]
-        super().__init__()
+def _get_repositories_gpg_key_urls(target_repository_files_regex: typing.List[str]) -> typing.List[str]:
+    urls: typing.List[str] = []
+    for _, repo in repositories.get_inventory().repositories(target_repository_files_regex):
+        urls += [url for url in repositories.get_repository_gpgkeys(repo) if url.startswith(("http://", "https://")) and url not in urls]
+    return urls
 
 
-class FetchImunifyGPGKey(common_actions.FetchGPGKeyForLeapp):
-    def __init__(self):
-        self.name = "fetching Imunify360 GPG key"
-        self.target_repository_files_regex = ["imunify*.repo"]
-        super().__init__()
+def _remove_placed_gpg_keys(target_keys_directory: str, urls: typing.Iterable[str]) -> None:
+    # Keys are placed by names from their URLs, so the same names are removed on revert
+    for url in urls:
+        path = os.path.join(target_keys_directory, os.path.basename(url))
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+class FetchGPGKeys(action.ActiveAction):
+    """Fetches GPG keys of repositories for leapp. Keys of all repositories are fetched at once
+    and concurrently through the local keys cache, which verifies their fingerprints.
+    """
+    target_repository_files_regex: typing.List[str]
+    resources = FETCH_GPG_KEYS_RESOURCES
+
+    def __init__(self, target_repository_files_regex: typing.List[str], cache: gpg_keys.KeyCache):
+        self.name = "fetching GPG keys of repositories"
+        self.target_repository_files_regex = target_repository_files_regex
+        self.cache = cache
+        self.target_keys_directory = LEAPP_GPG_KEYS_DIRECTORY
+
+    def _is_required(self) -> bool:
+        return len(_get_repositories_gpg_key_urls(self.target_repository_files_regex)) > 0
+
+    def _prepare_action(self) -> action.ActionResult:
+        keys = self.cache.fetch_many(_get_repositories_gpg_key_urls(self.target_repository_files_regex))
+
+        os.makedirs(self.target_keys_directory, exist_ok=True)
+        for url, path in keys.items():
+            shutil.copy(path, os.path.join(self.target_keys_directory, os.path.basename(url)))
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        _remove_placed_gpg_keys(self.target_keys_directory, _get_repositories_gpg_key_urls(self.target_repository_files_regex))
+        return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        return 5
+
+
+class FetchGPGKeysFromBundle(action.ActiveAction):
+    """Replacement for the FetchGPGKeys action, which takes keys from the offline bundle"""
+    bundle: offline_bundle.OfflineBundle
+    target_repository_files_regex: typing.List[str]
+    resources = FETCH_GPG_KEYS_RESOURCES
+
+    def __init__(self, bundle: offline_bundle.OfflineBundle, target_repository_files_regex: typing.List[str]):
+        self.name = "fetching GPG keys from the offline bundle"
+        self.bundle = bundle
+        self.target_repository_files_regex = target_repository_files_regex
+        self.target_keys_directory = LEAPP_GPG_KEYS_DIRECTORY
+
+    def _get_required_key_urls(self) -> typing.List[str]:
+        return _get_repositories_gpg_key_urls(self.target_repository_files_regex)
+
+    def _is_required(self) -> bool:
+        return len(self._get_required_key_urls()) > 0
+
+    def _prepare_action(self) -> action.ActionResult:
+        bundled_keys = self.bundle.get_gpg_keys()
+        missing = [url for url in self._get_required_key_urls() if url not in bundled_keys]
+        if missing:
+            raise offline_bundle.BundleError("GPG keys required by repositories are missing in the offline bundle: {}. "
+                                             "Please rebuild the bundle with the '--gpg-key-url' option.".format(", ".join(missing)))
+
+        os.makedirs(self.target_keys_directory, exist_ok=True)
+        for url in self._get_required_key_urls():
+            shutil.copy(bundled_keys[url], os.path.join(self.target_keys_directory, os.path.basename(url)))
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        _remove_placed_gpg_keys(self.target_keys_directory, self._get_required_key_urls())
+        return action.ActionResult()
 
 
 class AdoptSOGo(action.ActiveAction):
+    resources = [
+        scheduler.shared(scheduler.RESOURCE_RPMDB),
+        scheduler.RESOURCE_PACKAGE_TRANSACTIONS,
+        scheduler.path("/etc/sogo"),
+        scheduler.systemd_unit("sogod"),
+    ]
+
     def __init__(self):
         self.name = "adopting SOGo extension"
         self.sogo_config = "/etc/sogo/sogo.conf"
@@ -120,17 +227,21 @@ class AdoptSOGo(action.ActiveAction):
         files.change_file_ownership(self.sogo_config, "sogo", "sogo")
 
     def _post_action(self) -> action.ActionResult:
-        # This temporarily replaces systemctl with a no-op stub, allowing
-        # post-install scripts to run without disrupting the conversion service
-        # by calling the systemd daemon-reload operation.
-        with systemd.systemctl_stub():
-            packages.install_packages(["sogo", "sogo-tool"])
+        # The systemctl stub allows post-install scripts to run without disrupting
+        # the conversion service by calling the systemd daemon-reload operation.
+        transactions.get_planner().install(
+            ["sogo", "sogo-tool"],
+            requester=self.name,
+            systemctl_stub=True,
+            on_success=self._restore_configuration,
+        )
+        return action.ActionResult()
 
+    def _restore_configuration(self) -> None:
         files.restore_file_from_backup(self.sogo_config)
         self.fix_permissions()
 
         systemd.enable_services(["sogod"])
-        return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
         files.restore_file_from_backup(self.sogo_config)
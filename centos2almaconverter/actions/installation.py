@@ -1,15 +1,22 @@
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
 import os
 import shutil
+import subprocess
+import typing
 
 from pleskdistup.common import action, files, rpm, util
 
+from centos2almaconverter.common import deferred, metadata, offline_bundle, rpmdb
+
 
 class LeapInstallation(action.ActiveAction):
 
     remove_logs_on_finish: bool
+    bundle: typing.Optional[offline_bundle.OfflineBundle]
+    defer_cleanup: bool
 
-    def __init__(self, remove_logs_on_finish: bool = True):
+    def __init__(self, remove_logs_on_finish: bool = True, bundle: typing.Optional[offline_bundle.OfflineBundle] = None,
+                 defer_cleanup: bool = False):
         self.name = "installing leapp"
         self.pkgs_to_install = [
             "leapp-0.18.0-2.el7",
@@ -20,10 +27,14 @@ class LeapInstallation(action.ActiveAction):
             "leapp-upgrade-el7toel8-deps-0.21.0-5.el7",
         ]
         self.remove_logs_on_finish = remove_logs_on_finish
+        # Packages are installed from the bundle without contacting upstream repositories
+        self.bundle = bundle
+        # Leapp directories contain the whole target userspace, removing them takes a while
+        self.defer_cleanup = defer_cleanup
 
     def _remove_previous_installation(self) -> None:
         # Remove previously installed leapp packages to make sure we will install the correct version
-        pkgs_to_remove = rpm.filter_installed_packages([
+        pkgs_to_remove = rpmdb.get_installed_packages().filter_installed([
             "leapp",
             "python2-leapp",
             "leapp-data-almalinux",
@@ -32,22 +43,43 @@ class LeapInstallation(action.ActiveAction):
             "leapp-upgrade-el7toel8-deps",
         ])
         if pkgs_to_remove:
-            util.logged_check_call(["/usr/bin/yum", "remove", "-y"] + pkgs_to_remove)
+            util.logged_check_call(["/usr/bin/yum", "remove", "-y"] + metadata.get_metadata_cache(metadata.YUM_BINARY).cache_only_args() + pkgs_to_remove)
 
         # The directory contains leapp-data package configurations, which causes problems with
         # the package installation. So we have to remove it, to reinstall package from scratch.
         for system_upgrade_link in files.find_files_case_insensitive("/etc/leapp/repos.d", "system_upgrade*"):
             os.unlink(system_upgrade_link)
 
+    def _install_from_bundle(self) -> None:
+        self.bundle.verify(self.pkgs_to_install)
+        if not rpmdb.get_installed_packages().is_installed("elevate-release"):
+            util.logged_check_call(["/usr/bin/yum", "install", "-y", self.bundle.get_elevate_release_path()])
+
+        self._remove_previous_installation()
+
+        # Dependencies of leapp packages are still installed from the system repositories.
+        # The elevate repository remains disabled, so the packages will not be updated accidentally.
+        util.logged_check_call(["/usr/bin/yum-config-manager", "--disable", "elevate"])
+        cache = metadata.get_metadata_cache(metadata.YUM_BINARY)
+        util.logged_check_call(["/usr/bin/yum", "install", "-y"] + cache.cache_only_args() + self.bundle.get_package_paths())
+
     def _prepare_action(self) -> action.ActionResult:
-        if not rpm.is_package_installed("elevate-release"):
+        if self.bundle is not None:
+            self._install_from_bundle()
+            return action.ActionResult()
+
+        if not rpmdb.get_installed_packages().is_installed("elevate-release"):
             util.logged_check_call(["/usr/bin/yum", "install", "-y", "https://repo.almalinux.org/elevate/elevate-release-latest-el7.noarch.rpm"])
 
+        # The elevate repository is disabled most of the time, so it should be warmed up explicitly
+        cache = metadata.get_metadata_cache(metadata.YUM_BINARY)
+        cache.warm(enable_repositories=["elevate"])
+
         self._remove_previous_installation()
 
         util.logged_check_call(["/usr/bin/yum-config-manager", "--enable", "elevate"])
 
-        util.logged_check_call(["/usr/bin/yum", "install", "-y"] + self.pkgs_to_install)
+        util.logged_check_call(["/usr/bin/yum", "install", "-y"] + cache.cache_only_args() + self.pkgs_to_install)
         # We want to prevent the leapp packages from being updated accidentally to
         # the latest version (for example by using 'yum update -y'). Therefore, we
         # should disable the 'elevate' repository. Additionally, this will prevent
@@ -58,7 +90,7 @@ class LeapInstallation(action.ActiveAction):
 
     def _post_action(self) -> action.ActionResult:
         rpm.remove_packages(
-            rpm.filter_installed_packages(
+            rpmdb.get_installed_packages().filter_installed(
                 self.pkgs_to_install + ["elevate-release", "leapp-upgrade-el7toel8"]
             )
         )
@@ -66,10 +98,6 @@ class LeapInstallation(action.ActiveAction):
         leapp_related_files = [
             "/root/tmp_leapp_py3/leapp",
         ]
-        for file in leapp_related_files:
-            if os.path.exists(file):
-                os.unlink(file)
-
         leapp_related_directories = [
             "/etc/leapp",
             "/var/lib/leapp",
@@ -78,6 +106,14 @@ class LeapInstallation(action.ActiveAction):
         if self.remove_logs_on_finish:
             leapp_related_directories.append("/var/log/leapp")
 
+        if self.defer_cleanup:
+            deferred.get_queue().add(deferred.TASK_REMOVE_PATHS, "remove leapp files", {"paths": leapp_related_files + leapp_related_directories})
+            return action.ActionResult()
+
+        for file in leapp_related_files:
+            if os.path.exists(file):
+                os.unlink(file)
+
         for directory in leapp_related_directories:
             if os.path.exists(directory):
                 shutil.rmtree(directory)
@@ -89,3 +125,20 @@ class LeapInstallation(action.ActiveAction):
 
     def estimate_prepare_time(self) -> int:
         return 40
+
+
+class AssertOfflineBundleIsValid(action.CheckAction):
+    def __init__(self, bundle: offline_bundle.OfflineBundle):
+        self.name = "checking the offline bundle is valid"
+        self.description = """The offline bundle '{}' can't be used for the conversion:
+\t{}
+"""
+        self.bundle = bundle
+
+    def _do_check(self) -> bool:
+        try:
+            self.bundle.verify(LeapInstallation().pkgs_to_install)
+        except (offline_bundle.BundleError, OSError, subprocess.CalledProcessError) as e:
+            self.description = self.description.format(self.bundle.location, e)
+            return False
+        return True
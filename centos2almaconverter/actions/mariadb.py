@@ -1,8 +1,10 @@
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
-import subprocess
 import os
+import typing
 
-from pleskdistup.common import action, leapp_configs, files, log, mariadb, rpm, util
+from pleskdistup.common import action, leapp_configs, files, log, mariadb, motd, rpm, systemd, util
+
+from centos2almaconverter.common import leapp_session, mariadb_dump, mariadb_upgrade, network, repositories, rpmdb, timings, transactions
 
 
 MARIADB_VERSION_ON_ALMA = mariadb.MariaDBVersion("10.3.39")
@@ -10,10 +12,19 @@ KNOWN_MARIADB_REPO_FILES = [
     "mariadb.repo",
     "mariadb10.repo",
 ]
+MARIADB_VENDOR_PACKAGES = [
+    "MariaDB-client",
+    "MariaDB-client-compat",
+    "MariaDB-compat",
+    "MariaDB-common",
+    "MariaDB-server",
+    "MariaDB-server-compat",
+    "MariaDB-shared",
+]
 
 
 class AssertMariadbRepoAvailable(action.CheckAction):
-    def __init__(self):
+    def __init__(self, probes_cache_path: typing.Optional[str] = None):
         self.name = "check mariadb repo available"
         self.description = """
 The MariaDB repository with id '{}' from the file '{}' is not accessible.
@@ -21,26 +32,36 @@ The MariaDB repository with id '{}' from the file '{}' is not accessible.
 \tof the MariaDB repository by the provider. To resolve this, update MariaDB to any version from the official
 \trepository 'rpm.mariadb.org', or use the official archive repository for your current MariaDB version at 'archive.mariadb.org'.
 """
+        self.probes_cache_path = probes_cache_path
 
     def _do_check(self) -> bool:
         if not mariadb.is_mariadb_installed() or not mariadb.get_installed_mariadb_version() > MARIADB_VERSION_ON_ALMA:
             return True
 
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", KNOWN_MARIADB_REPO_FILES)
+        repofiles = repositories.get_inventory().find_files(KNOWN_MARIADB_REPO_FILES)
         if len(repofiles) == 0:
             return True
 
+        inventory = repositories.get_inventory()
+        mariadb_repositories = []
         for repofile in repofiles:
-            for repo in rpm.extract_repodata(repofile):
+            for repo in inventory.get_repositories(repofile):
                 if not repo.url or ".mariadb.org" not in repo.url:
                     continue
-
                 # Since repository will be deprecated for any distro at once it looks fine to check only for 7 on x86_64
-                repo_baseurl = repo.url.replace("$releasever", "7").replace("$basearch", "x86_64")
-                result = subprocess.run(["curl", "-s", "-o", "/dev/null", "-f", repo_baseurl])
-                if result.returncode != 0:
-                    self.description = self.description.format(repo.id, repofile)
-                    return False
+                mariadb_repositories.append((repofile, repo, repositories.expand_repository_link(repo.url)))
+
+        client = network.HttpClient(cache_path=self.probes_cache_path)
+        try:
+            results = client.probe_many(url for _, _, url in mariadb_repositories)
+        finally:
+            client.close()
+
+        for repofile, repo, url in mariadb_repositories:
+            if not results[url].ok:
+                log.debug(f"MariaDB repository {repo.id!r} is not accessible: {results[url]}")
+                self.description = self.description.format(repo.id, repofile)
+                return False
 
         return True
 
@@ -53,7 +74,7 @@ class UpdateModernMariadb(action.ActiveAction):
         return mariadb.is_mariadb_installed() and mariadb.get_installed_mariadb_version() > MARIADB_VERSION_ON_ALMA
 
     def _prepare_action(self) -> action.ActionResult:
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", KNOWN_MARIADB_REPO_FILES)
+        repofiles = repositories.get_inventory().find_files(KNOWN_MARIADB_REPO_FILES)
         if len(repofiles) == 0:
             raise Exception("Mariadb installed from unknown repository. Please check the '{}' file is present".format("/etc/yum.repos.d/mariadb.repo"))
 
@@ -62,28 +83,29 @@ class UpdateModernMariadb(action.ActiveAction):
             leapp_configs.create_leapp_vendor_repository_adoption(repofile)
 
         log.debug("Set repository mapping in the leapp configuration file")
-        leapp_configs.set_package_repository("mariadb", "alma-mariadb")
+        leapp_session.get_session().pes_events().set_package_repository("mariadb", "alma-mariadb")
 
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        repofiles = files.find_files_case_insensitive("/etc/yum.repos.d", KNOWN_MARIADB_REPO_FILES)
+        repofiles = repositories.get_inventory().find_files(KNOWN_MARIADB_REPO_FILES)
         if len(repofiles) == 0:
             return action.ActionResult()
 
         for repofile in repofiles:
             leapp_configs.adopt_repositories(repofile)
 
-        repo = [repo for repo in rpm.extract_repodata(repofiles[0])][0]
-
-        rpm.remove_packages(rpm.filter_installed_packages(["MariaDB-client",
-                                                           "MariaDB-client-compat",
-                                                           "MariaDB-compat",
-                                                           "MariaDB-common",
-                                                           "MariaDB-server",
-                                                           "MariaDB-server-compat",
-                                                           "MariaDB-shared"]))
-        rpm.install_packages(["MariaDB-client", "MariaDB-server"], repository=repo.id)
+        repo = repositories.get_inventory().get_repositories(repofiles[0])[0]
+
+        planner = transactions.get_planner()
+        planner.swap(
+            rpmdb.get_installed_packages().filter_installed(MARIADB_VENDOR_PACKAGES),
+            ["MariaDB-client", "MariaDB-server"],
+            requester=self.name,
+            repository=repo.id,
+        )
+        # The database server should be reinstalled right away, Plesk can't be started without it
+        planner.flush()
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
@@ -97,45 +119,56 @@ class UpdateModernMariadb(action.ActiveAction):
 
 
 class UpdateMariadbDatabase(action.ActiveAction):
-    def __init__(self):
+    timing_feature = timings.FEATURE_DATABASES_SIZE
+    jobs: int
+    defer_user_databases: bool
+
+    def __init__(self, jobs: int = 1, defer_user_databases: bool = False):
         self.name = "updating mariadb databases"
+        self.jobs = jobs
+        # Databases of customers are checked in the background, after Plesk is started
+        self.defer_user_databases = defer_user_databases
 
     def _is_required(self) -> bool:
         return mariadb.is_mariadb_installed() and not mariadb.get_installed_mariadb_version() > MARIADB_VERSION_ON_ALMA
 
     def _prepare_action(self) -> action.ActionResult:
-        rpm.remove_packages(rpm.filter_installed_packages(["MariaDB-client",
-                                                           "MariaDB-client-compat",
-                                                           "MariaDB-compat",
-                                                           "MariaDB-common",
-                                                           "MariaDB-server",
-                                                           "MariaDB-server-compat",
-                                                           "MariaDB-shared"]))
+        rpm.remove_packages(rpmdb.get_installed_packages().filter_installed(MARIADB_VENDOR_PACKAGES))
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
         # Leapp is not remove non-standard MariaDB-client package. But since we have updated
         # mariadb to 10.3.35 old client is not relevant anymore. So we have to switch to new client.
         # On the other hand we want to be sure AlmaLinux mariadb-server installed as well
-        for repofile in files.find_files_case_insensitive("/etc/yum.repos.d", KNOWN_MARIADB_REPO_FILES):
+        for repofile in repositories.get_inventory().find_files(KNOWN_MARIADB_REPO_FILES):
             files.backup_file(repofile)
             os.unlink(repofile)
 
-        rpm.remove_packages(rpm.filter_installed_packages(["MariaDB-client",
-                                                           "MariaDB-client-compat",
-                                                           "MariaDB-compat",
-                                                           "MariaDB-common",
-                                                           "MariaDB-server",
-                                                           "MariaDB-server-compat",
-                                                           "MariaDB-shared"]))
-        rpm.install_packages(["mariadb", "mariadb-server"])
+        planner = transactions.get_planner()
+        planner.swap(
+            rpmdb.get_installed_packages().filter_installed(MARIADB_VENDOR_PACKAGES),
+            ["mariadb", "mariadb-server"],
+            requester=self.name,
+        )
+        # The database should be upgraded right away, so we can't wait for the final commit
+        planner.flush()
 
         # We should be sure mariadb is started, otherwise restore woulden't work
         util.logged_check_call(["/usr/bin/systemctl", "start", "mariadb"])
 
-        with open('/etc/psa/.psa.shadow', 'r') as shadowfile:
-            shadowdata = shadowfile.readline().rstrip()
-            util.logged_check_call(["/usr/bin/mysql_upgrade", "-uadmin", "-p" + shadowdata])
+        mariadb_upgrade.upgrade_system_tables()
+
+        databases = mariadb_upgrade.get_user_databases()
+        if self.defer_user_databases:
+            deferred_databases = [name for name in databases if name not in mariadb_upgrade.PLESK_DATABASES]
+            databases = [name for name in databases if name in mariadb_upgrade.PLESK_DATABASES]
+            if deferred_databases:
+                mariadb_upgrade.defer_check(deferred_databases, self.jobs)
+
+        errors = mariadb_upgrade.check_databases(databases, self.jobs, mariadb_upgrade.Progress())
+        if errors:
+            # Checked databases are kept in the progress file, so the next attempt continues from here
+            raise Exception("Unable to check MariaDB databases: {}".format(", ".join(sorted(errors))))
         # Also find a way to drop cookies, because it will ruin your day
         # We have to delete it once again, because leapp going to install it in scope of conversion process,
         # but without right configs
@@ -148,7 +181,56 @@ class UpdateMariadbDatabase(action.ActiveAction):
         return 2 * 60
 
 
+RESTORE_DUMP_MSG_FMT = """MariaDB databases were dumped to {directory} before the conversion.
+	To restore them, call 'centos2alma --restore-mariadb-dump {directory}'.
+"""
+
+
+class DumpMariadbDatabases(action.ActiveAction):
+    """Dumps all databases before the MariaDB server is upgraded, so they could be restored if the upgrade breaks them"""
+    # Approximate speed of dumping and compressing databases by one worker, in megabytes per second
+    DUMP_SPEED = 20
+    SERVICE_NAME = "mariadb"
+    timing_feature = timings.FEATURE_DATABASES_SIZE
+    directory: str
+    jobs: int
+
+    def __init__(self, directory: str, jobs: int = 4):
+        self.name = "dumping mariadb databases"
+        self.directory = directory
+        self.jobs = jobs
+
+    def _is_required(self) -> bool:
+        return mariadb.is_mariadb_installed()
+
+    def _prepare_action(self) -> action.ActionResult:
+        # Plesk services, including the database server, could be stopped already
+        started = not systemd.is_service_active(self.SERVICE_NAME)
+        if started:
+            util.logged_check_call(["/usr/bin/systemctl", "start", self.SERVICE_NAME])
+        try:
+            mariadb_dump.dump_databases(self.directory, self.jobs)
+        finally:
+            if started:
+                util.logged_check_call(["/usr/bin/systemctl", "stop", self.SERVICE_NAME])
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        motd.add_finish_ssh_login_message(RESTORE_DUMP_MSG_FMT.format(directory=self.directory))
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_prepare_time(self) -> int:
+        databases_size = timings.get_host_features().get(timings.FEATURE_DATABASES_SIZE, 0)
+        return int(databases_size / (self.DUMP_SPEED * max(1, self.jobs))) + 10
+
+
 class AddMysqlConnector(action.ActiveAction):
+    # The connector is only requested here, it is installed with the rest of packages on the finishing stage
+    disruptive = False
+
     def __init__(self):
         self.name = "install mysql connector"
 
@@ -159,7 +241,7 @@ class AddMysqlConnector(action.ActiveAction):
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        subprocess.check_call(["/usr/bin/dnf", "install", "-y", "mariadb-connector-c"])
+        transactions.get_planner().install(["mariadb-connector-c"], requester=self.name)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
@@ -8,6 +8,8 @@ import re
 from pleskdistup.common import action, files, leapp_configs, log, motd, packages, plesk, rpm, systemd, util
 from pleskdistup.upgrader import PathType
 
+from centos2almaconverter.common import leapp_session, pgp, precheck_cache, repositories, rpmdb, scheduler, timings, transactions
+
 
 class RemovingPleskConflictPackages(action.ActiveAction):
 
@@ -21,7 +23,7 @@ class RemovingPleskConflictPackages(action.ActiveAction):
         ]
 
     def _prepare_action(self) -> action.ActionResult:
-        packages.remove_packages(rpm.filter_installed_packages(self.conflict_pkgs))
+        packages.remove_packages(rpmdb.get_installed_packages().filter_installed(self.conflict_pkgs))
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -48,7 +50,7 @@ class RemovePleskOutdatedPackages(action.ActiveAction):
         ]
 
     def _prepare_action(self) -> action.ActionResult:
-        packages.remove_packages(rpm.filter_installed_packages(self.outdated_pkgs))
+        packages.remove_packages(rpmdb.get_installed_packages().filter_installed(self.outdated_pkgs))
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -64,6 +66,8 @@ class RemovePleskOutdatedPackages(action.ActiveAction):
 
 
 class ReinstallPhpmyadminPleskComponents(action.ActiveAction):
+    resources = [scheduler.RESOURCE_RPMDB, scheduler.RESOURCE_PLESK_INSTALLER, scheduler.systemd_unit("sw-cp-server")]
+
     def __init__(self):
         self.name = "re-installing plesk components"
 
@@ -72,7 +76,7 @@ class ReinstallPhpmyadminPleskComponents(action.ActiveAction):
             "psa-phpmyadmin",
         ]
 
-        packages.remove_packages(rpm.filter_installed_packages(components_pkgs))
+        packages.remove_packages(rpmdb.get_installed_packages().filter_installed(components_pkgs))
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -104,6 +108,8 @@ class ReinstallPhpmyadminPleskComponents(action.ActiveAction):
 
 
 class ReinstallRoundcubePleskComponents(action.ActiveAction):
+    resources = [scheduler.RESOURCE_RPMDB, scheduler.RESOURCE_PLESK_INSTALLER, scheduler.systemd_unit("sw-cp-server")]
+
     def __init__(self):
         self.name = "re-installing roundcube plesk components"
 
@@ -111,7 +117,7 @@ class ReinstallRoundcubePleskComponents(action.ActiveAction):
         return plesk.is_component_installed("roundcube")
 
     def _prepare_action(self) -> action.ActionResult:
-        packages.remove_packages(rpm.filter_installed_packages(["plesk-roundcube"]))
+        packages.remove_packages(rpmdb.get_installed_packages().filter_installed(["plesk-roundcube"]))
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -134,12 +140,15 @@ class ReinstallRoundcubePleskComponents(action.ActiveAction):
 
 
 class ReinstallConflictPackages(action.ActiveAction):
+    timing_feature = timings.FEATURE_PACKAGES
+
     removed_packages_file: str
     conflict_pkgs_map: typing.Dict[str, str]
 
     def __init__(self, temp_directory: str):
         self.name = "re-installing common conflict packages"
         self.removed_packages_file = temp_directory + "/centos2alma_removed_packages.txt"
+        self.resources = [scheduler.RESOURCE_RPMDB, scheduler.RESOURCE_PACKAGE_TRANSACTIONS, scheduler.path(self.removed_packages_file)]
         self.conflict_pkgs_map = {
             "galera": "galera",
             "python36-argcomplete": "python3-argcomplete",
@@ -176,10 +185,10 @@ class ReinstallConflictPackages(action.ActiveAction):
         }
 
     def _is_required(self):
-        return len(rpm.filter_installed_packages(self.conflict_pkgs_map.keys())) > 0
+        return len(rpmdb.get_installed_packages().filter_installed(self.conflict_pkgs_map.keys())) > 0
 
     def _prepare_action(self) -> action.ActionResult:
-        packages_to_remove = rpm.filter_installed_packages(list(self.conflict_pkgs_map.keys()))
+        packages_to_remove = rpmdb.get_installed_packages().filter_installed(self.conflict_pkgs_map.keys())
 
         rpm.remove_packages(packages_to_remove)
 
@@ -194,10 +203,13 @@ class ReinstallConflictPackages(action.ActiveAction):
             return action.ActionResult()
 
         with open(self.removed_packages_file, "r") as f:
-            packages_to_install = [self.conflict_pkgs_map[pkg] for pkg in set(f.read().splitlines())]
-            rpm.install_packages(packages_to_install)
+            packages_to_install = [self.conflict_pkgs_map[pkg] for pkg in set(f.read().splitlines()) if pkg]
 
-        os.unlink(self.removed_packages_file)
+        transactions.get_planner().install(
+            packages_to_install,
+            requester=self.name,
+            on_success=lambda: os.unlink(self.removed_packages_file),
+        )
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
@@ -242,31 +254,31 @@ class FixEpelPythonPackageMappings(action.ActiveAction):
     def __init__(self, target_config=leapp_configs.LEAPP_EPEL_MAPPING_PATH):
         self.name = "updating EPEL package mappings for leapp"
         self.target_config = target_config
+        self.resources = [scheduler.RESOURCE_LEAPP_CONFIGS, scheduler.path(self.target_config), scheduler.shared(scheduler.RESOURCE_RPMDB)]
 
     def _is_required(self) -> bool:
         if not os.path.exists(self.target_config):
             return False
 
-        installed_packages = rpm.filter_installed_packages(['python-webtest', 'python-webob'])
+        installed_packages = rpmdb.get_installed_packages().filter_installed(['python-webtest', 'python-webob'])
         return len(installed_packages) > 0
 
     def _prepare_action(self) -> action.ActionResult:
         files.backup_file(self.target_config)
 
-        leapp_configs.set_package_mapping(
+        pes_events = leapp_session.get_session().pes_events(self.target_config)
+        pes_events.set_package_mapping(
             in_package="python-webtest",
             source_repository="epel",
             out_package="python3-webtest",
             target_repository="el8-epel",
-            leapp_pkgs_conf_path=self.target_config
         )
 
-        leapp_configs.set_package_mapping(
+        pes_events.set_package_mapping(
             in_package="python-webob",
             source_repository="base",
             out_package="python3-webob",
             target_repository="el8-epel",
-            leapp_pkgs_conf_path=self.target_config
         )
 
         return action.ActionResult()
@@ -298,6 +310,8 @@ files with the .rpmsave extension. Below is a list of the changed files:
 
 
 class AdoptRepositories(action.ActiveAction):
+    timing_feature = timings.FEATURE_PACKAGES
+
     def __init__(self):
         self.name = "adopting repositories"
 
@@ -309,7 +323,7 @@ class AdoptRepositories(action.ActiveAction):
         # For example, when epel.repo file was changed, dnf will save the new one as epel.repo.rpmnew.
         # I beleive there could be other files with the same problem, so lets iterate every .rpmnew file in /etc/yum.repos.d
         fixed_list = []
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["*.rpmnew"]):
+        for file in repositories.get_inventory().find_files(["*.rpmnew"]):
             original_file = file[:-len(".rpmnew")]
             if os.path.exists(original_file):
                 shutil.move(original_file, original_file + ".rpmsave")
@@ -321,7 +335,7 @@ class AdoptRepositories(action.ActiveAction):
             motd.add_finish_ssh_login_message(CHANGED_REPOS_MSG_FMT.format(changed_files="\n\t".join(fixed_list)))
 
     def _adopt_plesk_repositories(self):
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*.repo"]):
+        for file in repositories.get_inventory().find_files(["plesk*.repo"]):
             rpm.remove_repositories(file, [
                 lambda repo: repo.id in ["PLESK_17_PHP52", "PLESK_17_PHP53",
                                          "PLESK_17_PHP54", "PLESK_17_PHP55"],
@@ -331,14 +345,14 @@ class AdoptRepositories(action.ActiveAction):
     def _post_action(self) -> action.ActionResult:
         self._use_rpmnew_repositories()
         self._adopt_plesk_repositories()
-        util.logged_check_call(["/usr/bin/dnf", "-y", "update"])
+        transactions.get_planner().update(requester=self.name)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
         return action.ActionResult()
 
     def estimate_post_time(self):
-        return 2 * 60
+        return 5
 
 
 class AdoptRackspaceEpelRepository(action.ActiveAction):
@@ -348,7 +362,7 @@ class AdoptRackspaceEpelRepository(action.ActiveAction):
         self.name = "adopting rackspace epel repository"
 
     def _is_rackspace_epel_repo(self, repo_file: PathType) -> bool:
-        for repo in rpm.extract_repodata(repo_file):
+        for repo in repositories.get_inventory().get_repositories(repo_file):
             if repo.url and "iad.mirror.rackspace.com" in repo.url:
                 return True
         return False
@@ -368,6 +382,8 @@ class AdoptRackspaceEpelRepository(action.ActiveAction):
 
 
 class AssertPleskRepositoriesNotNoneLink(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(repositories.REPOSITORIES_DIRECTORY)]
+
     def __init__(self):
         self.name = "checking if plesk repositories are adoptable"
         self.description = """There are plesk repositories has none link. To proceed the conversion, remove following repositories:
@@ -375,11 +391,10 @@ class AssertPleskRepositoriesNotNoneLink(action.CheckAction):
 """
 
     def _do_check(self) -> bool:
-        none_link_repos = []
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*.repo"]):
-            for repo in rpm.extract_repodata(file):
-                if rpm.repository_has_none_link(repo):
-                    none_link_repos.append(f"{repo.id!r} from repofile {file!r}")
+        inventory = repositories.get_inventory()
+        plesk_repofiles = set(inventory.find_files(["plesk*.repo"]))
+        none_link_repos = [f"{repo.id!r} from repofile {file!r}" for file, repo in inventory.by_host_type(repositories.HOST_TYPE_NONE)
+                           if file in plesk_repofiles]
 
         if len(none_link_repos) == 0:
             return True
@@ -389,6 +404,8 @@ class AssertPleskRepositoriesNotNoneLink(action.CheckAction):
 
 
 class AssertIPRepositoryNotPresent(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(repositories.REPOSITORIES_DIRECTORY)]
+
     def __init__(self):
         self.name = "verify the presence of a repository sourced from an IP address"
         self.description = """There is an RPM repository from a source host with an IP address.
@@ -397,15 +414,8 @@ class AssertIPRepositoryNotPresent(action.CheckAction):
 \t- {}
 """
 
-    def _is_repo_source_ip_address(self, repo_file) -> bool:
-        for repo in rpm.extract_repodata(repo_file):
-            if rpm.repository_source_is_ip(repo):
-                return True
-        return False
-
     def _do_check(self) -> bool:
-        ip_source_repositories_files = [file for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["*.repo"])
-                                        if self._is_repo_source_ip_address(file)]
+        ip_source_repositories_files = sorted(set(file for file, _ in repositories.get_inventory().by_host_type(repositories.HOST_TYPE_IP)))
 
         if len(ip_source_repositories_files) == 0:
             return True
@@ -415,6 +425,8 @@ class AssertIPRepositoryNotPresent(action.CheckAction):
 
 
 class AssertCentosEOLedRepositoriesNotPresent(action.CheckAction):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(repositories.REPOSITORIES_DIRECTORY)]
+
     def __init__(self):
         self.name = "verify there is no EOL-ed CentOS 7 repository"
         self.description = """A deprecated CentOS 7 repository was found.
@@ -422,52 +434,43 @@ class AssertCentosEOLedRepositoriesNotPresent(action.CheckAction):
 \t- {}
 """
 
-    def _is_repository_enabled(self, repository_additional_info: typing.List[str]) -> bool:
-        for line in repository_additional_info:
-            if line.startswith("enabled="):
-                return line.split("=")[1].strip() == "1"
-        return True
-
-    def _is_repo_source_eoled(self, repo_file) -> bool:
-        for repo in rpm.extract_repodata(repo_file):
-            if not self._is_repository_enabled(repo.additional):
-                log.debug("Skip disabled repository '{}'".format(repo.id))
-                continue
-
-            if repo.mirrorlist and repo.mirrorlist.startswith("http://mirrorlist.centos.org/"):
-                log.debug("Found depricated repository '{}' with mirrorlist '{}'".format(repo.id, repo.mirrorlist))
-                return True
+    def _is_repo_source_eoled(self, repo) -> bool:
+        if repo.mirrorlist and repo.mirrorlist.startswith("http://mirrorlist.centos.org/"):
+            log.debug("Found depricated repository '{}' with mirrorlist '{}'".format(repo.id, repo.mirrorlist))
+            return True
 
-            if repo.url and repo.url.startswith("http://mirror.centos.org/centos"):
-                log.debug("Found depricated repository '{}' with baseurl '{}'".format(repo.id, repo.url))
-                return True
+        if repo.url and repo.url.startswith("http://mirror.centos.org/centos"):
+            log.debug("Found depricated repository '{}' with baseurl '{}'".format(repo.id, repo.url))
+            return True
         return False
 
     def _do_check(self) -> bool:
-        ip_source_repositories_files = [file for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["*.repo"])
-                                        if self._is_repo_source_eoled(file)]
+        # Disabled repositories are not used by leapp, so we don't care about them
+        eoled_repositories_files = sorted(set(file for file, repo in repositories.get_inventory().by_enabled(True)
+                                              if self._is_repo_source_eoled(repo)))
 
-        if len(ip_source_repositories_files) == 0:
+        if len(eoled_repositories_files) == 0:
             return True
 
-        self.description = self.description.format("\n\t- ".join(ip_source_repositories_files))
+        self.description = self.description.format("\n\t- ".join(eoled_repositories_files))
         return False
 
 
 class RemoveOldMigratorThirparty(action.ActiveAction):
+    resources = [scheduler.RESOURCE_REPOSITORIES]
+
     def __init__(self):
         self.name = "removing old migrator thirdparty packages"
 
     def _is_required(self) -> bool:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*migrator*.repo"]):
-            for repo in rpm.extract_repodata(file):
-                if repo.url and "PMM_0.1.10/thirdparty-rpm" in repo.url:
-                    return True
+        for _, repo in repositories.get_inventory().repositories(["plesk*migrator*.repo"]):
+            if repo.url and "PMM_0.1.10/thirdparty-rpm" in repo.url:
+                return True
 
         return False
 
     def _prepare_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*migrator*.repo"]):
+        for file in repositories.get_inventory().find_files(["plesk*migrator*.repo"]):
             files.backup_file(file)
 
             rpm.remove_repositories(file, [
@@ -476,17 +479,19 @@ class RemoveOldMigratorThirparty(action.ActiveAction):
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*migrator*.repo"]):
+        for file in repositories.get_inventory().find_files(["plesk*migrator*.repo"]):
             files.remove_backup(file)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", ["plesk*migrator*.repo"]):
+        for file in repositories.get_inventory().find_files(["plesk*migrator*.repo"]):
             files.restore_file_from_backup(file)
         return action.ActionResult()
 
 
 class RestoreMissingNginx(action.ActiveAction):
+    resources = [scheduler.RESOURCE_RPMDB, scheduler.RESOURCE_PLESK_INSTALLER]
+
     def __init__(self):
         self.name = "restore nginx if it was removed during the conversion"
 
@@ -512,6 +517,7 @@ class RestoreMissingNginx(action.ActiveAction):
 
 class CheckOutdatedLetsencryptExtensionRepository(action.CheckAction):
     OUTDATED_LETSENCRYPT_REPO_PATHS = ["/etc/yum.repos.d/plesk-letsencrypt.repo", "/etc/yum.repos.d/plesk-ext-letsencrypt.repo"]
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(repositories.REPOSITORIES_DIRECTORY)]
 
     def __init__(self):
         self.name = "checking if outdated repository for letsencrypt extension is used"
@@ -532,6 +538,7 @@ class CheckOutdatedLetsencryptExtensionRepository(action.CheckAction):
 
 class AdoptAtomicRepositories(action.ActiveAction):
     atomic_repository_path: str = "/etc/yum.repos.d/tortix-common.repo"
+    resources = [scheduler.RESOURCE_LEAPP_CONFIGS, scheduler.shared(scheduler.RESOURCE_REPOSITORIES)]
 
     def __init__(self):
         self.name = "adopting atomic repositories"
@@ -540,7 +547,7 @@ class AdoptAtomicRepositories(action.ActiveAction):
         return os.path.exists(self.atomic_repository_path)
 
     def _prepare_action(self) -> action.ActionResult:
-        leapp_configs.add_repositories_mapping([self.atomic_repository_path])
+        leapp_session.get_session().add_repositories_mapping([self.atomic_repository_path])
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
@@ -553,6 +560,7 @@ class AdoptAtomicRepositories(action.ActiveAction):
 
 class CheckSourcePointsToArchiveURL(action.CheckAction):
     AUTOINSTALLERRC_PATH = os.path.expanduser('~/.autoinstallerrc')
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.FileInput(AUTOINSTALLERRC_PATH)]
 
     def __init__(self):
         self.name = "checking if SOURCE points to old archive"
@@ -573,32 +581,37 @@ class CheckSourcePointsToArchiveURL(action.CheckAction):
 
 class HandleInternetxRepository(action.ActiveAction):
     KNOWN_INTERNETX_REPO_FILES = ["internetx.repo"]
+    resources = [scheduler.RESOURCE_LEAPP_CONFIGS, scheduler.RESOURCE_REPOSITORIES]
+    disruptive = False
 
     def __init__(self):
         self.name = "handling InternetX repository"
 
     def is_required(self) -> bool:
-        return len(files.find_files_case_insensitive("/etc/yum.repos.d", self.KNOWN_INTERNETX_REPO_FILES)) > 0
+        return len(repositories.get_inventory().find_files(self.KNOWN_INTERNETX_REPO_FILES)) > 0
 
     def _prepare_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", self.KNOWN_INTERNETX_REPO_FILES):
+        for file in repositories.get_inventory().find_files(self.KNOWN_INTERNETX_REPO_FILES):
             files.backup_file(file)
-            leapp_configs.add_repositories_mapping([file])
+            leapp_session.get_session().add_repositories_mapping([file])
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", self.KNOWN_INTERNETX_REPO_FILES):
+        for file in repositories.get_inventory().find_files(self.KNOWN_INTERNETX_REPO_FILES):
             files.remove_backup(file)
             leapp_configs.adopt_repositories(file)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
-        for file in files.find_files_case_insensitive("/etc/yum.repos.d", self.KNOWN_INTERNETX_REPO_FILES):
+        for file in repositories.get_inventory().find_files(self.KNOWN_INTERNETX_REPO_FILES):
             files.restore_file_from_backup(file)
         return action.ActionResult()
 
 
 class AssertCentosSignedKernelInstalled(action.CheckAction):
+    CENTOS_GPG_KEY_PATH = "/etc/pki/rpm-gpg/RPM-GPG-KEY-CentOS-7"
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.RpmdbInput(), precheck_cache.FileInput(CENTOS_GPG_KEY_PATH)]
+
     def __init__(self):
         self.name = "checking if CentOS signed kernel is installed"
         self.description = """There is no kernel packages signed by CentOS installed.
@@ -607,21 +620,13 @@ class AssertCentosSignedKernelInstalled(action.CheckAction):
 
     def _get_pgp_key_id(self, file_path: str) -> typing.Optional[str]:
         try:
-            output = subprocess.check_output(["/usr/bin/gpg", "--list-packets", file_path], universal_newlines=True)
-            for line in output.splitlines():
-                line = line.strip()
-                if line.startswith("keyid: "):
-                    return line.split(": ")[1].lower()
-        except Exception as e:
+            for key in pgp.read_public_keys(file_path):
+                if not key.is_subkey:
+                    return key.key_id
+        except (OSError, pgp.PgpError) as e:
             log.err(f"Failed to get PGP key ID from {file_path}: {e}")
         return None
 
-    def _signed_by_one_of_keys(self, package_description: str, keys: typing.Set[str]) -> bool:
-        for key_id in keys:
-            if key_id in package_description:
-                return True
-        return False
-
     def _do_check(self) -> bool:
         # You could find the same list at centos/gpg-signatures.json in leapp-repository
         # Unfortunately leapp is not installed at this moment so we have to create set of id's manually
@@ -634,27 +639,28 @@ class AssertCentosSignedKernelInstalled(action.CheckAction):
             "6c7cb6ef305d49d6"
         ])
 
-        default_key_path = "/etc/pki/rpm-gpg/RPM-GPG-KEY-CentOS-7"
-        if os.path.exists(default_key_path):
-            default_key_id = self._get_pgp_key_id(default_key_path)
+        if os.path.exists(self.CENTOS_GPG_KEY_PATH):
+            default_key_id = self._get_pgp_key_id(self.CENTOS_GPG_KEY_PATH)
             if default_key_id is not None:
                 known_pgp_keys_ids.add(default_key_id)
         try:
-            packages_with_pgpsig = subprocess.check_output(["/usr/bin/rpm", "-q", "--queryformat", "%{NAME}-%{VERSION}-%{RELEASE}.%{ARCH} %{SIGPGP:pgpsig}\n", "kernel"], universal_newlines=True)
+            kernel_packages = rpmdb.get_installed_packages().get("kernel")
         except subprocess.CalledProcessError as e:
             log.err(f"Failed to get kernel package information: {e}")
             # The reason likely is not the same as described in the pre-checker description
             # So if we will show the message to user, they will be confused. So we just skip the pre-check
             return True
 
-        if packages_with_pgpsig.startswith("package kernel is not installed"):
+        if not kernel_packages:
             # This means that kernel package is not installed. It is generally expected that a kernel package is present.
             # And this action designed to check a little other problem, so description message can be misleading.
             # So it's better to use another action to catch such kind of problem. Currently we use AssertRedHatKernelInstalled
             log.warn(f"Kernel package is not installed. Skipping the {self.__class__.__name__} precheck.")
             return True
 
-        return any(self._signed_by_one_of_keys(pkg, known_pgp_keys_ids) for pkg in packages_with_pgpsig.splitlines() if pkg)
+        for package in kernel_packages:
+            log.debug(f"Package {package.nvra} is signed with the key {package.key_id}")
+        return any(package.key_id in known_pgp_keys_ids for package in kernel_packages)
 
 
 class DisablePleskTechMirrorRepositories(action.ActiveAction):
@@ -674,7 +680,7 @@ class DisablePleskTechMirrorRepositories(action.ActiveAction):
         if not os.path.exists(self.base_repo_path):
             return False
 
-        for repo in rpm.extract_repodata(self.base_repo_path):
+        for repo in repositories.get_inventory().get_repositories(self.base_repo_path):
             if repo.id in ["base", "updates", "extras"] and repo.url:
                 if any(url in repo.url for url in self.urls_should_be_disabled):
                     return True
@@ -713,11 +719,10 @@ class HandleCentosExtrasRepositoriesFromExtensions(action.ActiveAction):
 
     def is_required(self) -> bool:
         """Required only when there are any *-extras.repo files with [extras] repository"""
-        extras_files = files.find_files_case_insensitive("/etc/yum.repos.d", ["*-extras.repo"])
-
-        for repo_file in extras_files:
+        inventory = repositories.get_inventory()
+        for repo_file in inventory.find_files(["*-extras.repo"]):
             try:
-                for repo in rpm.extract_repodata(repo_file):
+                for repo in inventory.get_repositories(repo_file):
                     if repo.id == "extras":
                         return True
             except (FileNotFoundError, ValueError):
@@ -729,9 +734,10 @@ class HandleCentosExtrasRepositoriesFromExtensions(action.ActiveAction):
         return action.ActionResult()
 
     def _post_action(self) -> action.ActionResult:
-        for repo_file in files.find_files_case_insensitive("/etc/yum.repos.d", ["*-extras.repo"]):
+        inventory = repositories.get_inventory()
+        for repo_file in inventory.find_files(["*-extras.repo"]):
             try:
-                repos_in_file = list(rpm.extract_repodata(repo_file))
+                repos_in_file = list(inventory.get_repositories(repo_file))
 
                 files.backup_file(repo_file)
                 if len(repos_in_file) == 1 and repos_in_file[0].id == "extras":
@@ -757,3 +763,27 @@ class HandleCentosExtrasRepositoriesFromExtensions(action.ActiveAction):
 
     def estimate_post_time(self):
         return 10
+
+
+class CommitPackageTransactions(action.ActiveAction):
+    """Execute package operations requested by other actions on the finishing stage.
+    Operations are coalesced into the fewest possible transactions, and the system is updated only once at the end.
+    The action should be placed to be executed after all actions that request package operations.
+    """
+    resources = [scheduler.RESOURCE_RPMDB, scheduler.RESOURCE_PACKAGE_TRANSACTIONS]
+
+    def __init__(self):
+        self.name = "committing package transactions"
+
+    def _prepare_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def _post_action(self) -> action.ActionResult:
+        transactions.get_planner().commit()
+        return action.ActionResult()
+
+    def _revert_action(self) -> action.ActionResult:
+        return action.ActionResult()
+
+    def estimate_post_time(self):
+        return 3 * 60
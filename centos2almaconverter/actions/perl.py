@@ -1,8 +1,11 @@
 # Copyright 1999-2025. Plesk International GmbH. All rights reserved.
 import os
 import shutil
+import typing
 
-from pleskdistup.common import action, files, log, motd, plesk, rpm
+from pleskdistup.common import action, files, log, motd, plesk
+
+from centos2almaconverter.common import deferred, perl_modules, precheck_cache, scheduler, transactions
 
 CPAN_MODULES_DIRECTORY = "/usr/local/lib64/perl5"
 CPAN_MODULES_RPM_MAPPING = {
@@ -43,8 +46,11 @@ CPAN_MODULES_RPM_MAPPING = {
 
 
 class AssertThereIsNoUnknownPerlCpanModules(action.CheckAction):
-    def __init__(self):
+    inputs: typing.List[precheck_cache.CheckInput] = [precheck_cache.DirectoryInput(CPAN_MODULES_DIRECTORY, recursive=True)]
+
+    def __init__(self, state_dir: typing.Optional[str] = None):
         self.name = "checking if there are no unknown perl cpan modules"
+        self.state_dir = state_dir
         self.description = """There are Perl modules installed by CPAN without known RPM package analogues are found.
 \tPlease remove following modules manually from "{directory}" and reinstall them after the conversion:
 \t- {modules_list}
@@ -60,12 +66,12 @@ class AssertThereIsNoUnknownPerlCpanModules(action.CheckAction):
         if not os.path.exists(CPAN_MODULES_DIRECTORY):
             return True
 
-        unknown_modules = []
-        for module in files.find_files_case_insensitive(CPAN_MODULES_DIRECTORY, ["*.pm"], recursive=True):
-            module = os.path.relpath(module, CPAN_MODULES_DIRECTORY)
-            if module not in CPAN_MODULES_RPM_MAPPING.keys():
-                unknown_modules.append(module)
+        manifest = perl_modules.get_resolved_manifest(CPAN_MODULES_DIRECTORY, CPAN_MODULES_RPM_MAPPING, self.state_dir)
+        for module in manifest.modules:
+            if module.source == "index":
+                log.debug(f"Perl module {module.path!r} will be replaced by package {module.package!r} from AlmaLinux 8 repositories")
 
+        unknown_modules = [module.path for module in manifest.unknown]
         if not unknown_modules:
             return True
 
@@ -74,18 +80,29 @@ class AssertThereIsNoUnknownPerlCpanModules(action.CheckAction):
 
 
 class ReinstallPerlCpanModules(action.ActiveAction):
-    def __init__(self, store_dir: str):
+    def __init__(self, store_dir: str, defer_cleanup: bool = False):
         self.name = "reinstalling perl cpan modules"
+        self.store_dir = store_dir
+        self.defer_cleanup = defer_cleanup
         self.removed_modules_file = os.path.join(store_dir, "centos2alma_removed_perl_modules.txt")
+        # The provides index could be downloaded while resolving modules into packages
+        self.resources = [
+            scheduler.path(CPAN_MODULES_DIRECTORY),
+            scheduler.path(self.removed_modules_file),
+            scheduler.RESOURCE_PACKAGE_TRANSACTIONS,
+            scheduler.RESOURCE_MOTD,
+            scheduler.shared(scheduler.RESOURCE_RPMDB),
+            scheduler.shared(scheduler.RESOURCE_NETWORK),
+        ]
 
     def _is_required(self):
         return not files.is_directory_empty(CPAN_MODULES_DIRECTORY)
 
     def _prepare_action(self) -> action.ActionResult:
+        manifest = perl_modules.get_resolved_manifest(CPAN_MODULES_DIRECTORY, CPAN_MODULES_RPM_MAPPING, self.store_dir)
         with open(self.removed_modules_file, "w") as f:
-            for module in files.find_files_case_insensitive(CPAN_MODULES_DIRECTORY, ["*.pm"], recursive=True):
-                if module in CPAN_MODULES_RPM_MAPPING.keys():
-                    f.write(CPAN_MODULES_RPM_MAPPING[module] + "\n")
+            for package in manifest.packages:
+                f.write(package + "\n")
 
         # Yeah it's preatty rude to remove all isntalled modules,
         # but cpan don't have an option to remove one module for some reason.
@@ -102,12 +119,17 @@ class ReinstallPerlCpanModules(action.ActiveAction):
             return action.ActionResult()
 
         with open(self.removed_modules_file, "r") as f:
-            packages_to_install = f.read().splitlines()
-            rpm.install_packages(packages_to_install)
+            packages_to_install = [pkg for pkg in f.read().splitlines() if pkg]
 
+        transactions.get_planner().install(packages_to_install, requester=self.name, on_success=self._remove_backup)
+        return action.ActionResult()
+
+    def _remove_backup(self) -> None:
         os.unlink(self.removed_modules_file)
+        if self.defer_cleanup:
+            deferred.get_queue().add(deferred.TASK_REMOVE_PATHS, "remove backup of perl cpan modules", {"paths": [CPAN_MODULES_DIRECTORY + ".backup"]})
+            return
         shutil.rmtree(CPAN_MODULES_DIRECTORY + ".backup")
-        return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
         if os.path.exists(CPAN_MODULES_DIRECTORY + ".backup"):
@@ -5,10 +5,14 @@ import shutil
 
 from pleskdistup.common import action, systemd
 
+from centos2almaconverter.common import scheduler
+
 OS_VENDOR_PHP_FPM_CONFIG = "/etc/php-fpm.d/www.conf"
 
 
 class FixOsVendorPhpFpmConfiguration(action.ActiveAction):
+    resources = [scheduler.path(OS_VENDOR_PHP_FPM_CONFIG), scheduler.systemd_unit("php-fpm")]
+
     def __init__(self):
         self.name = "fix OS vendor PHP configuration"
 
@@ -1,9 +1,14 @@
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import functools
 import locale
 import os
 import subprocess
 
-from pleskdistup.common import action, files, leapp_configs, log, postgres, systemd, util
+from pleskdistup.common import action, files, log, postgres, systemd, util
+
+from centos2almaconverter.common import leapp_session, pg_upgrade, scheduler, timings, transactions
+
+from .common_checks import huminize_size
 
 _ALMA8_POSTGRES_VERSION = 10
 
@@ -20,6 +25,9 @@ class AssertOutdatedPostgresNotInstalled(action.CheckAction):
 
 
 class AssertPostgresLocaleMatchesSystemOne(action.CheckAction):
+    # The check restarts postgresql service, so it should not be executed simultaneously with other checks
+    exclusive: bool = True
+
     def __init__(self):
         self.name = "checking if system locale is safe for Postgres databases upgrade"
         self.description = """Postgres database upgrade expects system locale to match the one databases were created with.
@@ -65,11 +73,48 @@ class AssertPostgresLocaleMatchesSystemOne(action.CheckAction):
             util.logged_check_call(['systemctl', 'reload-or-try-restart', self.service_name])
 
 
+class AssertSpaceForPostgresUpgrade(action.CheckAction):
+    def __init__(self, mode: str = pg_upgrade.MODE_AUTO):
+        self.name = "checking available space for postgres databases upgrade"
+        self.mode = mode
+        self.description = """There is insufficient disk space available to upgrade Postgres databases in the {mode} mode.
+\tThe upgrade requires a minimum of {required} of free space on the disk where the '{location}' directory is located. Available space: {available}.
+\tFree up enough disk space and try again.
+"""
+
+    def _do_check(self) -> bool:
+        if not postgres.is_postgres_installed() or not postgres.is_database_initialized() or not postgres.is_database_major_version_lower(_ALMA8_POSTGRES_VERSION):
+            return True
+
+        data_path = postgres.get_data_path()
+        if self.mode == pg_upgrade.MODE_LINK and not pg_upgrade.supports_hard_links(data_path):
+            self.description = f"""Postgres databases upgrade in the link mode requires hard links support for the '{data_path}' directory.
+\tUse the '--postgres-upgrade-mode copy' option to copy databases instead.
+"""
+            return False
+
+        mode = pg_upgrade.choose_mode(data_path, self.mode)
+        required_space = pg_upgrade.get_required_space(data_path, mode)
+        available_space = pg_upgrade.get_available_space(data_path)
+        log.debug(f"Postgres databases upgrade in the {mode} mode requires {required_space} bytes, available {available_space} bytes")
+        if available_space >= required_space:
+            return True
+
+        self.description = self.description.format(mode=mode, required=huminize_size(required_space),
+                                                   location=data_path, available=huminize_size(available_space))
+        return False
+
+
 class PostgresDatabasesUpdate(action.ActiveAction):
+    timing_feature = timings.FEATURE_DATABASES_SIZE
+    resources = [scheduler.RESOURCE_RPMDB, scheduler.systemd_unit("postgresql"), scheduler.path("/var/lib/pgsql")]
 
-    def __init__(self):
+    def __init__(self, mode: str = pg_upgrade.MODE_AUTO, jobs: int = 4):
         self.name = "updating postgres databases"
         self.service_name = 'postgresql'
+        # Link mode is used when the filesystem allows it, because it does not copy relation files
+        self.mode = mode
+        self.jobs = jobs
 
     def _is_required(self):
         return postgres.is_postgres_installed() and postgres.is_database_initialized() and postgres.is_database_major_version_lower(_ALMA8_POSTGRES_VERSION)
@@ -82,7 +127,8 @@ class PostgresDatabasesUpdate(action.ActiveAction):
     def _upgrade_database(self):
         util.logged_check_call(['dnf', 'install', '-y', 'postgresql-upgrade'])
 
-        util.logged_check_call(['postgresql-setup', '--upgrade'])
+        data_path = postgres.get_data_path()
+        pg_upgrade.upgrade_cluster(data_path, pg_upgrade.choose_mode(data_path, self.mode), self.jobs)
 
         old_config_path = os.path.join(postgres.get_saved_data_path(), 'pg_hba.conf')
         new_config_path = os.path.join(postgres.get_data_path(), 'pg_hba.conf')
@@ -116,6 +162,13 @@ class PostgresReinstallModernPackage(action.ActiveAction):
     # Leapp is going to remove postgresql package from the system during conversion process.
     # So during this action we shouldn't use any postgresql related commands. Luckily data will not be removed
     # and we can use them to recognize versions of postgresql we should install.
+    resources = [
+        scheduler.RESOURCE_LEAPP_CONFIGS,
+        scheduler.RESOURCE_PACKAGE_TRANSACTIONS,
+        scheduler.systemd_unit("postgresql"),
+        scheduler.path("/var/lib/pgsql"),
+    ]
+
     def __init__(self):
         self.name = "reinstall modern postgresql"
 
@@ -130,7 +183,7 @@ class PostgresReinstallModernPackage(action.ActiveAction):
         return res.returncode == 0
 
     def _prepare_action(self) -> action.ActionResult:
-        leapp_configs.add_repositories_mapping(["/etc/yum.repos.d/pgdg-redhat-all.repo"], skip_disabled=True)
+        leapp_session.get_session().add_repositories_mapping(["/etc/yum.repos.d/pgdg-redhat-all.repo"], skip_disabled=True)
 
         for major_version in self._get_versions():
             service_name = 'postgresql-' + str(major_version)
@@ -142,23 +195,26 @@ class PostgresReinstallModernPackage(action.ActiveAction):
 
         return action.ActionResult()
 
+    def _start_service(self, major_version: int) -> None:
+        if os.path.exists(os.path.join(postgres.get_pgsql_root_path(), str(major_version) + '.enabled')):
+            service_name = 'postgresql-' + str(major_version)
+            util.logged_check_call(['/usr/bin/systemctl', 'enable', service_name])
+            util.logged_check_call(['/usr/bin/systemctl', 'start', service_name])
+            os.remove(os.path.join(postgres.get_pgsql_root_path(), str(major_version) + '.enabled'))
+
     def _post_action(self) -> action.ActionResult:
+        planner = transactions.get_planner()
         for major_version in self._get_versions():
+            on_success = functools.partial(self._start_service, major_version)
             if major_version > _ALMA8_POSTGRES_VERSION:
-                util.logged_check_call(['/usr/bin/dnf', '-q', '-y', 'module', 'disable', 'postgresql'])
-                util.logged_check_call(['/usr/bin/dnf', '-y', 'update'])
-                util.logged_check_call(['/usr/bin/dnf', 'install', '-y', 'postgresql' + str(major_version), 'postgresql' + str(major_version) + '-server'])
+                planner.module_disable(['postgresql'], requester=self.name)
+                planner.install(['postgresql' + str(major_version), 'postgresql' + str(major_version) + '-server'],
+                                requester=self.name, on_success=on_success)
             else:
-                util.logged_check_call(['/usr/bin/dnf', '-q', '-y', 'module', 'enable', 'postgresql'])
-                util.logged_check_call(['/usr/bin/dnf', '-y', 'update'])
-                util.logged_check_call(['/usr/bin/dnf', 'install', '-y', 'postgresql', 'postgresql' + '-server'])
-
-            if os.path.exists(os.path.join(postgres.get_pgsql_root_path(), str(major_version) + '.enabled')):
-                service_name = 'postgresql-' + str(major_version)
-                util.logged_check_call(['/usr/bin/systemctl', 'enable', service_name])
-                util.logged_check_call(['/usr/bin/systemctl', 'start', service_name])
-                os.remove(os.path.join(postgres.get_pgsql_root_path(), str(major_version) + '.enabled'))
+                planner.module_enable(['postgresql'], requester=self.name)
+                planner.install(['postgresql', 'postgresql' + '-server'], requester=self.name, on_success=on_success)
 
+        planner.update(requester=self.name)
         return action.ActionResult()
 
     def _revert_action(self) -> action.ActionResult:
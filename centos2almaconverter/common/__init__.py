@@ -0,0 +1 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
@@ -0,0 +1,137 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import argparse
+import os
+import subprocess
+import threading
+import time
+import typing
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import deferred, workers
+
+AWSTATS_MODEL_CONFIG = "/etc/awstats/awstats.model.conf"
+DOMAINS_AWSTATS_DIRECTORY = "/usr/local/psa/etc/awstats/"
+CHECKPOINT_FILE = "centos2alma_awstats_done.txt"
+DEFERRED_TASK = "recreate-awstats-configs"
+
+
+def get_awstats_domains() -> typing.Set[str]:
+    domains = set()
+    for awstat_config_file in os.listdir(DOMAINS_AWSTATS_DIRECTORY):
+        if awstat_config_file.startswith("awstats.") and awstat_config_file.endswith("-http.conf"):
+            domains.add(awstat_config_file.split("awstats.")[-1].rsplit("-http.conf")[0])
+    return domains
+
+
+class Checkpoint:
+    """Domains with already recreated configuration, one per line. The file is only appended,
+    so a crash in the middle loses at most the domain being written.
+    """
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> typing.Set[str]:
+        try:
+            with open(self.path, "r") as f:
+                return set(line.strip() for line in f if line.endswith("\n") and line.strip())
+        except FileNotFoundError:
+            return set()
+
+    def mark_done(self, domain: str) -> None:
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(domain + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def recreate_domain_configuration(domain: str) -> None:
+    result = subprocess.run(
+        [
+            "/usr/sbin/plesk", "sbin", "webstatmng", "--set-configs",
+            "--stat-prog", "awstats", "--domain-name", domain
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
+    )
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout)
+
+
+def recreate_configurations(domains: typing.Iterable[str], jobs: int, checkpoint: Checkpoint) -> typing.Dict[str, Exception]:
+    """Recreate awstats configuration of the domains by a pool of workers, skipping domains
+    done by previous runs. Returns errors by domain names, the rest of domains are processed anyway.
+    """
+    done = checkpoint.load()
+    pending = sorted(set(domains) - done)
+    log.info(f"Recreating awstats configuration for {len(pending)} domains in {jobs} threads, "
+             f"{len(done)} domains were processed already")
+
+    started_at = time.monotonic()
+    finished = 0
+    lock = threading.Lock()
+
+    def recreate(domain: str) -> None:
+        nonlocal finished
+        recreate_domain_configuration(domain)
+        checkpoint.mark_done(domain)
+        with lock:
+            finished += 1
+            if finished % 100 == 0:
+                log.info(f"Recreated awstats configuration for {finished} of {len(pending)} domains")
+
+    results = workers.run_concurrently(((domain, lambda domain=domain: recreate(domain)) for domain in pending),
+                                       max(1, jobs), name="awstats")
+    errors = {job.name: job.exception for job in results if job.exception is not None}
+    for domain, error in errors.items():
+        log.err(f"Unable to recreate awstats configuration for domain {domain}: {error}")
+
+    log.info(f"Awstats configuration recreated for {len(pending) - len(errors)} domains in {time.monotonic() - started_at:.2f} seconds")
+    return errors
+
+
+def recreate_all_configurations(state_dir: str, jobs: int) -> typing.Dict[str, Exception]:
+    if not os.path.exists(AWSTATS_MODEL_CONFIG):
+        return {}
+
+    # The state directory could be removed already at the end of the conversion
+    os.makedirs(state_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(state_dir, CHECKPOINT_FILE))
+    errors = recreate_configurations(get_awstats_domains(), jobs, checkpoint)
+    if not errors:
+        checkpoint.clear()
+    return errors
+
+
+def defer_recreation(state_dir: str, jobs: int) -> None:
+    """Recreate configurations by the deferred tasks queue, when Plesk services are running again"""
+    deferred.get_queue().add(DEFERRED_TASK, "recreate awstats configuration files for domains", {"state_dir": state_dir, "jobs": jobs})
+
+
+def _run_deferred_task(params: typing.Dict[str, typing.Any]) -> None:
+    errors = recreate_all_configurations(params["state_dir"], params["jobs"])
+    if errors:
+        raise Exception("Unable to recreate awstats configuration for domains: {}".format(", ".join(sorted(errors))))
+
+
+deferred.register_handler(DEFERRED_TASK, _run_deferred_task)
+
+
+def main(args: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="centos2alma --recreate-awstats-configs",
+                                     description="Recreate awstats configuration files of domains after the conversion.")
+    parser.add_argument("--state-dir", required=True, help="State directory of the conversion to keep the progress in.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of domains processed simultaneously.")
+    options = parser.parse_args(args)
+
+    errors = recreate_all_configurations(options.state_dir, options.jobs)
+    if errors:
+        print(f"Unable to recreate awstats configuration for domains: {', '.join(sorted(errors))}")
+        return 1
+    return 0
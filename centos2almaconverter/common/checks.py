@@ -0,0 +1,171 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import threading
+import typing
+
+from pleskdistup.common import action, log
+
+from centos2almaconverter.common import workers
+
+
+TIMED_OUT_CHECK_DESCRIPTION = """The check did not finish in {deadline} seconds.
+\tThis usually means that the check waits for a hung process or an unavailable network resource.
+\tCall the check again later or increase the deadline with the --precheck-timeout option.
+"""
+
+NOT_STARTED_CHECK_DESCRIPTION = """The check was not started, because all the threads are held by checks that did not finish
+\tin {deadline} seconds: {checks}.
+\tCall the check again later, increase the deadline with the --precheck-timeout option
+\tor the number of simultaneous checks with the --precheck-jobs option.
+"""
+
+SKIPPED_CHECK_DESCRIPTION = """The check was skipped, because it can't be executed simultaneously with other checks,
+\tand the following checks are still running: {checks}.
+\tCall the check again later or increase the deadline with the --precheck-timeout option.
+"""
+
+
+def is_exclusive(check: action.CheckAction) -> bool:
+    # Checks that change the system state (e.g. restart services) or hold the package manager lock
+    # set the 'exclusive' attribute, so they are never executed simultaneously with any other check
+    return getattr(check, "exclusive", False)
+
+
+class ConcurrentCheck(action.CheckAction):
+    """Proxy for a check executed by ConcurrentCheckExecutor.
+    The framework still calls checks one by one, but the proxy only waits for the result
+    calculated in the background.
+    """
+
+    def __init__(self, executor: "ConcurrentCheckExecutor", check: action.CheckAction):
+        self._executor = executor
+        self._check = check
+        self._description_override: typing.Optional[str] = None
+
+    @property
+    def check(self) -> action.CheckAction:
+        return self._check
+
+    @property
+    def name(self) -> str:
+        return self._check.name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self._check.name = value
+
+    @property
+    def description(self) -> str:
+        if self._description_override is not None:
+            return self._description_override
+        return self._check.description
+
+    @description.setter
+    def description(self, value: str) -> None:
+        self._description_override = value
+
+    def _do_check(self) -> bool:
+        return self._executor.get_result(self)
+
+
+class ConcurrentCheckExecutor:
+    """Runs independent checks in a bounded pool of threads with a deadline for every check.
+
+    Checks are started in the background on the first request of any result. Exclusive checks
+    are executed one by one only when all the other ones are finished, and skipped if some of them
+    are still running after the deadline. A check exceeded the deadline is reported as failed,
+    while the rest of checks are not affected. If every thread is held by a check exceeded the deadline,
+    checks waiting in the queue are reported as not started. Workers are stopped once every result is requested.
+    """
+    jobs: int
+    deadline: typing.Optional[float]
+
+    def __init__(self, checks: typing.Iterable[action.CheckAction], jobs: int, deadline: typing.Optional[float] = None):
+        self.jobs = jobs
+        self.deadline = deadline
+        self.proxies = [ConcurrentCheck(self, check) for check in checks]
+        self._pool: typing.Optional[workers.WorkerPool] = None
+        self._jobs: typing.Dict[int, workers.Job] = {}
+        self._lock = threading.Lock()
+        self._results_left = len(self.proxies)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                return
+
+            self._pool = workers.WorkerPool(self.jobs, name="precheck")
+            for proxy in self.proxies:
+                if not is_exclusive(proxy.check):
+                    self._jobs[id(proxy)] = self._pool.submit(proxy.check.do_check, proxy.name)
+            log.debug(f"Started {len(self._jobs)} checks in {self._pool.workers} threads")
+
+    def _is_stalled(self) -> bool:
+        return self._pool is not None and self.deadline is not None and self._pool.is_stalled(self.deadline)
+
+    def _wait_running_checks(self) -> typing.List[str]:
+        """Names of checks not finished by the deadline"""
+        return [job.name for job in list(self._jobs.values()) if not job.wait_deadline(self.deadline, self._is_stalled)]
+
+    def _running_check_names(self) -> typing.List[str]:
+        return [job.name for job in list(self._jobs.values()) if job.started and not job.done]
+
+    def _timed_out(self, proxy: ConcurrentCheck) -> bool:
+        log.err(f"Check {proxy.name!r} did not finish in {self.deadline} seconds")
+        proxy.description = TIMED_OUT_CHECK_DESCRIPTION.format(deadline=self.deadline)
+        return False
+
+    def _not_started(self, proxy: ConcurrentCheck) -> bool:
+        running = self._running_check_names()
+        log.err(f"Check {proxy.name!r} was not started, because checks {', '.join(running)} did not finish in {self.deadline} seconds")
+        proxy.description = NOT_STARTED_CHECK_DESCRIPTION.format(deadline=self.deadline, checks=", ".join(running))
+        return False
+
+    def _skipped(self, proxy: ConcurrentCheck, running: typing.List[str]) -> bool:
+        log.err(f"Check {proxy.name!r} is skipped, because checks {', '.join(running)} are still running")
+        proxy.description = SKIPPED_CHECK_DESCRIPTION.format(checks=", ".join(running))
+        return False
+
+    def _get_result(self, proxy: ConcurrentCheck) -> bool:
+        self._start()
+
+        if is_exclusive(proxy.check):
+            unfinished = self._wait_running_checks()
+            if unfinished:
+                return self._skipped(proxy, self._running_check_names() or unfinished)
+            # Executed by the pool as well, so the deadline applies, and a hung exclusive check
+            # makes the following exclusive checks skipped
+            log.debug(f"Running exclusive check {proxy.name!r}")
+            self._jobs[id(proxy)] = self._pool.submit(proxy.check.do_check, proxy.name)
+
+        job = self._jobs[id(proxy)]
+        if not job.wait_deadline(self.deadline, self._is_stalled):
+            if not job.started:
+                return self._not_started(proxy)
+            return self._timed_out(proxy)
+
+        log.debug(f"Check {proxy.name!r} took {job.duration:.2f} seconds")
+        return job.get()
+
+    def get_result(self, proxy: ConcurrentCheck) -> bool:
+        try:
+            return self._get_result(proxy)
+        finally:
+            with self._lock:
+                self._results_left -= 1
+                last = self._results_left == 0
+            if last:
+                self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def make_concurrent(
+    checks: typing.List[action.CheckAction],
+    jobs: int,
+    deadline: typing.Optional[float] = None,
+) -> typing.List[action.CheckAction]:
+    if jobs <= 1 and deadline is None:
+        return checks
+    return ConcurrentCheckExecutor(checks, jobs, deadline).proxies
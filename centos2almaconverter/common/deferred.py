@@ -0,0 +1,286 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import time
+import typing
+import uuid
+
+from pleskdistup.common import log, motd
+
+# The queue is kept outside of the state directory, because the state directory
+# could be removed at the end of the conversion, while tasks are still running
+QUEUE_PATH = "/var/lib/centos2alma/deferred_tasks.json"
+SERVICE_NAME = "centos2alma-deferred-tasks.service"
+SERVICE_PATH = os.path.join("/etc/systemd/system", SERVICE_NAME)
+SERVICE_WANTS_PATH = os.path.join("/etc/systemd/system/multi-user.target.wants", SERVICE_NAME)
+# Name of the transient unit used to start the queue right after the conversion
+TRANSIENT_UNIT_NAME = "centos2alma-deferred-tasks-run"
+
+TASK_REMOVE_PATHS = "remove-paths"
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+FAILED_TASKS_MESSAGE_FMT = """Some of the tasks deferred until the end of the conversion have failed:
+\t- {tasks}
+You can find details in the /var/log/plesk/centos2alma.log file. To run the failed tasks again, call 'centos2alma --run-deferred-tasks --retry-failed'.
+"""
+
+
+class DeferredTask:
+    id: str
+    kind: str
+    description: str
+    params: typing.Dict[str, typing.Any]
+    state: str
+    error: typing.Optional[str]
+    attempts: int
+    started_at: typing.Optional[float]
+    finished_at: typing.Optional[float]
+
+    def __init__(self, kind: str, description: str, params: typing.Dict[str, typing.Any], id: typing.Optional[str] = None,
+                 state: str = STATE_PENDING, error: typing.Optional[str] = None, attempts: int = 0,
+                 started_at: typing.Optional[float] = None, finished_at: typing.Optional[float] = None):
+        self.id = id if id is not None else uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.params = params
+        self.state = state
+        self.error = error
+        self.attempts = attempts
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {"id": self.id, "kind": self.kind, "description": self.description, "params": self.params, "state": self.state,
+                "error": self.error, "attempts": self.attempts, "started_at": self.started_at, "finished_at": self.finished_at}
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "DeferredTask":
+        return cls(data["kind"], data["description"], data["params"], data["id"], data["state"], data.get("error"),
+                   data.get("attempts", 0), data.get("started_at"), data.get("finished_at"))
+
+
+_handlers: typing.Dict[str, typing.Callable[[typing.Dict[str, typing.Any]], None]] = {}
+
+
+def register_handler(kind: str, handler: typing.Callable[[typing.Dict[str, typing.Any]], None]) -> None:
+    """Handlers are executed by a separate process, so they are looked up by the task kind.
+    A module defining a handler should be imported by main.py to register it.
+    """
+    _handlers[kind] = handler
+
+
+def _remove_paths(params: typing.Dict[str, typing.Any]) -> None:
+    for path in params["paths"]:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.unlink(path)
+
+
+register_handler(TASK_REMOVE_PATHS, _remove_paths)
+
+
+class TaskQueue:
+    """Persistent queue of tasks deferred by actions of the finishing stage until Plesk is running again.
+
+    Every change is written to the file at once under an exclusive lock, so tasks added by
+    the conversion and states updated by the runner are never lost, even after a reboot.
+    """
+    path: str
+
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+
+    def _locked(self) -> typing.IO[str]:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock = open(self.path + ".lock", "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _load(self) -> typing.List[DeferredTask]:
+        try:
+            with open(self.path, "r") as f:
+                return [DeferredTask.from_dict(task) for task in json.load(f)["tasks"]]
+        except FileNotFoundError:
+            return []
+        except (ValueError, KeyError, OSError) as e:
+            log.warn(f"Unable to read deferred tasks queue {self.path!r}: {e}")
+            return []
+
+    def _save(self, tasks: typing.List[DeferredTask]) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"tasks": [task.to_dict() for task in tasks]}, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def tasks(self) -> typing.List[DeferredTask]:
+        with self._locked():
+            return self._load()
+
+    def add(self, kind: str, description: str, params: typing.Dict[str, typing.Any]) -> None:
+        # The finishing stage could be executed again, the same task should not be added twice
+        with self._locked():
+            tasks = self._load()
+            for task in tasks:
+                if task.kind == kind and task.params == params and task.state in (STATE_PENDING, STATE_RUNNING):
+                    return
+            tasks.append(DeferredTask(kind, description, params))
+            self._save(tasks)
+        log.info(f"Task {description!r} is deferred until the end of the conversion")
+
+    def update(self, task: DeferredTask) -> None:
+        with self._locked():
+            self._save([task if known.id == task.id else known for known in self._load()])
+
+    def take_next(self) -> typing.Optional[DeferredTask]:
+        """The next task to execute. Tasks left running by an interrupted runner are executed again."""
+        with self._locked():
+            tasks = self._load()
+            for task in tasks:
+                if task.state in (STATE_PENDING, STATE_RUNNING):
+                    task.state = STATE_RUNNING
+                    task.attempts += 1
+                    task.started_at = time.time()
+                    self._save(tasks)
+                    return task
+        return None
+
+    def retry_failed(self) -> None:
+        with self._locked():
+            tasks = self._load()
+            for task in tasks:
+                if task.state == STATE_FAILED:
+                    task.state = STATE_PENDING
+                    task.error = None
+            self._save(tasks)
+
+    def has_pending(self) -> bool:
+        return any(task.state in (STATE_PENDING, STATE_RUNNING) for task in self.tasks())
+
+
+def get_queue() -> TaskQueue:
+    return TaskQueue(QUEUE_PATH)
+
+
+def install_service(script_path: str) -> None:
+    """Make the queue run on every boot until it is empty, in case the runner is interrupted by a reboot.
+    The unit is linked manually instead of calling systemctl, because systemd daemon-reload
+    in the middle of the finishing stage breaks the conversion service.
+    """
+    with open(SERVICE_PATH, "w") as f:
+        f.write(f"""[Unit]
+Description=Finish tasks deferred by the conversion to AlmaLinux 8
+After=network-online.target psa.service sw-engine.service
+
+[Service]
+Type=oneshot
+Nice=10
+IOSchedulingClass=idle
+ExecStart={script_path} --run-deferred-tasks
+
+[Install]
+WantedBy=multi-user.target
+""")
+    os.makedirs(os.path.dirname(SERVICE_WANTS_PATH), exist_ok=True)
+    if not os.path.lexists(SERVICE_WANTS_PATH):
+        os.symlink(SERVICE_PATH, SERVICE_WANTS_PATH)
+
+
+def uninstall_service() -> None:
+    for path in (SERVICE_WANTS_PATH, SERVICE_PATH):
+        if os.path.lexists(path):
+            os.unlink(path)
+
+
+def start_in_background(script_path: str) -> None:
+    # A transient unit is started without loading new unit files, so daemon-reload is not required
+    subprocess.check_call([
+        "/usr/bin/systemd-run", "--no-block", f"--unit={TRANSIENT_UNIT_NAME}",
+        "--property=Nice=10", "--property=IOSchedulingClass=idle",
+        script_path, "--run-deferred-tasks",
+    ], stdout=subprocess.DEVNULL)
+
+
+def run_tasks(queue: TaskQueue) -> typing.List[DeferredTask]:
+    """Execute tasks one by one until the queue is empty. Returns tasks failed by this run."""
+    failed = []
+    task = queue.take_next()
+    while task is not None:
+        log.info(f"Executing deferred task {task.description!r}")
+        try:
+            if task.kind not in _handlers:
+                raise ValueError(f"unknown task kind {task.kind!r}")
+            _handlers[task.kind](task.params)
+            task.state = STATE_DONE
+            log.info(f"Deferred task {task.description!r} is finished in {time.time() - task.started_at:.2f} seconds")
+        except Exception as e:
+            task.state = STATE_FAILED
+            task.error = str(e)
+            failed.append(task)
+            log.err(f"Deferred task {task.description!r} failed: {e}")
+        task.finished_at = time.time()
+        queue.update(task)
+        task = queue.take_next()
+    return failed
+
+
+def format_status(tasks: typing.List[DeferredTask]) -> str:
+    if not tasks:
+        return "There are no deferred tasks"
+
+    done = len([task for task in tasks if task.state == STATE_DONE])
+    lines = [f"Deferred tasks: {done} of {len(tasks)} done"]
+    for task in tasks:
+        line = f"\t{task.state}: {task.description}"
+        if task.state == STATE_RUNNING and task.started_at is not None:
+            line += f" (for {int(time.time() - task.started_at)} seconds)"
+        elif task.state == STATE_FAILED:
+            line += f" ({task.error})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def print_status() -> None:
+    if os.path.exists(QUEUE_PATH):
+        print(format_status(get_queue().tasks()))
+
+
+def main(args: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="centos2alma --run-deferred-tasks",
+                                     description="Execute tasks deferred until the end of the conversion.")
+    parser.add_argument("--retry-failed", action="store_true", default=False, help="Execute failed tasks again.")
+    parser.add_argument("--status", action="store_true", default=False, help="Show the state of deferred tasks and exit.")
+    options = parser.parse_args(args)
+
+    queue = get_queue()
+    if options.status:
+        print(format_status(queue.tasks()))
+        return 0
+    if options.retry_failed:
+        queue.retry_failed()
+
+    os.makedirs(os.path.dirname(QUEUE_PATH), exist_ok=True)
+    with open(QUEUE_PATH + ".run.lock", "w") as run_lock:
+        try:
+            fcntl.flock(run_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("Deferred tasks are being executed by another process already")
+            return 0
+
+        failed = run_tasks(queue)
+        uninstall_service()
+
+    if failed:
+        # The finish message is published by the conversion already, so it should be published again
+        motd.add_finish_ssh_login_message(FAILED_TASKS_MESSAGE_FMT.format(tasks="\n\t- ".join(task.description for task in failed)))
+        motd.publish_finish_ssh_login_message()
+        return 1
+    return 0
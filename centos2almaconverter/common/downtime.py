@@ -0,0 +1,142 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import json
+import os
+import threading
+import time
+import typing
+
+from pleskdistup.common import action, log, motd
+
+from centos2almaconverter.common import plan
+
+OUTAGE_FILE = "centos2alma_outage.json"
+# Stage with actions moved from the downtime window, placed right before services are stopped
+NON_DISRUPTIVE_STAGE = "Prepare while services are running"
+
+OUTAGE_MESSAGE_FMT = """Plesk services and websites were down for {duration} during the conversion.
+"""
+
+
+def is_disruptive(act: action.ActiveAction) -> bool:
+    """Actions declare 'disruptive = False' when neither of their steps interrupts Plesk services,
+    requires them to be stopped or depends on disruptive actions executed before. Actions which
+    declare nothing are considered disruptive.
+    """
+    return getattr(act, "disruptive", True)
+
+
+def move_non_disruptive(actions_map: typing.Dict[str, typing.List[action.ActiveAction]],
+                        start_stage: str = plan.DOWNTIME_START_STAGE,
+                        stage: str = NON_DISRUPTIVE_STAGE) -> typing.Dict[str, typing.List[action.ActiveAction]]:
+    """Move non-disruptive actions of stages after the one stopping services to a new stage right before it.
+    Moved actions keep their relative order. Post steps are executed in the reverse order, so on the finishing
+    phase the moved actions are executed after services are started again.
+    """
+    if start_stage not in actions_map:
+        return actions_map
+
+    moved: typing.List[action.ActiveAction] = []
+    after_start: typing.Dict[str, typing.List[action.ActiveAction]] = {}
+    names = list(actions_map)
+    for name in names[names.index(start_stage) + 1:]:
+        moved += [act for act in actions_map[name] if not is_disruptive(act)]
+        after_start[name] = [act for act in actions_map[name] if is_disruptive(act)]
+
+    result: typing.Dict[str, typing.List[action.ActiveAction]] = {}
+    for name in names:
+        if name == start_stage:
+            result[stage] = actions_map.get(stage, []) + moved
+        if name != stage:
+            result[name] = after_start.get(name, actions_map[name])
+
+    for act in moved:
+        log.debug(f"Action {act.name!r} is moved to stage {stage!r} to be executed before services are stopped")
+    return result
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+class OutageMeter:
+    """Measures the actual downtime: from the start of the stage stopping services on the conversion phase
+    to the end of the stage starting them on the finishing phase. The phases are executed by different
+    processes with a reboot between them, so timestamps are stored in the state directory.
+    """
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _load(self) -> typing.Dict[str, typing.Optional[float]]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            log.warn(f"Unable to read outage measurements {self.path!r}: {e}")
+            return {}
+
+    def _save(self, data: typing.Dict[str, typing.Optional[float]]) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warn(f"Unable to store outage measurements {self.path!r}: {e}")
+
+    def start(self) -> None:
+        # Every action of the stage stops something, the outage starts with the first one of this run
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._save({"started_at": time.time(), "finished_at": None})
+
+    def finish(self) -> typing.Optional[float]:
+        with self._lock:
+            data = self._load()
+            if data.get("started_at") is None:
+                return None
+            data["finished_at"] = time.time()
+            self._save(data)
+            return data["finished_at"] - data["started_at"]
+
+    def report(self, duration: float) -> None:
+        log.info(f"Plesk services and websites were down for {_format_duration(duration)}")
+        motd.add_finish_ssh_login_message(OUTAGE_MESSAGE_FMT.format(duration=_format_duration(duration)))
+
+
+def instrument(actions_map: typing.Dict[str, typing.List[action.ActiveAction]], state_dir: str,
+               start_stage: str = plan.DOWNTIME_START_STAGE, end_stage: str = plan.DOWNTIME_END_STAGE) -> None:
+    """Record the outage start before the prepare step of every action of the start stage and the outage end
+    after post steps of the end stage. The end stage post steps are executed in the reverse order, so
+    the outage is reported after the first action of the stage, which is executed last.
+    """
+    meter = OutageMeter(os.path.join(state_dir, OUTAGE_FILE))
+
+    def measure_start(method: typing.Callable[[], action.ActionResult]) -> typing.Callable[[], action.ActionResult]:
+        def measured() -> action.ActionResult:
+            meter.start()
+            return method()
+        return measured
+
+    def measure_end(method: typing.Callable[[], action.ActionResult], last: bool) -> typing.Callable[[], action.ActionResult]:
+        def measured() -> action.ActionResult:
+            result = method()
+            duration = meter.finish()
+            if last and duration is not None:
+                meter.report(duration)
+            return result
+        return measured
+
+    for act in actions_map.get(start_stage, []):
+        act._prepare_action = measure_start(act._prepare_action)
+    for index, act in enumerate(actions_map.get(end_stage, [])):
+        act._post_action = measure_end(act._post_action, index == 0)
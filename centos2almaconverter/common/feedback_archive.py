@@ -0,0 +1,153 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import hashlib
+import os
+import threading
+import time
+import typing
+import zipfile
+
+from pleskdistup.common import feedback, log
+
+from centos2almaconverter.common import workers
+
+FILE_SIZE_LIMIT = 16 * 1024 * 1024
+TOTAL_SIZE_LIMIT = 128 * 1024 * 1024
+ARCHIVE_MANIFEST_NAME = "feedback_manifest.txt"
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_tail(source: typing.BinaryIO, target: typing.BinaryIO, size: int, limit: int) -> None:
+    if size > limit:
+        source.seek(size - limit)
+        # Start from the beginning of a line, so the first record of the log is not cut in the middle
+        source.readline()
+    for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+        target.write(chunk)
+
+
+class ArchiveStats:
+    files: int
+    duplicates: int
+    truncated: int
+    skipped: int
+    written: int
+
+    def __init__(self):
+        self.files = 0
+        self.duplicates = 0
+        self.truncated = 0
+        self.skipped = 0
+        self.written = 0
+
+
+def write_archive(
+    archive_path: str,
+    paths: typing.Iterable[str],
+    file_limit: int = FILE_SIZE_LIMIT,
+    total_limit: int = TOTAL_SIZE_LIMIT,
+) -> ArchiveStats:
+    """Write files into the zip archive directly, without staging copies of them.
+
+    Files are added from the smallest to the biggest one, so configuration files are always in
+    the archive and only the biggest logs could be cut by the total size limit. Files bigger than
+    the per-file limit are stored as their tails. A file with the same content as an already
+    stored one is only mentioned in the archive manifest.
+    """
+    stats = ArchiveStats()
+    entries = []
+    seen_paths = set()
+    for path in paths:
+        real_path = os.path.realpath(path)
+        if real_path in seen_paths or not os.path.isfile(real_path):
+            continue
+        seen_paths.add(real_path)
+        entries.append((os.path.getsize(real_path), path, real_path))
+    entries.sort()
+
+    manifest = []
+    stored_by_digest: typing.Dict[str, str] = {}
+    with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for size, path, real_path in entries:
+            arcname = path.lstrip("/")
+            budget = min(file_limit, total_limit - stats.written)
+            if budget <= 0:
+                stats.skipped += 1
+                manifest.append(f"{arcname}: skipped, total size limit of the archive is reached")
+                continue
+
+            try:
+                if size <= budget:
+                    digest = _file_digest(real_path)
+                    if digest in stored_by_digest:
+                        stats.duplicates += 1
+                        manifest.append(f"{arcname}: same content as {stored_by_digest[digest]}")
+                        continue
+                    stored_by_digest[digest] = arcname
+
+                with open(real_path, "rb") as source, archive.open(arcname, "w") as target:
+                    _copy_tail(source, target, size, budget)
+            except OSError as e:
+                manifest.append(f"{arcname}: unable to read: {e}")
+                continue
+
+            stats.files += 1
+            stats.written += min(size, budget)
+            if size > budget:
+                stats.truncated += 1
+                manifest.append(f"{arcname}: truncated to the last {budget} of {size} bytes")
+
+        archive.writestr(ARCHIVE_MANIFEST_NAME, "\n".join(manifest) + "\n")
+
+    return stats
+
+
+def concurrent_collectors(collectors: typing.List[typing.Callable[[], typing.Any]], jobs: int = 4) -> typing.List[typing.Callable[[], typing.Any]]:
+    """Replace collectors by ones which run all the original collectors concurrently on the first call.
+    Every replacement returns the result of its own collector, so the caller could still call them one by one.
+    """
+    results: typing.List[workers.Job] = []
+    lock = threading.Lock()
+
+    def run_all() -> typing.List[workers.Job]:
+        with lock:
+            if not results:
+                started_at = time.monotonic()
+                results.extend(workers.run_concurrently(
+                    ((getattr(collector, "__name__", str(index)), collector) for index, collector in enumerate(collectors)),
+                    min(jobs, max(1, len(collectors))), name="feedback",
+                ))
+                log.debug(f"Feedback information collected in {time.monotonic() - started_at:.2f} seconds")
+            return results
+
+    return [lambda index=index: run_all()[index].get() for index in range(len(collectors))]
+
+
+class StreamingFeedback(feedback.Feedback):
+    """Feedback with the archive written by write_archive, so huge logs don't make
+    the archive huge as well and preparing of it takes seconds even on a broken server.
+    """
+
+    @classmethod
+    def wrap(cls, feed: feedback.Feedback, file_limit: int = FILE_SIZE_LIMIT,
+             total_limit: int = TOTAL_SIZE_LIMIT) -> "StreamingFeedback":
+        streaming = cls.__new__(cls)
+        streaming.__dict__.update(feed.__dict__)
+        streaming.file_limit = file_limit
+        streaming.total_limit = total_limit
+        return streaming
+
+    def save_archive(self) -> None:
+        started_at = time.monotonic()
+        paths = [path for path in self.attached_files if path is not None]
+        stats = write_archive(self.filename, paths, self.file_limit, self.total_limit)
+        log.debug(f"Feedback archive {self.filename!r} with {stats.files} files ({stats.written} bytes) written in "
+                  f"{time.monotonic() - started_at:.2f} seconds: {stats.duplicates} duplicates, "
+                  f"{stats.truncated} truncated, {stats.skipped} skipped")
@@ -0,0 +1,259 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing
+import urllib.parse
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import network, pgp, workers
+
+CACHE_DIRECTORY = "centos2alma_gpg_keys"
+CACHE_TTL = 24 * 60 * 60
+_INDEX_FILE = "index.json"
+_INDEX_LOCK_FILE = "index.json.lock"
+_OBJECTS_DIRECTORY = "objects"
+_MAX_REDIRECTS = 5
+
+
+class KeyVerificationError(Exception):
+    pass
+
+
+def get_fingerprints(content: bytes) -> typing.List[str]:
+    """Fingerprints of primary keys in the armored or binary key"""
+    try:
+        return [key.fingerprint for key in pgp.parse_public_keys(content) if not key.is_subkey]
+    except pgp.PgpError:
+        return []
+
+
+def _write_atomically(path: str, content: bytes) -> None:
+    """The cache directory could be shared by many servers, so every writer uses its own temporary file"""
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _header(response: network.Response, name: str) -> typing.Optional[str]:
+    for key, value in response.headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+class CachedKey:
+    source: str
+    digest: str
+    fingerprints: typing.List[str]
+    fetched_at: float
+    # HTTP validators, so an outdated key is revalidated without downloading it again
+    etag: typing.Optional[str]
+    last_modified: typing.Optional[str]
+
+    def __init__(self, source: str, digest: str, fingerprints: typing.List[str], fetched_at: float,
+                 etag: typing.Optional[str] = None, last_modified: typing.Optional[str] = None):
+        self.source = source
+        self.digest = digest
+        self.fingerprints = fingerprints
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {"digest": self.digest, "fingerprints": self.fingerprints, "fetched_at": self.fetched_at,
+                "etag": self.etag, "last_modified": self.last_modified}
+
+    @classmethod
+    def from_dict(cls, source: str, data: typing.Dict[str, typing.Any]) -> "CachedKey":
+        return cls(source, data["digest"], data["fingerprints"], data["fetched_at"], data.get("etag"), data.get("last_modified"))
+
+
+class KeyCache:
+    """Content-addressed cache of GPG keys.
+
+    Key files are stored by the sha256 digest of their content, and the index maps every source,
+    a URL or a local pseudo-source like the rpm database, to the digest and fingerprints of its key.
+    Keys younger than the TTL are used as is, older ones are revalidated by a conditional request.
+    Fingerprints are verified before a key is returned: the file must contain a public key, and
+    the key of a known source must have the same fingerprints as before. When the source is not
+    available, the cached key is used regardless of its age.
+
+    The directory could be shared by many servers running the conversion at the same time:
+    files are written through unique temporary files, and the index is merged with the one
+    on the disk under a lock before it is replaced.
+    """
+    directory: str
+    ttl: float
+
+    def __init__(self, directory: str, ttl: float = CACHE_TTL, client: typing.Optional[network.HttpClient] = None):
+        self.directory = directory
+        self.ttl = ttl
+        self.client = client if client is not None else network.HttpClient()
+        self._lock = threading.Lock()
+        self._entries = self._read_index()
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, _INDEX_FILE)
+
+    def _read_index(self) -> typing.Dict[str, CachedKey]:
+        try:
+            with open(self._index_path, "r") as f:
+                return {source: CachedKey.from_dict(source, data) for source, data in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError, OSError) as e:
+            log.warn(f"Unable to read GPG keys cache index {self._index_path!r}, it will be recreated: {e}")
+            return {}
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, _OBJECTS_DIRECTORY, digest)
+
+    def _cached(self, source: str) -> typing.Optional[CachedKey]:
+        with self._lock:
+            entry = self._entries.get(source)
+        if entry is None or not os.path.exists(self.object_path(entry.digest)):
+            return None
+        return entry
+
+    def _is_fresh(self, entry: CachedKey) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def _store(self, source: str, content: bytes, previous: typing.Optional[CachedKey], **validators: typing.Optional[str]) -> CachedKey:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+
+        # The key is verified before it is stored, so a file used by other sources or servers is never removed
+        fingerprints = get_fingerprints(content)
+        if not fingerprints:
+            raise KeyVerificationError(f"There is no public key in {source!r}")
+        if previous is not None and sorted(previous.fingerprints) != sorted(fingerprints):
+            raise KeyVerificationError(
+                f"Fingerprints of the key from {source!r} have changed from {', '.join(previous.fingerprints)} to {', '.join(fingerprints)}. "
+                f"If the key was replaced by the vendor, remove the {self.directory!r} directory and try again."
+            )
+
+        # Objects are named by the content digest, so an existing one is the same key
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomically(path, content)
+
+        entry = CachedKey(source, digest, fingerprints, time.time(), **validators)
+        with self._lock:
+            self._entries[source] = entry
+        return entry
+
+    def _touch(self, entry: CachedKey) -> CachedKey:
+        entry.fetched_at = time.time()
+        with self._lock:
+            self._entries[entry.source] = entry
+        return entry
+
+    def _download(self, url: str, entry: typing.Optional[CachedKey]) -> CachedKey:
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        location = url
+        for _ in range(_MAX_REDIRECTS):
+            response = self.client.get(location, headers=headers)
+            redirect = _header(response, "Location")
+            if response.status in (301, 302, 303, 307, 308) and redirect is not None:
+                location = urllib.parse.urljoin(location, redirect)
+                continue
+            break
+
+        if response.status == 304 and entry is not None:
+            log.debug(f"GPG key {url!r} is not modified")
+            return self._touch(entry)
+        if response.status != 200:
+            raise OSError(f"Unable to download GPG key {url!r}: HTTP {response.status}")
+        return self._store(url, response.body, entry, etag=_header(response, "ETag"), last_modified=_header(response, "Last-Modified"))
+
+    def fetch(self, url: str) -> str:
+        """Path to the verified key file from the URL"""
+        entry = self._cached(url)
+        if entry is not None and self._is_fresh(entry):
+            log.debug(f"Using cached GPG key {url!r}")
+            return self.object_path(entry.digest)
+
+        try:
+            entry = self._download(url, entry)
+        except (OSError, ValueError) as e:
+            if entry is None:
+                raise
+            log.warn(f"Unable to revalidate GPG key {url!r}, the cached one is used: {e}")
+        return self.object_path(entry.digest)
+
+    def fetch_many(self, urls: typing.Iterable[str], jobs: int = 8) -> typing.Dict[str, str]:
+        unique_urls = list(dict.fromkeys(urls))
+        try:
+            fetched = workers.run_concurrently(((url, lambda url=url: self.fetch(url)) for url in unique_urls),
+                                               min(jobs, max(1, len(unique_urls))), name="gpg-key")
+        finally:
+            self.save()
+
+        errors = [f"{job.name}: {job.exception}" for job in fetched if job.exception is not None]
+        if errors:
+            raise KeyVerificationError("Unable to fetch GPG keys:\n\t" + "\n\t".join(errors))
+        return {job.name: job.result for job in fetched}
+
+    def fetch_local(self, source: str, extract: typing.Callable[[str], None]) -> str:
+        """Path to the verified key produced by the extract callable into the given path,
+        e.g. a key exported from the rpm database. Extraction is repeated only after the TTL.
+        Such keys belong to the server, so the cache should not be shared with other servers.
+        """
+        entry = self._cached(source)
+        if entry is not None and self._is_fresh(entry):
+            log.debug(f"Using cached GPG key {source!r}")
+            return self.object_path(entry.digest)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "key")
+            extract(path)
+            with open(path, "rb") as f:
+                content = f.read()
+        entry = self._store(source, content, entry)
+        self.save()
+        return self.object_path(entry.digest)
+
+    def save(self) -> None:
+        """Merge the index with the one stored by other processes, the most recently fetched entry wins"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, _INDEX_LOCK_FILE), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                stored = self._read_index()
+                with self._lock:
+                    for source, entry in stored.items():
+                        known = self._entries.get(source)
+                        if known is None or known.fetched_at < entry.fetched_at:
+                            self._entries[source] = entry
+                    entries = {source: entry.to_dict() for source, entry in self._entries.items()}
+                _write_atomically(self._index_path, json.dumps(entries, indent=4).encode())
+        except OSError as e:
+            log.warn(f"Unable to store GPG keys cache index {self._index_path!r}: {e}")
+
+
+_caches: typing.Dict[str, KeyCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(directory: str, ttl: float = CACHE_TTL) -> KeyCache:
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = KeyCache(directory, ttl)
+        return _caches[directory]
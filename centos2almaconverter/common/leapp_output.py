@@ -0,0 +1,225 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import json
+import os
+import re
+import sqlite3
+import time
+import typing
+
+from pleskdistup.common import log
+
+LEAPP_DATABASE_PATH = "/var/lib/leapp/leapp.db"
+LEAPP_REPORT_JSON_PATH = "/var/log/leapp/leapp-report.json"
+# Progress and inhibitors of the last 'leapp preupgrade' call, kept in the state directory
+STATE_FILE = "centos2alma_leapp_preupgrade.json"
+
+_PHASE_RE = re.compile(r"^=+> Processing phase `(?P<phase>[^`]+)`")
+_ACTOR_RE = re.compile(r"^=+> \* (?P<actor>\S+)")
+_SUMMARY_START_RE = re.compile(r"Upgrade has been inhibited due to the following problems")
+_SUMMARY_ITEM_RE = re.compile(r"^\s*\d+\.\s*Inhibitor:\s*(?P<title>.+?)\s*$")
+_SUMMARY_END_RE = re.compile(r"^=+$|^HINT:|Reports summary")
+
+SOURCE_OUTPUT = "output"
+SOURCE_DATABASE = "database"
+SOURCE_REPORT = "report"
+
+
+class Inhibitor:
+    title: str
+    summary: str
+    actor: str
+    source: str
+
+    def __init__(self, title: str, summary: str = "", actor: str = "", source: str = SOURCE_OUTPUT):
+        self.title = title
+        self.summary = summary
+        self.actor = actor
+        self.source = source
+
+    def __str__(self) -> str:
+        if self.summary:
+            return f"{self.title}: {self.summary}"
+        return self.title
+
+    def to_dict(self) -> typing.Dict[str, str]:
+        return {"title": self.title, "summary": self.summary, "actor": self.actor, "source": self.source}
+
+
+def _is_inhibitor_report(report: typing.Dict[str, typing.Any]) -> bool:
+    # Old leapp versions mark inhibitors with flags, newer ones with groups
+    return "inhibitor" in report.get("flags", []) or "inhibitor" in report.get("groups", [])
+
+
+class LeappOutputParser:
+    """Parses 'leapp preupgrade' output line by line, tracking the current phase and actor
+    and collecting inhibitors from the final summary.
+    """
+    phase: typing.Optional[str]
+    actor: typing.Optional[str]
+    inhibitors: typing.List[Inhibitor]
+
+    def __init__(self):
+        self.phase = None
+        self.actor = None
+        self.inhibitors = []
+        self._in_summary = False
+
+    def feed(self, line: str) -> typing.Optional[Inhibitor]:
+        """Returns a new inhibitor if the line reports one"""
+        line = line.rstrip("\n")
+
+        match = _PHASE_RE.match(line)
+        if match:
+            self.phase = match.group("phase")
+            self.actor = None
+            return None
+
+        match = _ACTOR_RE.match(line)
+        if match:
+            self.actor = match.group("actor")
+            return None
+
+        if _SUMMARY_START_RE.search(line):
+            self._in_summary = True
+            return None
+
+        if self._in_summary:
+            match = _SUMMARY_ITEM_RE.match(line)
+            if match:
+                inhibitor = Inhibitor(match.group("title"), source=SOURCE_OUTPUT)
+                self.inhibitors.append(inhibitor)
+                return inhibitor
+            if _SUMMARY_END_RE.search(line):
+                self._in_summary = False
+
+        return None
+
+
+class LeappDatabaseWatcher:
+    """Looks for inhibitor reports stored by leapp actors in the leapp database.
+
+    Actors store reports as soon as they are produced, so an inhibitor could be noticed
+    long before leapp finishes and writes the report file. The database is opened read-only
+    and any problem with it just disables the watcher.
+    """
+    path: str
+
+    def __init__(self, path: str = LEAPP_DATABASE_PATH):
+        self.path = path
+        self.enabled = True
+        # Reports stored by previous runs should be ignored
+        self._started_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        self._last_id = 0
+
+    def poll(self) -> typing.List[Inhibitor]:
+        if not self.enabled or not os.path.exists(self.path):
+            return []
+
+        try:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=1)
+            try:
+                # The 'message' table keeps only references to the data and the actor,
+                # leapp joins them in the 'messages_data' view
+                rows = connection.execute(
+                    "SELECT id, actor, message_data FROM messages_data "
+                    "WHERE type = 'Report' AND id > ? AND stamp >= ? ORDER BY id",
+                    (self._last_id, self._started_at),
+                ).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                # Actors write to the database all the time, the next poll will succeed
+                log.debug(f"Leapp database {self.path!r} is locked, reports are read on the next poll")
+                return []
+            log.warn(f"Unable to read leapp reports from {self.path!r}, live inhibitors detection is disabled: {e}")
+            self.enabled = False
+            return []
+        except sqlite3.Error as e:
+            log.warn(f"Unable to read leapp reports from {self.path!r}, live inhibitors detection is disabled: {e}")
+            self.enabled = False
+            return []
+
+        inhibitors = []
+        for message_id, actor, data in rows:
+            self._last_id = message_id
+            try:
+                report = json.loads(json.loads(data)["report"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            if _is_inhibitor_report(report):
+                inhibitors.append(Inhibitor(report.get("title", ""), report.get("summary", ""), actor or "", SOURCE_DATABASE))
+        return inhibitors
+
+
+def load_report_inhibitors(path: str = LEAPP_REPORT_JSON_PATH) -> typing.List[Inhibitor]:
+    try:
+        with open(path, "r") as f:
+            entries = json.load(f).get("entries", [])
+    except (OSError, ValueError) as e:
+        log.debug(f"Unable to read leapp report {path!r}: {e}")
+        return []
+
+    return [Inhibitor(entry.get("title", ""), entry.get("summary", ""), entry.get("actor", ""), SOURCE_REPORT)
+            for entry in entries if _is_inhibitor_report(entry)]
+
+
+def merge_inhibitors(*sources: typing.Iterable[Inhibitor]) -> typing.List[Inhibitor]:
+    """Inhibitors from different sources describe the same problems, the first source wins"""
+    merged: typing.Dict[str, Inhibitor] = {}
+    for source in sources:
+        for inhibitor in source:
+            merged.setdefault(inhibitor.title, inhibitor)
+    return list(merged.values())
+
+
+def save_state(path: str, status: str, phase: typing.Optional[str], actor: typing.Optional[str],
+               inhibitors: typing.Iterable[Inhibitor]) -> None:
+    state = {
+        "status": status,
+        "phase": phase,
+        "actor": actor,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "inhibitors": [inhibitor.to_dict() for inhibitor in inhibitors],
+    }
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log.warn(f"Unable to store leapp preupgrade state in {path!r}: {e}")
+
+
+def load_state(path: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.debug(f"Unable to read leapp preupgrade state from {path!r}: {e}")
+        return None
+
+
+def format_status(state: typing.Dict[str, typing.Any]) -> str:
+    line = f"Leapp preupgrade: {state.get('status', 'unknown')}"
+    if state.get("status") == "running" and state.get("phase"):
+        line += f", phase: {state['phase']}"
+        if state.get("actor"):
+            line += f", actor: {state['actor']}"
+
+    inhibitors = state.get("inhibitors", [])
+    if not inhibitors:
+        return line
+    lines = [line + f", inhibitors found: {len(inhibitors)}"]
+    for inhibitor in inhibitors:
+        actor = f" ({inhibitor['actor']})" if inhibitor.get("actor") else ""
+        lines.append(f"\t{inhibitor.get('title', '')}{actor}")
+    return "\n".join(lines)
+
+
+def print_status(state_dir: str) -> None:
+    state = load_state(os.path.join(state_dir, STATE_FILE))
+    if state is not None:
+        print(format_status(state))
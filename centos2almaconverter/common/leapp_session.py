@@ -0,0 +1,187 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import collections
+import json
+import os
+import shutil
+import tempfile
+import threading
+import typing
+
+from pleskdistup.common import files, leapp_configs, log
+
+LEAPP_PKGS_CONF_PATH = "/etc/leapp/files/pes-events.json"
+LEAPP_REPOS_FILE_PATH = "/etc/leapp/files/leapp_upgrade_repositories.repo"
+LEAPP_MAP_FILE_PATH = "/etc/leapp/files/repomap.csv"
+
+
+def _atomic_write(path: str, write: typing.Callable[[typing.IO], None]) -> None:
+    # Temporary file is created in the same directory, so the rename is atomic
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix="." + os.path.basename(path) + ".")
+    try:
+        with os.fdopen(fd, "w") as f:
+            write(f)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _package_names(packageset: typing.Optional[typing.Dict[str, typing.Any]]) -> typing.List[typing.Dict[str, typing.Any]]:
+    if not packageset:
+        return []
+    return packageset.get("package", [])
+
+
+class PesEvents:
+    """In-memory pes-events.json with packages indexed by name.
+
+    Edits have the same meaning as the corresponding leapp_configs functions,
+    but don't require to read and write the whole file on every call.
+    """
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "r") as f:
+            self.data = json.load(f)
+        self._removed: typing.Set[int] = set()
+        self._by_in_package: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]] = collections.defaultdict(list)
+        self._by_out_package: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]] = collections.defaultdict(list)
+        for info in self.data["packageinfo"]:
+            for package in _package_names(info.get("in_packageset")):
+                self._by_in_package[package["name"]].append(info)
+            for package in _package_names(info.get("out_packageset")):
+                self._by_out_package[package["name"]].append(info)
+
+    def _entries(self, index: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]], name: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        # Entries could be listed several times for packagesets containing the same package twice
+        unique = {id(info): info for info in index.get(name, []) if id(info) not in self._removed}
+        return list(unique.values())
+
+    def set_package_mapping(self, in_package: str, source_repository: str, out_package: str, target_repository: str) -> None:
+        for info in self._entries(self._by_in_package, in_package):
+            if not any(package["name"] == in_package and package["repository"] == source_repository
+                       for package in _package_names(info.get("in_packageset"))):
+                continue
+            for package in _package_names(info.get("out_packageset")):
+                if package["name"] == out_package:
+                    package["repository"] = target_repository
+
+    def set_package_repository(self, package_name: str, repository: str) -> None:
+        for info in self._entries(self._by_out_package, package_name):
+            for package in _package_names(info.get("out_packageset")):
+                if package["name"] == package_name:
+                    package["repository"] = repository
+
+    def set_package_action(self, package_name: str, action_type: int) -> None:
+        for info in self._entries(self._by_in_package, package_name):
+            info["action"] = action_type
+
+    def remove_package_action(self, package_name: str, repository: str) -> None:
+        for info in self._entries(self._by_out_package, package_name):
+            if any(package["name"] == package_name and package["repository"] == repository
+                   for package in _package_names(info.get("out_packageset"))):
+                self._removed.add(id(info))
+
+    def save(self) -> None:
+        if self._removed:
+            self.data["packageinfo"] = [info for info in self.data["packageinfo"] if id(info) not in self._removed]
+            self._removed = set()
+        _atomic_write(self.path, lambda f: json.dump(self.data, f, indent=4))
+
+
+class LeappConfigSession:
+    """Edits of leapp configuration files collected during a stage and written once.
+
+    pes-events files are loaded once and changed in memory. Repository mapping files are
+    copied to a staging directory on the first use, changed there by leapp_configs functions
+    and moved back on commit. Until the commit the real files stay untouched, so the rollback
+    just drops the changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pes_events: typing.Dict[str, PesEvents] = {}
+        self._staging_directory: typing.Optional[str] = None
+        self._staged: typing.Dict[str, str] = {}
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pes_events or self._staged)
+
+    def pes_events(self, path: str = LEAPP_PKGS_CONF_PATH) -> PesEvents:
+        with self._lock:
+            if path not in self._pes_events:
+                self._pes_events[path] = PesEvents(path)
+            return self._pes_events[path]
+
+    def staged_path(self, path: str) -> str:
+        """Path of the staged copy of the file, which should be changed instead of the original one"""
+        with self._lock:
+            if path not in self._staged:
+                if self._staging_directory is None:
+                    self._staging_directory = tempfile.mkdtemp(prefix="centos2alma-leapp-")
+                staged = os.path.join(self._staging_directory, f"{len(self._staged)}-{os.path.basename(path)}")
+                if os.path.exists(path):
+                    shutil.copy2(path, staged)
+                self._staged[path] = staged
+            return self._staged[path]
+
+    def add_repositories_mapping(self, repofiles: typing.List[str], ignore: typing.Optional[typing.List[str]] = None,
+                                 skip_disabled: bool = False) -> None:
+        with self._lock:
+            leapp_configs.add_repositories_mapping(
+                repofiles,
+                ignore=ignore,
+                leapp_repos_file_path=self.staged_path(LEAPP_REPOS_FILE_PATH),
+                mapfile_path=self.staged_path(LEAPP_MAP_FILE_PATH),
+                skip_disabled=skip_disabled,
+            )
+
+    def replace_string(self, path: str, old: str, new: str) -> None:
+        with self._lock:
+            files.replace_string(self.staged_path(path), old, new)
+
+    def _cleanup(self) -> None:
+        if self._staging_directory is not None:
+            shutil.rmtree(self._staging_directory, ignore_errors=True)
+        self._staging_directory = None
+        self._staged = {}
+        self._pes_events = {}
+
+    def commit(self) -> None:
+        with self._lock:
+            for pes_events in self._pes_events.values():
+                log.debug(f"Writing leapp configuration file {pes_events.path!r}")
+                pes_events.save()
+
+            for path, staged in self._staged.items():
+                if not os.path.exists(staged):
+                    continue
+                log.debug(f"Writing leapp configuration file {path!r}")
+                with open(staged, "r") as source:
+                    content = source.read()
+                _atomic_write(path, lambda f: f.write(content))
+
+            self._cleanup()
+
+    def rollback(self) -> None:
+        with self._lock:
+            if self.dirty:
+                log.debug("Dropping not committed changes of leapp configuration files")
+            self._cleanup()
+
+
+_session: typing.Optional[LeappConfigSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> LeappConfigSession:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = LeappConfigSession()
+        return _session
@@ -0,0 +1,300 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import typing
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import workers
+
+ADMIN_PASSWORD_PATH = "/etc/psa/.psa.shadow"
+ADMIN_USER = "admin"
+MYSQL_BINARY = "/usr/bin/mysql"
+MYSQLDUMP_BINARY = "/usr/bin/mysqldump"
+DATA_DIRECTORY = "/var/lib/mysql"
+MANIFEST_FILE = "manifest.json"
+# Service schemas are generated by the server itself and can't be restored
+SKIPPED_DATABASES = ["information_schema", "performance_schema", "sys"]
+# The system schema of the old server. Restoring it over the upgraded one replaces users and grants
+# with the tables of the old version, so it is restored only when explicitly requested
+SYSTEM_DATABASE = "mysql"
+
+_CHUNK_SIZE = 1024 * 1024
+# Dumps are compressed on the critical path of the conversion, so the speed is more important than the ratio
+_COMPRESS_LEVEL = 3
+
+
+def read_admin_password() -> str:
+    with open(ADMIN_PASSWORD_PATH, "r") as f:
+        return f.readline().rstrip()
+
+
+def client_env() -> typing.Dict[str, str]:
+    """Environment for MariaDB clients to connect as the Plesk administrator.
+    The password is passed by the environment, so it is not visible in the process list.
+    """
+    env = os.environ.copy()
+    env["MYSQL_PWD"] = read_admin_password()
+    return env
+
+
+def list_databases() -> typing.List[str]:
+    output = subprocess.check_output([MYSQL_BINARY, f"-u{ADMIN_USER}", "-N", "-B", "-e", "SHOW DATABASES"],
+                                     env=client_env(), universal_newlines=True)
+    return [name for name in output.splitlines() if name and name not in SKIPPED_DATABASES]
+
+
+def get_database_size(name: str) -> int:
+    size = 0
+    for root, _, filenames in os.walk(os.path.join(DATA_DIRECTORY, name)):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class _HashingWriter:
+    """File object computing the sha256 digest of everything written through it"""
+
+    def __init__(self, f: typing.BinaryIO):
+        self._file = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DumpedDatabase:
+    name: str
+    file: str
+    sha256: str
+    size: int
+    dump_size: int
+    duration: float
+
+    def __init__(self, name: str, file: str, sha256: str, size: int, dump_size: int, duration: float):
+        self.name = name
+        self.file = file
+        self.sha256 = sha256
+        # Size of the compressed file, and of the SQL dump before the compression
+        self.size = size
+        self.dump_size = dump_size
+        self.duration = duration
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {"name": self.name, "file": self.file, "sha256": self.sha256, "size": self.size,
+                "dump_size": self.dump_size, "duration": round(self.duration, 3)}
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "DumpedDatabase":
+        return cls(data["name"], data["file"], data["sha256"], data["size"], data["dump_size"], data["duration"])
+
+
+def dump_database(name: str, directory: str, env: typing.Dict[str, str]) -> DumpedDatabase:
+    """Stream mysqldump output through the compression right to the file.
+    InnoDB tables are dumped in a single transaction, so the dump of every database is consistent.
+    """
+    file_name = f"{name}.sql.gz"
+    path = os.path.join(directory, file_name)
+    started_at = time.monotonic()
+    dump_size = 0
+
+    # Errors are collected in a file, so a verbose client never blocks on a full pipe
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen([MYSQLDUMP_BINARY, f"-u{ADMIN_USER}", "--single-transaction", "--quick", "--routines", "--triggers",
+                                    "--events", "--hex-blob", "--databases", name],
+                                   stdout=subprocess.PIPE, stderr=errors, env=env)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                writer = _HashingWriter(f)
+                with gzip.GzipFile(filename=file_name[:-len(".gz")], mode="wb", fileobj=writer, compresslevel=_COMPRESS_LEVEL) as compressed:
+                    for chunk in iter(lambda: process.stdout.read(_CHUNK_SIZE), b""):
+                        dump_size += len(chunk)
+                        compressed.write(chunk)
+            returncode = process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        errors.seek(0)
+        stderr = errors.read().decode(errors="replace")
+
+    if returncode != 0:
+        os.unlink(path + ".tmp")
+        raise Exception(f"mysqldump exited with code {returncode}: {stderr.strip()}")
+    os.replace(path + ".tmp", path)
+
+    return DumpedDatabase(name, file_name, writer.digest.hexdigest(), writer.size, dump_size, time.monotonic() - started_at)
+
+
+class Manifest:
+    created_at: float
+    databases: typing.List[DumpedDatabase]
+
+    def __init__(self, created_at: float, databases: typing.List[DumpedDatabase]):
+        self.created_at = created_at
+        self.databases = databases
+
+    def save(self, directory: str) -> None:
+        path = os.path.join(directory, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"created_at": self.created_at, "databases": [database.to_dict() for database in self.databases]}, f, indent=4)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> "Manifest":
+        with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+            data = json.load(f)
+        return cls(data["created_at"], [DumpedDatabase.from_dict(database) for database in data["databases"]])
+
+
+def _megabytes(size: int) -> float:
+    return size / (1024 * 1024)
+
+
+def dump_databases(directory: str, jobs: int, databases: typing.Optional[typing.Iterable[str]] = None) -> Manifest:
+    """Dump databases in parallel into the directory and write the manifest with checksums of dumps.
+    The largest databases are started first, so they don't finish last alone.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    env = client_env()
+    names = sorted(databases if databases is not None else list_databases(), key=get_database_size, reverse=True)
+    log.info(f"Dumping {len(names)} MariaDB databases into {directory!r} in {jobs} threads")
+
+    started_at = time.monotonic()
+    lock = threading.Lock()
+    finished = 0
+
+    def dump(name: str) -> DumpedDatabase:
+        nonlocal finished
+        result = dump_database(name, directory, env)
+        log.debug(f"Database {name!r} dumped in {result.duration:.2f} seconds, {_megabytes(result.dump_size):.1f} MB "
+                  f"compressed to {_megabytes(result.size):.1f} MB")
+        with lock:
+            finished += 1
+            if finished % 50 == 0:
+                log.info(f"Dumped {finished} of {len(names)} databases")
+        return result
+
+    results = workers.run_concurrently(((name, lambda name=name: dump(name)) for name in names), max(1, jobs), name="mariadb-dump")
+    errors = {job.name: job.exception for job in results if job.exception is not None}
+    manifest = Manifest(time.time(), [job.result for job in results if job.exception is None])
+    manifest.save(directory)
+
+    duration = time.monotonic() - started_at
+    dump_size = sum(database.dump_size for database in manifest.databases)
+    log.info(f"Dumped {len(manifest.databases)} databases, {_megabytes(dump_size):.1f} MB in {duration:.2f} seconds "
+             f"({_megabytes(dump_size) / max(duration, 0.001):.1f} MB/s), compressed to "
+             f"{_megabytes(sum(database.size for database in manifest.databases)):.1f} MB")
+
+    if errors:
+        for name, error in sorted(errors.items()):
+            log.err(f"Unable to dump database {name!r}: {error}")
+        raise Exception("Unable to dump MariaDB databases: {}".format(", ".join(sorted(errors))))
+    return manifest
+
+
+def restore_database(database: DumpedDatabase, directory: str, env: typing.Dict[str, str]) -> None:
+    path = os.path.join(directory, database.file)
+    if file_digest(path) != database.sha256:
+        raise ValueError(f"Checksum of {path!r} does not match the manifest")
+
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen([MYSQL_BINARY, f"-u{ADMIN_USER}"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                   stderr=errors, env=env)
+        try:
+            with gzip.open(path, "rb") as compressed:
+                for chunk in iter(lambda: compressed.read(_CHUNK_SIZE), b""):
+                    process.stdin.write(chunk)
+            process.stdin.close()
+        except BrokenPipeError:
+            # mysql exited on an error, it is reported below
+            pass
+        finally:
+            returncode = process.wait()
+        errors.seek(0)
+        stderr = errors.read().decode(errors="replace")
+    if returncode != 0:
+        raise Exception(f"mysql exited with code {returncode}: {stderr.strip()}")
+
+
+def restore_databases(directory: str, jobs: int, databases: typing.Optional[typing.Iterable[str]] = None) -> typing.Dict[str, Exception]:
+    """Restore databases from dumps listed in the manifest. Returns errors by database names.
+    The system database is skipped unless it is listed in databases.
+    """
+    manifest = Manifest.load(directory)
+    if databases is None:
+        selected = [database for database in manifest.databases if database.name != SYSTEM_DATABASE]
+        if len(selected) != len(manifest.databases):
+            log.info(f"The {SYSTEM_DATABASE!r} database is not restored by default, list it in databases to restore it")
+    else:
+        databases = set(databases)
+        selected = [database for database in manifest.databases if database.name in databases]
+    # The dump duration is the best guess of the restore duration
+    selected.sort(key=lambda database: database.duration, reverse=True)
+    log.info(f"Restoring {len(selected)} MariaDB databases from {directory!r} in {jobs} threads")
+
+    env = client_env()
+    started_at = time.monotonic()
+    lock = threading.Lock()
+    finished = 0
+
+    def restore(database: DumpedDatabase) -> None:
+        nonlocal finished
+        restore_database(database, directory, env)
+        with lock:
+            finished += 1
+            if finished % 50 == 0:
+                log.info(f"Restored {finished} of {len(selected)} databases")
+
+    results = workers.run_concurrently(((database.name, lambda database=database: restore(database)) for database in selected),
+                                       max(1, jobs), name="mariadb-restore")
+    errors = {job.name: job.exception for job in results if job.exception is not None}
+    for name, error in sorted(errors.items()):
+        log.err(f"Unable to restore database {name!r}: {error}")
+
+    duration = time.monotonic() - started_at
+    restored_size = sum(database.dump_size for database in selected if database.name not in errors)
+    log.info(f"Restored {len(selected) - len(errors)} databases, {_megabytes(restored_size):.1f} MB in {duration:.2f} seconds "
+             f"({_megabytes(restored_size) / max(duration, 0.001):.1f} MB/s)")
+    return errors
+
+
+def main(args: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="centos2alma --restore-mariadb-dump",
+                                     description="Restore MariaDB databases from the dump made before the conversion.")
+    parser.add_argument("directory", help="Directory of the dump with the manifest file.")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of databases restored simultaneously.")
+    parser.add_argument("--databases", type=lambda value: value.split(","), default=None,
+                        help="Comma separated list of databases to restore. By default all databases from the manifest "
+                             f"except the '{SYSTEM_DATABASE}' system database are restored.")
+    options = parser.parse_args(args)
+
+    errors = restore_databases(options.directory, options.jobs, options.databases)
+    if errors:
+        print(f"Unable to restore databases: {', '.join(sorted(errors))}")
+        return 1
+    return 0
@@ -0,0 +1,186 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import json
+import os
+import subprocess
+import threading
+import time
+import typing
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import deferred, mariadb_dump, workers
+
+MYSQL_UPGRADE_BINARY = "/usr/bin/mysql_upgrade"
+MYSQLCHECK_BINARY = "/usr/bin/mysqlcheck"
+# Kept next to the deferred tasks queue, because the check could be finished after the conversion
+PROGRESS_PATH = os.path.join(os.path.dirname(deferred.QUEUE_PATH), "mariadb_upgrade.json")
+SYSTEM_DATABASE = "mysql"
+# Databases Plesk services depend on, they are never deferred
+PLESK_DATABASES = ["psa", "apsc", "roundcubemail", "horde", "atmail", "sitebuilder5"]
+DEFERRED_TASK = "check-mariadb-databases"
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+
+def upgrade_system_tables() -> None:
+    """Upgrade the system schema only, databases are checked by check_databases then"""
+    started_at = time.monotonic()
+    result = subprocess.run([MYSQL_UPGRADE_BINARY, f"-u{mariadb_dump.ADMIN_USER}", "--upgrade-system-tables"],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, env=mariadb_dump.client_env())
+    log.debug(result.stdout)
+    if result.returncode != 0:
+        raise Exception(f"Unable to upgrade MariaDB system tables, mysql_upgrade exited with code {result.returncode}: {result.stdout.strip()}")
+    log.info(f"MariaDB system tables upgraded in {time.monotonic() - started_at:.2f} seconds")
+
+
+def check_database(name: str, env: typing.Dict[str, str]) -> None:
+    # The same check and repair of tables and views mysql_upgrade does for every database, but for one database only.
+    # Views are upgraded in the same call, so they are covered by the per-database progress too
+    result = subprocess.run([MYSQLCHECK_BINARY, f"-u{mariadb_dump.ADMIN_USER}", "--check-upgrade", "--auto-repair",
+                             "--process-views=upgrade", "--databases", name],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, env=env)
+    if result.returncode != 0:
+        raise Exception(f"mysqlcheck exited with code {result.returncode}: {result.stdout.strip()}")
+
+
+def get_user_databases() -> typing.List[str]:
+    return [name for name in mariadb_dump.list_databases() if name != SYSTEM_DATABASE]
+
+
+class Progress:
+    """State and duration of every database check, written after each change. Databases checked
+    by previous runs are skipped, and the file is used to show the progress by --status.
+    The file is removed once every database is checked, so the next conversion starts from scratch.
+    """
+    path: str
+
+    def __init__(self, path: str = PROGRESS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.databases: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        try:
+            with open(self.path, "r") as f:
+                self.databases = json.load(f)["databases"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, OSError) as e:
+            log.warn(f"Unable to read MariaDB upgrade progress {self.path!r}, it will be recreated: {e}")
+
+    def is_done(self, name: str) -> bool:
+        with self._lock:
+            return self.databases.get(name, {}).get("state") == STATE_DONE
+
+    def mark_pending(self, names: typing.Iterable[str]) -> None:
+        with self._lock:
+            for name in names:
+                if self.databases.get(name, {}).get("state") != STATE_DONE:
+                    self.databases[name] = {"state": STATE_PENDING, "updated_at": time.time(), "duration": None, "error": None}
+            self._save()
+
+    def update(self, name: str, state: str, duration: typing.Optional[float] = None, error: typing.Optional[str] = None) -> None:
+        with self._lock:
+            self.databases[name] = {"state": state, "updated_at": time.time(),
+                                    "duration": round(duration, 3) if duration is not None else None, "error": error}
+            self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"databases": self.databases}, f, indent=4)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warn(f"Unable to store MariaDB upgrade progress {self.path!r}: {e}")
+
+    def remove_if_done(self) -> bool:
+        with self._lock:
+            if any(data["state"] != STATE_DONE for data in self.databases.values()):
+                return False
+            self.databases = {}
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warn(f"Unable to remove MariaDB upgrade progress {self.path!r}: {e}")
+            return True
+
+    def slowest(self, count: int) -> typing.List[typing.Tuple[str, float]]:
+        with self._lock:
+            durations = [(name, data["duration"]) for name, data in self.databases.items() if data["state"] == STATE_DONE]
+        return sorted(durations, key=lambda item: item[1], reverse=True)[:count]
+
+
+def check_databases(databases: typing.Iterable[str], jobs: int, progress: Progress) -> typing.Dict[str, Exception]:
+    """Check and upgrade databases in parallel, the largest ones first. Returns errors by database names,
+    the rest of databases are processed anyway.
+    """
+    pending = sorted((name for name in set(databases) if not progress.is_done(name)), key=mariadb_dump.get_database_size, reverse=True)
+    progress.mark_pending(pending)
+    log.info(f"Checking {len(pending)} MariaDB databases in {jobs} threads")
+
+    env = mariadb_dump.client_env()
+    started_at = time.monotonic()
+    finished = 0
+    lock = threading.Lock()
+
+    def check(name: str) -> None:
+        nonlocal finished
+        progress.update(name, STATE_RUNNING)
+        database_started_at = time.monotonic()
+        try:
+            check_database(name, env)
+        except Exception as e:
+            progress.update(name, STATE_FAILED, time.monotonic() - database_started_at, str(e))
+            raise
+        progress.update(name, STATE_DONE, time.monotonic() - database_started_at)
+        with lock:
+            finished += 1
+            if finished % 20 == 0:
+                log.info(f"Checked {finished} of {len(pending)} MariaDB databases")
+
+    results = workers.run_concurrently(((name, lambda name=name: check(name)) for name in pending), max(1, jobs), name="mariadb-check")
+    errors = {job.name: job.exception for job in results if job.exception is not None}
+    for name, error in sorted(errors.items()):
+        log.err(f"Unable to check MariaDB database {name!r}: {error}")
+
+    log.info(f"Checked {len(pending) - len(errors)} MariaDB databases in {time.monotonic() - started_at:.2f} seconds. Slowest ones: "
+             + ", ".join(f"{name} ({duration:.2f}s)" for name, duration in progress.slowest(5)))
+    # Databases deferred to the background are still pending here, so the progress is kept for them
+    if progress.remove_if_done():
+        log.debug("All MariaDB databases are checked, the progress is removed")
+    return errors
+
+
+def _run_deferred_task(params: typing.Dict[str, typing.Any]) -> None:
+    errors = check_databases(params["databases"], params["jobs"], Progress())
+    if errors:
+        raise Exception("Unable to check MariaDB databases: {}".format(", ".join(sorted(errors))))
+
+
+deferred.register_handler(DEFERRED_TASK, _run_deferred_task)
+
+
+def defer_check(databases: typing.List[str], jobs: int) -> None:
+    Progress().mark_pending(databases)
+    deferred.get_queue().add(DEFERRED_TASK, f"check and upgrade {len(databases)} MariaDB databases", {"databases": databases, "jobs": jobs})
+
+
+def format_status(progress: Progress) -> str:
+    states = [data["state"] for data in progress.databases.values()]
+    line = f"MariaDB databases checked: {states.count(STATE_DONE)} of {len(states)}"
+    running = sorted(name for name, data in progress.databases.items() if data["state"] == STATE_RUNNING)
+    if running:
+        line += f", in progress: {', '.join(running)}"
+    if states.count(STATE_FAILED):
+        line += f", failed: {states.count(STATE_FAILED)}"
+    return line
+
+
+def print_status() -> None:
+    if os.path.exists(PROGRESS_PATH):
+        print(format_status(Progress()))
@@ -0,0 +1,232 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import re
+import subprocess
+import threading
+import time
+import typing
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import repositories, rpmdb
+
+YUM_BINARY = "/usr/bin/yum"
+DNF_BINARY = "/usr/bin/dnf"
+
+
+# Messages about repositories skipped because of 'skip_if_unavailable': dnf and yum ones
+_FAILED_REPOSITORY_RES = [
+    re.compile(r"Failed to download metadata for repo '(?P<repo>[^']+)'"),
+    re.compile(r"Cannot retrieve repository metadata \(repomd\.xml\) for repository: (?P<repo>[^\s.]+)"),
+    re.compile(r"failure: repodata/repomd\.xml from (?P<repo>[^:\s]+):"),
+    re.compile(r"Skipping unreadable repository '(?P<repo>[^']+)'"),
+]
+_IGNORED_REPOSITORIES_RE = re.compile(r"^Ignoring repositories: (?P<repos>.+)$", re.MULTILINE)
+
+
+def parse_failed_repositories(output: str) -> typing.Set[str]:
+    """Repositories 'makecache' was unable to refresh, according to its output"""
+    failed = set()
+    for regex in _FAILED_REPOSITORY_RES:
+        failed.update(match.group("repo") for match in regex.finditer(output))
+    for match in _IGNORED_REPOSITORIES_RE.finditer(output):
+        failed.update(repo.strip() for repo in match.group("repos").split(",") if repo.strip())
+    return failed
+
+
+def _repository_signature(repo: typing.Any) -> typing.Tuple[typing.Optional[str], ...]:
+    return (repo.url, repo.metalink, repo.mirrorlist)
+
+
+class MetadataCache:
+    """Package manager metadata cache warmed once per phase.
+
+    Metadata of all repositories is downloaded by a single 'makecache' call, so the package manager
+    starts and resolves mirrors only once. Unavailable repositories are skipped by this call and
+    refreshed one by one then, which also shows the time spent on each of them. After that
+    package operations of the phase could run in the cache-only mode. Repositories added or changed after the warm up are warmed
+    on the next request, and until then package operations fall back to the normal mode.
+    """
+    package_manager: str
+    refresh_times: typing.Dict[str, float]
+    failed_repositories: typing.Set[str]
+
+    def __init__(self, package_manager: str):
+        self.package_manager = package_manager
+        self.refresh_times = {}
+        self.failed_repositories = set()
+        self._warmed: typing.Dict[str, typing.Tuple[typing.Optional[str], ...]] = {}
+        self._extra_repositories: typing.Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _enabled_repositories(self) -> typing.Dict[str, typing.Tuple[typing.Optional[str], ...]]:
+        inventory = repositories.get_inventory()
+        enabled = {repo.id: _repository_signature(repo) for _, repo in inventory.by_enabled(True)}
+        # Repositories enabled only for the warm up are still a part of the cache
+        for repo_id in self._extra_repositories:
+            for _, repo in inventory.by_id(repo_id):
+                enabled[repo.id] = _repository_signature(repo)
+        return enabled
+
+    def _makecache_command(self, repo_ids: typing.List[str], max_age: typing.Optional[int] = None,
+                           skip_unavailable: bool = False) -> typing.List[str]:
+        command = [self.package_manager, "--disablerepo=*", f"--enablerepo={','.join(repo_ids)}"]
+        if skip_unavailable:
+            command.append("--setopt=*.skip_if_unavailable=1")
+        if max_age is not None:
+            # Metadata younger than the age is considered actual and is not downloaded again
+            command.append(f"--setopt=*.metadata_expire={max_age}")
+        command.append("makecache")
+        if self.package_manager == YUM_BINARY:
+            # Filelists and other metadata are not required to install packages
+            command.append("fast")
+        return command
+
+    def _refresh_repository(self, repo_id: str, max_age: typing.Optional[int] = None) -> bool:
+        started_at = time.monotonic()
+        result = subprocess.run(self._makecache_command([repo_id], max_age), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        self.refresh_times[repo_id] = time.monotonic() - started_at
+
+        if result.returncode != 0:
+            log.warn(f"Unable to refresh metadata of repository {repo_id!r}: {result.stdout.strip()}")
+            return False
+
+        log.debug(f"Metadata of repository {repo_id!r} refreshed in {self.refresh_times[repo_id]:.2f} seconds")
+        return True
+
+    def _refresh_repositories(self, repo_ids: typing.List[str], max_age: typing.Optional[int] = None) -> typing.Set[str]:
+        """Refresh all the repositories at once, and the ones failed by that one by one. Returns failed repositories."""
+        result = subprocess.run(self._makecache_command(repo_ids, max_age, skip_unavailable=True),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        failed = parse_failed_repositories(result.stdout) & set(repo_ids)
+        if result.returncode != 0 and not failed:
+            # The failed repository is unknown, so every repository is checked separately
+            log.debug(f"Unable to refresh metadata of repositories at once: {result.stdout.strip()}")
+            failed = set(repo_ids)
+        if not failed:
+            return set()
+
+        log.info(f"Metadata of repositories {', '.join(sorted(failed))} is not refreshed, retrying them one by one")
+        return {repo_id for repo_id in sorted(failed) if not self._refresh_repository(repo_id, max_age)}
+
+    def warm(self, enable_repositories: typing.Iterable[str] = (), refresh: bool = False, max_age: typing.Optional[int] = None) -> None:
+        """Make metadata cache for all enabled repositories and the given disabled ones.
+        Only repositories that are not warmed yet are refreshed, unless refresh is requested.
+        In the last case the expired metadata is dropped first, so actual data is downloaded.
+        When max_age in seconds is given, refresh keeps metadata that is younger than the age.
+        """
+        with self._lock:
+            self._extra_repositories.update(enable_repositories)
+            if refresh:
+                if max_age is None:
+                    subprocess.check_call([self.package_manager, "clean", "expire-cache"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self._warmed = {}
+                self.failed_repositories = set()
+
+            enabled = self._enabled_repositories()
+            refreshed = [repo_id for repo_id, signature in enabled.items() if self._warmed.get(repo_id) != signature]
+            if not refreshed:
+                return
+
+            for repo_id in refreshed:
+                self.refresh_times.pop(repo_id, None)
+            started_at = time.monotonic()
+            failed = self._refresh_repositories(refreshed, max_age)
+            for repo_id in refreshed:
+                if repo_id in failed:
+                    self.failed_repositories.add(repo_id)
+                else:
+                    self._warmed[repo_id] = enabled[repo_id]
+                    self.failed_repositories.discard(repo_id)
+
+            message = f"Metadata of {len(refreshed) - len(failed)} repositories refreshed in {time.monotonic() - started_at:.2f} seconds"
+            retried = sorted((repo_id for repo_id in refreshed if repo_id in self.refresh_times), key=lambda repo_id: self.refresh_times[repo_id], reverse=True)
+            if retried:
+                message += ". Slowest retried ones: " + ", ".join(f"{repo_id} ({self.refresh_times[repo_id]:.2f}s)" for repo_id in retried[:5])
+            log.info(message)
+
+    def is_warm(self) -> bool:
+        with self._lock:
+            if not self._warmed or self.failed_repositories:
+                return False
+            return all(self._warmed.get(repo_id) == signature for repo_id, signature in self._enabled_repositories().items())
+
+    def cache_only_args(self) -> typing.List[str]:
+        """Arguments for the package manager to use cached metadata, when the cache is still valid"""
+        if self.is_warm():
+            return ["-C"]
+        return []
+
+
+_CHECK_UPDATE_ENTRY_RE = re.compile(r"^[^\s:]+\.[A-Za-z0-9_]+$")
+
+
+class PackageUpdate:
+    name: str
+    arch: str
+    available_version: str
+    repository: str
+    installed_version: typing.Optional[str]
+
+    def __init__(self, name: str, arch: str, available_version: str, repository: str, installed_version: typing.Optional[str] = None):
+        self.name = name
+        self.arch = arch
+        self.available_version = available_version
+        self.repository = repository
+        self.installed_version = installed_version
+
+    def __str__(self) -> str:
+        return f"{self.name}.{self.arch} {self.installed_version or 'unknown'} -> {self.available_version} from {self.repository}"
+
+
+def parse_check_update_output(output: str) -> typing.List[typing.Tuple[str, str, str]]:
+    """Parse 'check-update' output to (name.arch, version, repository) triples.
+    Long package names make yum wrap the line, so fields of an entry could be spread over several lines.
+    """
+    entries: typing.List[typing.List[str]] = []
+    for line in output.splitlines():
+        # Obsoletes are listed separately and duplicate the updates above
+        if line.startswith("Obsoleting Packages"):
+            break
+        fields = line.split()
+        if not fields:
+            continue
+        if line[0].isspace() and entries and len(entries[-1]) < 3:
+            entries[-1] += fields
+        elif _CHECK_UPDATE_ENTRY_RE.match(fields[0]) and len(fields) <= 3:
+            entries.append(fields)
+    return [(entry[0], entry[1], entry[2]) for entry in entries if len(entry) == 3]
+
+
+def get_package_updates(cache: MetadataCache) -> typing.List[PackageUpdate]:
+    """List of installed packages with newer versions available, according to the metadata cache.
+    Raises CalledProcessError when the package manager fails, and ValueError when updates are reported,
+    but can't be parsed.
+    """
+    result = subprocess.run([cache.package_manager, "-q"] + cache.cache_only_args() + ["check-update"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    # 100 is returned when there are updates available
+    if result.returncode not in (0, 100):
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+
+    installed = rpmdb.get_installed_packages()
+    updates = []
+    for name_arch, available_version, repository in parse_check_update_output(result.stdout):
+        name, _, arch = name_arch.rpartition(".")
+        installed_versions = [package.evr for package in installed.get(name) if package.arch == arch]
+        updates.append(PackageUpdate(name, arch, available_version, repository,
+                                     ", ".join(installed_versions) if installed_versions else None))
+    # Unknown output format or obsoletes only, the updates are there anyway
+    if result.returncode == 100 and not updates:
+        raise ValueError(f"'check-update' reported available updates, but none of them were recognized in its output:\n{result.stdout.strip()}")
+    return updates
+
+
+_caches: typing.Dict[str, MetadataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_metadata_cache(package_manager: str) -> MetadataCache:
+    with _caches_lock:
+        if package_manager not in _caches:
+            _caches[package_manager] = MetadataCache(package_manager)
+        return _caches[package_manager]
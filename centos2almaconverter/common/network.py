@@ -0,0 +1,268 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import http.client
+import json
+import os
+import threading
+import time
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import workers
+
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_CACHE_TTL = 60 * 60
+# Bodies bigger than the limit are not read on probes, the connection is just dropped
+_PROBE_BODY_LIMIT = 1024 * 1024
+
+
+class Response:
+    url: str
+    status: int
+    headers: typing.Dict[str, str]
+    body: bytes
+
+    def __init__(self, url: str, status: int, headers: typing.Dict[str, str], body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        # The same as 'curl -f' without following redirects
+        return self.status < 400
+
+
+class ProbeResult:
+    url: str
+    ok: bool
+    status: typing.Optional[int]
+    error: typing.Optional[str]
+    elapsed: float
+    cached: bool
+
+    def __init__(self, url: str, ok: bool, status: typing.Optional[int] = None, error: typing.Optional[str] = None,
+                 elapsed: float = 0.0, cached: bool = False):
+        self.url = url
+        self.ok = ok
+        self.status = status
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"{self.url}: {self.error}"
+        return f"{self.url}: HTTP {self.status}"
+
+
+class ConnectionPool:
+    """Keeps idle keep-alive connections per scheme, host and port"""
+
+    def __init__(self, connect_timeout: float, read_timeout: float):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._idle: typing.Dict[typing.Tuple[str, str, int], typing.List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme: str, host: str, port: int) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get((scheme, host, port))
+            if idle:
+                return idle.pop()
+
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        return connection
+
+    def release(self, scheme: str, host: str, port: int, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, host, port), []).append(connection)
+
+    def close(self) -> None:
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle = {}
+
+
+class ProbeCache:
+    """Small on-disk cache of successful probes. Failed probes are never cached,
+    because the user is likely fixing the problem between runs.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            log.warn(f"Unable to read network probes cache {self.path!r}, it will be recreated: {e}")
+
+    def get(self, url: str) -> typing.Optional[ProbeResult]:
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None or time.time() - entry["checked_at"] > self.ttl:
+            return None
+        return ProbeResult(url, True, status=entry["status"], cached=True)
+
+    def put(self, result: ProbeResult) -> None:
+        with self._lock:
+            if result.ok:
+                self._entries[result.url] = {"status": result.status, "checked_at": time.time()}
+            else:
+                self._entries.pop(result.url, None)
+
+    def save(self) -> None:
+        with self._lock:
+            now = time.time()
+            entries = {url: entry for url, entry in self._entries.items() if now - entry["checked_at"] <= self.ttl}
+            tmp_path = self.path + ".tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                log.warn(f"Unable to store network probes cache {self.path!r}: {e}")
+
+
+class HttpClient:
+    """HTTP client for network related checks and actions.
+
+    Connections are reused per host, every request has connect and read timeouts,
+    and probes of many URLs are made concurrently. When a cache path is given, successful
+    probes are remembered for the cache TTL, so repeated runs don't hit the network again.
+    Proxies from the environment are respected, but connections are not pooled in this case.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        cache_path: typing.Optional[str] = None,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        jobs: int = 8,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.jobs = jobs
+        self.pool = ConnectionPool(connect_timeout, read_timeout)
+        self.cache = ProbeCache(cache_path, cache_ttl) if cache_path is not None else None
+
+    def _request_through_proxy(self, url: str, method: str, headers: typing.Dict[str, str], body_limit: typing.Optional[int]) -> Response:
+        request = urllib.request.Request(url, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.read_timeout) as response:
+                return Response(url, response.status, dict(response.headers), response.read(body_limit) if body_limit else response.read())
+        except urllib.error.HTTPError as e:
+            return Response(url, e.code, dict(e.headers), b"")
+
+    def request(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: typing.Optional[typing.Dict[str, str]] = None,
+        body_limit: typing.Optional[int] = None,
+    ) -> Response:
+        headers = dict(headers or {})
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme {parsed.scheme!r} in {url!r}")
+
+        if urllib.request.getproxies().get(parsed.scheme):
+            return self._request_through_proxy(url, method, headers, body_limit)
+
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+
+        # A pooled connection could be closed by the server already, so we give it one more try
+        for attempt in range(2):
+            connection = self.pool.acquire(parsed.scheme, parsed.hostname, port)
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                connection.close()
+                if attempt == 0:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            break
+
+        length = response.getheader("Content-Length")
+        if body_limit is not None and (length is None or int(length) > body_limit):
+            body = response.read(body_limit)
+            connection.close()
+        else:
+            body = response.read()
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.release(parsed.scheme, parsed.hostname, port, connection)
+
+        return Response(url, response.status, dict(response.getheaders()), body)
+
+    def get(self, url: str, headers: typing.Optional[typing.Dict[str, str]] = None) -> Response:
+        return self.request(url, headers=headers)
+
+    def download(self, url: str, target_path: str, chunk_size: int = 1024 * 1024) -> None:
+        """Store the response body in the file chunk by chunk, so big files are not kept in memory.
+        Connection is not returned to the pool, since downloads are rare and long.
+        """
+        request = urllib.request.Request(url)
+        try:
+            with urllib.request.urlopen(request, timeout=self.read_timeout) as response, open(target_path, "wb") as f:
+                for chunk in iter(lambda: response.read(chunk_size), b""):
+                    f.write(chunk)
+        except urllib.error.HTTPError as e:
+            raise OSError(f"Unable to download {url!r}: HTTP {e.code}")
+
+    def probe(self, url: str) -> ProbeResult:
+        if self.cache is not None:
+            cached = self.cache.get(url)
+            if cached is not None:
+                log.debug(f"Using cached probe result for {url!r}")
+                return cached
+
+        started_at = time.monotonic()
+        try:
+            response = self.request(url, body_limit=_PROBE_BODY_LIMIT)
+            result = ProbeResult(url, response.ok, status=response.status, elapsed=time.monotonic() - started_at)
+        except Exception as e:
+            result = ProbeResult(url, False, error=str(e) or e.__class__.__name__, elapsed=time.monotonic() - started_at)
+
+        log.debug(f"Probe of {url!r} finished in {result.elapsed:.2f} seconds: {'ok' if result.ok else result}")
+        if self.cache is not None:
+            self.cache.put(result)
+        return result
+
+    def probe_many(self, urls: typing.Iterable[str]) -> typing.Dict[str, ProbeResult]:
+        unique_urls = list(dict.fromkeys(urls))
+        jobs = workers.run_concurrently(((url, lambda url=url: self.probe(url)) for url in unique_urls),
+                                        min(self.jobs, max(1, len(unique_urls))), name="probe")
+        if self.cache is not None:
+            self.cache.save()
+        return {job.name: job.get() for job in jobs}
+
+    def close(self) -> None:
+        self.pool.close()
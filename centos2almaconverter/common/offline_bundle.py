@@ -0,0 +1,262 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import typing
+import urllib.parse
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import network, repositories
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+
+ELEVATE_RELEASE_URL = "https://repo.almalinux.org/elevate/elevate-release-latest-el7.noarch.rpm"
+ELEVATE_REPOSITORY = "elevate"
+# The same repository files the FetchGPGKeys action takes keys from
+GPG_KEYS_REPOSITORY_FILES = ["kernelcare*.repo", "plesk*.repo", "imunify*.repo"]
+
+KIND_PACKAGE = "package"
+KIND_ELEVATE_RELEASE = "elevate-release"
+KIND_GPG_KEY = "gpg-key"
+
+
+class BundleError(Exception):
+    pass
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_remote(location: str) -> bool:
+    return urllib.parse.urlparse(location).scheme in ("http", "https")
+
+
+def _join_artifact_path(base: str, relative_path: str) -> str:
+    # Paths come from the manifest, which could be served by a mirror, so they should never leave the base directory
+    normalized = os.path.normpath(relative_path)
+    if os.path.isabs(relative_path) or normalized == os.pardir or normalized.startswith(os.pardir + os.sep):
+        raise BundleError(f"Artifact path {relative_path!r} from the offline bundle manifest is outside of the bundle")
+    return os.path.join(base, normalized)
+
+
+def _rpm_nvr(path: str) -> str:
+    return subprocess.check_output(["/usr/bin/rpm", "-qp", "--nosignature", "--queryformat", "%{NAME}-%{VERSION}-%{RELEASE}", path],
+                                   universal_newlines=True).strip()
+
+
+class Artifact:
+    kind: str
+    path: str
+    sha256: str
+    # Package specification for packages and the original URL for keys and elevate-release
+    source: str
+
+    def __init__(self, kind: str, path: str, sha256: str, source: str):
+        self.kind = kind
+        self.path = path
+        self.sha256 = sha256
+        self.source = source
+
+    def to_dict(self) -> typing.Dict[str, str]:
+        return {"kind": self.kind, "path": self.path, "sha256": self.sha256, "source": self.source}
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, str]) -> "Artifact":
+        return cls(data["kind"], data["path"], data["sha256"], data["source"])
+
+
+class OfflineBundle:
+    """Leapp packages, elevate-release and GPG keys required for the conversion, stored in
+    a local directory or on an internal HTTP mirror with the same layout.
+
+    Artifacts are fetched on demand into the local cache directory and verified by checksums
+    from the manifest, so upstream repositories are never requested.
+    """
+    location: str
+    cache_directory: str
+
+    def __init__(self, location: str, cache_directory: str):
+        self.location = location.rstrip("/")
+        self.cache_directory = cache_directory
+        self._manifest: typing.Optional[typing.Dict[str, typing.Any]] = None
+        self._client: typing.Optional[network.HttpClient] = None
+
+    def _download(self, relative_path: str, target: str) -> None:
+        if self._client is None:
+            self._client = network.HttpClient()
+        url = f"{self.location}/{urllib.parse.quote(relative_path)}"
+        response = self._client.get(url)
+        if not response.ok:
+            raise BundleError(f"Unable to download {url!r} from the offline bundle: HTTP {response.status}")
+        with open(target, "wb") as f:
+            f.write(response.body)
+
+    @property
+    def manifest(self) -> typing.Dict[str, typing.Any]:
+        if self._manifest is None:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            if _is_remote(self.location):
+                manifest_path = os.path.join(self.cache_directory, MANIFEST_NAME)
+                self._download(MANIFEST_NAME, manifest_path)
+            else:
+                manifest_path = os.path.join(self.location, MANIFEST_NAME)
+
+            try:
+                with open(manifest_path, "r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                raise BundleError(f"Unable to read the offline bundle manifest {manifest_path!r}: {e}")
+            if manifest.get("format") != MANIFEST_FORMAT:
+                raise BundleError(f"Unsupported offline bundle format {manifest.get('format')!r}, expected {MANIFEST_FORMAT}")
+            self._manifest = manifest
+        return self._manifest
+
+    @property
+    def artifacts(self) -> typing.List[Artifact]:
+        return [Artifact.from_dict(data) for data in self.manifest["artifacts"]]
+
+    def artifacts_of_kind(self, kind: str) -> typing.List[Artifact]:
+        return [artifact for artifact in self.artifacts if artifact.kind == kind]
+
+    def fetch(self, artifact: Artifact) -> str:
+        """Returns the local path of the verified artifact"""
+        if _is_remote(self.location):
+            path = _join_artifact_path(self.cache_directory, artifact.path)
+            if not os.path.exists(path) or _sha256(path) != artifact.sha256:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._download(artifact.path, path)
+        else:
+            path = _join_artifact_path(self.location, artifact.path)
+
+        if not os.path.exists(path):
+            raise BundleError(f"Artifact {artifact.path!r} is missing in the offline bundle {self.location!r}")
+        checksum = _sha256(path)
+        if checksum != artifact.sha256:
+            raise BundleError(f"Checksum mismatch for {artifact.path!r} from the offline bundle: expected {artifact.sha256}, got {checksum}")
+        return path
+
+    def verify(self, pinned_packages: typing.Iterable[str]) -> None:
+        """Make sure the bundle contains exactly the pinned packages and all artifacts are intact"""
+        bundled = set(artifact.source for artifact in self.artifacts_of_kind(KIND_PACKAGE))
+        pinned = set(pinned_packages)
+        if bundled != pinned:
+            raise BundleError("The offline bundle does not match the pinned leapp packages. "
+                              f"Missing: {', '.join(sorted(pinned - bundled)) or 'none'}. "
+                              f"Unexpected: {', '.join(sorted(bundled - pinned)) or 'none'}. "
+                              "Please rebuild the bundle with the same version of the script.")
+        if not self.artifacts_of_kind(KIND_ELEVATE_RELEASE):
+            raise BundleError("The offline bundle does not contain the elevate-release package")
+
+        for artifact in self.artifacts:
+            path = self.fetch(artifact)
+            if artifact.kind == KIND_PACKAGE and _rpm_nvr(path) != artifact.source:
+                raise BundleError(f"Package {artifact.path!r} from the offline bundle is not {artifact.source!r}")
+
+    def get_package_paths(self) -> typing.List[str]:
+        return [self.fetch(artifact) for artifact in self.artifacts_of_kind(KIND_PACKAGE)]
+
+    def get_elevate_release_path(self) -> str:
+        return self.fetch(self.artifacts_of_kind(KIND_ELEVATE_RELEASE)[0])
+
+    def get_gpg_keys(self) -> typing.Dict[str, str]:
+        """Local paths of bundled keys by their original URLs"""
+        return {artifact.source: self.fetch(artifact) for artifact in self.artifacts_of_kind(KIND_GPG_KEY)}
+
+
+def _collect_gpg_key_urls(repository_files: typing.Iterable[str]) -> typing.List[str]:
+    urls = []
+    inventory = repositories.get_inventory()
+    for path, repo in inventory.repositories(repository_files):
+        for url in repositories.get_repository_gpgkeys(repo):
+            if _is_remote(url) and url not in urls:
+                urls.append(url)
+    return urls
+
+
+def build(target_directory: str, pinned_packages: typing.List[str], gpg_key_urls: typing.Iterable[str] = ()) -> typing.Dict[str, typing.Any]:
+    """Download pinned leapp packages, elevate-release and GPG keys into the directory and write the manifest.
+    The elevate repository should be configured on the machine, e.g. by installing elevate-release.
+    """
+    client = network.HttpClient()
+    artifacts: typing.List[Artifact] = []
+
+    def add_file(kind: str, relative_path: str, source: str) -> None:
+        artifacts.append(Artifact(kind, relative_path, _sha256(os.path.join(target_directory, relative_path)), source))
+
+    def download(kind: str, url: str, relative_path: str) -> None:
+        response = client.get(url)
+        if not response.ok:
+            raise BundleError(f"Unable to download {url!r}: HTTP {response.status}")
+        os.makedirs(os.path.dirname(os.path.join(target_directory, relative_path)), exist_ok=True)
+        with open(os.path.join(target_directory, relative_path), "wb") as f:
+            f.write(response.body)
+        add_file(kind, relative_path, url)
+
+    download(KIND_ELEVATE_RELEASE, ELEVATE_RELEASE_URL, os.path.join("elevate-release", os.path.basename(ELEVATE_RELEASE_URL)))
+
+    packages_directory = os.path.join(target_directory, "packages")
+    os.makedirs(packages_directory, exist_ok=True)
+    with tempfile.TemporaryDirectory() as download_directory:
+        subprocess.check_call(["/usr/bin/yumdownloader", f"--enablerepo={ELEVATE_REPOSITORY}", "--destdir", download_directory] + pinned_packages)
+        downloaded = {}
+        for filename in os.listdir(download_directory):
+            if filename.endswith(".rpm"):
+                downloaded[_rpm_nvr(os.path.join(download_directory, filename))] = filename
+
+        for package in pinned_packages:
+            if package not in downloaded:
+                raise BundleError(f"Pinned package {package!r} was not downloaded from the {ELEVATE_REPOSITORY!r} repository")
+            shutil.move(os.path.join(download_directory, downloaded[package]), os.path.join(packages_directory, downloaded[package]))
+            add_file(KIND_PACKAGE, os.path.join("packages", downloaded[package]), package)
+
+    for url in gpg_key_urls:
+        # Different keys often share the file name, so the name is made unique by the URL hash
+        filename = hashlib.sha256(url.encode()).hexdigest()[:16] + "-" + os.path.basename(urllib.parse.urlparse(url).path)
+        download(KIND_GPG_KEY, url, os.path.join("keys", filename))
+
+    client.close()
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "artifacts": [artifact.to_dict() for artifact in artifacts],
+    }
+    with open(os.path.join(target_directory, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def main(args: typing.List[str], pinned_packages: typing.List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="centos2alma --build-offline-bundle",
+                                     description="Build a bundle of leapp packages, elevate-release and GPG keys "
+                                                 "to convert servers without access to upstream repositories.")
+    parser.add_argument("directory", help="Directory to store the bundle in. Could be served by any HTTP server as is.")
+    parser.add_argument("--gpg-key-url", action="append", dest="gpg_key_urls", default=[],
+                        help="Additional GPG key URL to include into the bundle. Could be specified multiple times.")
+    options = parser.parse_args(args)
+
+    os.makedirs(options.directory, exist_ok=True)
+    gpg_key_urls = _collect_gpg_key_urls(GPG_KEYS_REPOSITORY_FILES)
+    gpg_key_urls += [url for url in options.gpg_key_urls if url not in gpg_key_urls]
+    try:
+        manifest = build(options.directory, pinned_packages, gpg_key_urls)
+        OfflineBundle(options.directory, options.directory).verify(pinned_packages)
+    except (BundleError, subprocess.CalledProcessError, OSError) as e:
+        log.err(f"Unable to build the offline bundle: {e}")
+        print(f"Unable to build the offline bundle: {e}")
+        return 1
+
+    print(f"The offline bundle with {len(manifest['artifacts'])} artifacts is stored in {options.directory!r}")
+    return 0
@@ -0,0 +1,197 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import gzip
+import os
+import tempfile
+import threading
+import time
+import typing
+import xml.etree.ElementTree as ElementTree
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import network
+
+ALMALINUX8_REPOSITORIES_URLS = [
+    "https://repo.almalinux.org/almalinux/8/BaseOS/x86_64/os",
+    "https://repo.almalinux.org/almalinux/8/AppStream/x86_64/os",
+    "https://repo.almalinux.org/almalinux/8/PowerTools/x86_64/os",
+]
+PROVIDES_INDEX_FILE = "centos2alma_perl_provides.tsv"
+PROVIDES_INDEX_TTL = 7 * 24 * 60 * 60
+
+_REPO_NAMESPACE = "{http://linux.duke.edu/metadata/repo}"
+_COMMON_NAMESPACE = "{http://linux.duke.edu/metadata/common}"
+_RPM_NAMESPACE = "{http://linux.duke.edu/metadata/rpm}"
+
+
+def module_name_from_path(relative_path: str) -> str:
+    """'B/Hooks/OP/Check.pm' -> 'B::Hooks::OP::Check'"""
+    return relative_path[:-len(".pm")].replace(os.sep, "::")
+
+
+class InstalledModule:
+    path: str
+    name: str
+    package: typing.Optional[str]
+    # Where the package name comes from: the built-in mapping or the provides index
+    source: typing.Optional[str]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = module_name_from_path(path)
+        self.package = None
+        self.source = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r}, {self.package!r})"
+
+
+class ModulesManifest:
+    """Perl modules installed into the directory by CPAN, found by a single walk through it"""
+    directory: str
+    modules: typing.List[InstalledModule]
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.modules = []
+        for root, dirs, filenames in os.walk(directory):
+            dirs.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".pm"):
+                    self.modules.append(InstalledModule(os.path.relpath(os.path.join(root, filename), directory)))
+
+    def resolve(self, mapping: typing.Dict[str, str], index: typing.Optional["ProvidesIndex"] = None) -> None:
+        for module in self.modules:
+            if module.path in mapping:
+                module.package, module.source = mapping[module.path], "mapping"
+            elif index is not None and module.name in index:
+                module.package, module.source = index[module.name], "index"
+
+    @property
+    def unknown(self) -> typing.List[InstalledModule]:
+        return [module for module in self.modules if module.package is None]
+
+    @property
+    def packages(self) -> typing.List[str]:
+        return sorted(set(module.package for module in self.modules if module.package is not None))
+
+
+class ProvidesIndex:
+    """Packages providing perl(Module::Name) in AlmaLinux 8 repositories, by module name.
+
+    The index is built by streaming primary.xml of repositories once and stored as a small
+    tab-separated file, so next runs just load it into a dictionary.
+    """
+
+    def __init__(self, provides: typing.Dict[str, str]):
+        self._provides = provides
+
+    def __contains__(self, module: str) -> bool:
+        return module in self._provides
+
+    def __getitem__(self, module: str) -> str:
+        return self._provides[module]
+
+    def __len__(self) -> int:
+        return len(self._provides)
+
+    @classmethod
+    def load(cls, path: str) -> "ProvidesIndex":
+        provides = {}
+        with open(path, "r") as f:
+            for line in f:
+                module, _, package = line.rstrip("\n").partition("\t")
+                if package:
+                    provides[module] = package
+        return cls(provides)
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for module, package in sorted(self._provides.items()):
+                f.write(f"{module}\t{package}\n")
+        os.replace(tmp_path, path)
+
+
+def _primary_location(client: network.HttpClient, repository_url: str) -> str:
+    response = client.get(f"{repository_url}/repodata/repomd.xml")
+    if not response.ok:
+        raise OSError(f"Unable to get {repository_url}/repodata/repomd.xml: HTTP {response.status}")
+    for data in ElementTree.fromstring(response.body).iter(f"{_REPO_NAMESPACE}data"):
+        if data.get("type") == "primary":
+            return f"{repository_url}/{data.find(f'{_REPO_NAMESPACE}location').get('href')}"
+    raise ValueError(f"There is no primary metadata in {repository_url}")
+
+
+def parse_primary_provides(primary_path: str, provides: typing.Dict[str, str]) -> None:
+    """Collect perl(...) provides from the gzipped primary.xml without loading the whole document"""
+    with gzip.open(primary_path, "rb") as f:
+        for _, element in ElementTree.iterparse(f, events=("end",)):
+            if element.tag != f"{_COMMON_NAMESPACE}package":
+                continue
+
+            name = element.findtext(f"{_COMMON_NAMESPACE}name")
+            for entry in element.iterfind(f"{_COMMON_NAMESPACE}format/{_RPM_NAMESPACE}provides/{_RPM_NAMESPACE}entry"):
+                provide = entry.get("name", "")
+                # Only plain module names, not things like perl(:MODULE_COMPAT_5.26.3)
+                if provide.startswith("perl(") and provide.endswith(")") and not provide.startswith("perl(:"):
+                    # The first repository wins, the same way BaseOS packages are preferred by dnf
+                    provides.setdefault(provide[len("perl("):-1], name)
+            element.clear()
+
+
+def build_provides_index(repository_urls: typing.Iterable[str] = ALMALINUX8_REPOSITORIES_URLS) -> ProvidesIndex:
+    client = network.HttpClient()
+    provides: typing.Dict[str, str] = {}
+    started_at = time.monotonic()
+    try:
+        with tempfile.TemporaryDirectory() as download_directory:
+            for repository_url in repository_urls:
+                primary_path = os.path.join(download_directory, "primary.xml.gz")
+                client.download(_primary_location(client, repository_url), primary_path)
+                parse_primary_provides(primary_path, provides)
+                os.unlink(primary_path)
+    finally:
+        client.close()
+
+    log.debug(f"Perl modules provides index of {len(provides)} modules built in {time.monotonic() - started_at:.2f} seconds")
+    return ProvidesIndex(provides)
+
+
+def get_provides_index(state_dir: str, ttl: float = PROVIDES_INDEX_TTL) -> typing.Optional[ProvidesIndex]:
+    """Returns the cached index, rebuilding it when it is outdated. An outdated index is still
+    used when the repositories are not accessible, and None is returned when there is no index at all.
+    """
+    path = os.path.join(state_dir, PROVIDES_INDEX_FILE)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+        return ProvidesIndex.load(path)
+
+    try:
+        index = build_provides_index()
+        os.makedirs(state_dir, exist_ok=True)
+        index.save(path)
+        return index
+    except (OSError, ValueError, ElementTree.ParseError) as e:
+        log.warn(f"Unable to build perl modules provides index from AlmaLinux 8 repositories: {e}")
+
+    if os.path.exists(path):
+        return ProvidesIndex.load(path)
+    return None
+
+
+_manifests: typing.Dict[str, ModulesManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_resolved_manifest(directory: str, mapping: typing.Dict[str, str], state_dir: typing.Optional[str]) -> ModulesManifest:
+    """Manifest of installed modules with packages resolved by the mapping, and the provides index for the rest.
+    The directory is scanned once per run, so the check and the action share the result.
+    """
+    with _manifests_lock:
+        if directory not in _manifests:
+            manifest = ModulesManifest(directory)
+            manifest.resolve(mapping)
+            if manifest.unknown and state_dir is not None:
+                manifest.resolve(mapping, get_provides_index(state_dir))
+            _manifests[directory] = manifest
+        return _manifests[directory]
@@ -0,0 +1,193 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import os
+import shutil
+import tempfile
+import threading
+import time
+import typing
+
+from pleskdistup.common import log, util
+
+POSTGRESQL_SETUP_BINARY = "/usr/bin/postgresql-setup"
+# postgresql-setup redirects the pg_upgrade output to the file in the parent directory of the data directory
+UPGRADE_LOG_FILE = "upgrade_postgresql.log"
+
+MODE_AUTO = "auto"
+MODE_LINK = "link"
+MODE_COPY = "copy"
+MODES = [MODE_AUTO, MODE_LINK, MODE_COPY]
+
+# Space for the catalog and WAL of the new cluster, which are created in both modes
+NEW_CLUSTER_SPACE = 256 * 1024 * 1024
+
+_LOG_POLL_INTERVAL = 0.5
+
+
+def supports_hard_links(data_path: str) -> bool:
+    """pg_upgrade links relation files of the old cluster, moved next to the data directory
+    by postgresql-setup, into the new data directory. Both of them are in the parent directory,
+    so the probe file is created and linked there. Nothing is written into the live data directory.
+    """
+    parent_path = os.path.dirname(os.path.normpath(data_path))
+    try:
+        if os.stat(data_path).st_dev != os.stat(parent_path).st_dev:
+            log.debug(f"The {data_path!r} directory is a mount point, files can't be linked from its parent directory")
+            return False
+        fd, path = tempfile.mkstemp(prefix=".centos2alma-link-check-", dir=parent_path)
+    except OSError as e:
+        log.debug(f"Unable to create a file in {parent_path!r} to check hard links support: {e}")
+        return False
+    os.close(fd)
+
+    link_path = path + ".link"
+    try:
+        os.link(path, link_path)
+        os.unlink(link_path)
+        return True
+    except OSError as e:
+        log.debug(f"Hard links are not supported in {parent_path!r}: {e}")
+        return False
+    finally:
+        os.unlink(path)
+
+
+def choose_mode(data_path: str, requested: str = MODE_AUTO) -> str:
+    if requested != MODE_AUTO:
+        return requested
+    if supports_hard_links(data_path):
+        return MODE_LINK
+    log.info("Hard links are not supported for the PostgreSQL data directory, databases will be copied by the upgrade")
+    return MODE_COPY
+
+
+def _directory_size(path: str) -> int:
+    size = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def get_required_space(data_path: str, mode: str) -> int:
+    """Free space required on the data directory filesystem. In the copy mode every relation file
+    is duplicated, in the link mode the new cluster shares them with the old one.
+    """
+    if mode == MODE_COPY:
+        return _directory_size(data_path) + NEW_CLUSTER_SPACE
+    return NEW_CLUSTER_SPACE
+
+
+def get_available_space(data_path: str) -> int:
+    return shutil.disk_usage(data_path)[2]
+
+
+def get_setup_env(mode: str, jobs: int) -> typing.Dict[str, str]:
+    # postgresql-setup passes the options to pg_upgrade as is
+    options = [f"--jobs={max(1, jobs)}"]
+    if mode == MODE_LINK:
+        options.insert(0, "--link")
+    env = os.environ.copy()
+    env["PGSETUP_PGUPGRADE_OPTIONS"] = " ".join(options)
+    return env
+
+
+class StepTimer:
+    """Follows the pg_upgrade log while the upgrade is running and measures its steps.
+
+    pg_upgrade prints the name of a step before executing it and appends "ok" when the step is done,
+    so a step starts when its name appears in the log and finishes when the line is completed.
+    """
+    path: str
+    steps: typing.List[typing.Tuple[str, float]]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.steps = []
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._offset = 0
+        self._buffer = ""
+        self._current_name: typing.Optional[str] = None
+        self._current_started_at = 0.0
+
+    def start(self) -> None:
+        # The log could be left by a previous attempt, only the new part is relevant
+        try:
+            self._offset = os.path.getsize(self.path)
+        except OSError:
+            self._offset = 0
+        self._current_started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._follow, name="pg-upgrade-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._read()
+
+    def _follow(self) -> None:
+        while not self._stop.wait(_LOG_POLL_INTERVAL):
+            self._read()
+
+    def _read(self) -> None:
+        try:
+            with open(self.path, "r", errors="replace") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self._offset:
+                    # The log was recreated by postgresql-setup
+                    self._offset = 0
+                f.seek(self._offset)
+                data = f.read()
+                self._offset = f.tell()
+        except OSError:
+            return
+        self._parse(data, time.monotonic())
+
+    def _parse(self, data: str, now: float) -> None:
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            line = line.rstrip()
+            if line.endswith("ok") and line[:-len("ok")].strip():
+                # The name and the result of a fast step could appear in the log at once,
+                # the step is measured from the previous one then
+                self.steps.append((line[:-len("ok")].strip(), now - self._current_started_at))
+                self._current_name = None
+                self._current_started_at = now
+
+        name = self._buffer.strip()
+        if name and name != self._current_name:
+            self._current_name = name
+            self._current_started_at = now
+
+    def report(self) -> None:
+        if not self.steps:
+            log.debug(f"There are no pg_upgrade steps found in {self.path!r}")
+            return
+        log.info("pg_upgrade steps took:\n\t" + "\n\t".join(f"{name}: {duration:.2f} seconds" for name, duration in self.steps))
+
+
+def upgrade_cluster(data_path: str, mode: str, jobs: int) -> None:
+    """Upgrade the cluster by postgresql-setup and log durations of pg_upgrade steps.
+    The free space is checked right before the upgrade, so it never fails halfway because of the space.
+    """
+    required_space = get_required_space(data_path, mode)
+    available_space = get_available_space(data_path)
+    if available_space < required_space:
+        raise Exception(f"There is not enough free space to upgrade PostgreSQL databases in the {mode} mode: "
+                        f"{required_space} bytes are required, {available_space} bytes are available")
+
+    log.info(f"Upgrading PostgreSQL cluster in the {mode} mode with {max(1, jobs)} jobs")
+    timer = StepTimer(os.path.join(os.path.dirname(os.path.normpath(data_path)), UPGRADE_LOG_FILE))
+    started_at = time.monotonic()
+    timer.start()
+    try:
+        util.logged_check_call([POSTGRESQL_SETUP_BINARY, "--upgrade"], env=get_setup_env(mode, jobs))
+    finally:
+        timer.stop()
+        timer.report()
+    log.info(f"PostgreSQL cluster upgraded in {time.monotonic() - started_at:.2f} seconds")
@@ -0,0 +1,254 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+"""Minimal OpenPGP (RFC 4880, RFC 9580) parser for key ids and fingerprints of public keys
+and signatures, so we don't depend on the gpg binary and its human readable output.
+Key material and signatures are never verified here, rpm does that.
+"""
+import base64
+import hashlib
+import struct
+import typing
+
+TAG_SIGNATURE = 2
+TAG_PUBLIC_KEY = 6
+TAG_PUBLIC_SUBKEY = 14
+
+SUBPACKET_ISSUER = 16
+SUBPACKET_ISSUER_FINGERPRINT = 33
+
+_ARMOR_BEGIN = b"-----BEGIN PGP "
+_ARMOR_END = b"-----END PGP "
+
+
+class PgpError(ValueError):
+    pass
+
+
+class Packet:
+    tag: int
+    body: bytes
+
+    def __init__(self, tag: int, body: bytes):
+        self.tag = tag
+        self.body = body
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.tag}, {len(self.body)} bytes)"
+
+
+def dearmor(data: bytes) -> bytes:
+    """Binary content of all armored blocks, or the data itself if it is not armored"""
+    if _ARMOR_BEGIN not in data:
+        return data
+
+    result = b""
+    lines = iter(data.splitlines())
+    for line in lines:
+        if not line.startswith(_ARMOR_BEGIN):
+            continue
+        # Armor headers are separated from the base64 content by an empty line
+        for line in lines:
+            if not line.strip():
+                break
+        encoded = []
+        for line in lines:
+            line = line.strip()
+            if line.startswith(_ARMOR_END):
+                break
+            # The last line starting with '=' is the checksum of the block
+            if not line.startswith(b"="):
+                encoded.append(line)
+        try:
+            result += base64.b64decode(b"".join(encoded), validate=True)
+        except ValueError as e:
+            raise PgpError(f"Broken armored block: {e}")
+    return result
+
+
+def _new_format_length(data: bytes, offset: int) -> typing.Tuple[int, int, bool]:
+    """Length of the body, offset of the body and whether the length is partial"""
+    first = data[offset]
+    if first < 192:
+        return first, offset + 1, False
+    if first < 224:
+        return ((first - 192) << 8) + data[offset + 1] + 192, offset + 2, False
+    if first == 255:
+        return struct.unpack(">I", data[offset + 1:offset + 5])[0], offset + 5, False
+    return 1 << (first & 0x1f), offset + 1, True
+
+
+def iter_packets(data: bytes) -> typing.Iterator[Packet]:
+    data = dearmor(data)
+    offset = 0
+    try:
+        while offset < len(data):
+            header = data[offset]
+            if not header & 0x80:
+                raise PgpError(f"Invalid packet header 0x{header:02x} at offset {offset}")
+
+            if header & 0x40:
+                tag = header & 0x3f
+                body = b""
+                partial = True
+                offset += 1
+                while partial:
+                    length, offset, partial = _new_format_length(data, offset)
+                    body += data[offset:offset + length]
+                    offset += length
+            else:
+                tag = (header >> 2) & 0x0f
+                length_type = header & 0x03
+                if length_type == 3:
+                    # Indeterminate length: the packet lasts until the end of the data
+                    body = data[offset + 1:]
+                    offset = len(data)
+                else:
+                    start = offset + 1 + (1 << length_type)
+                    length = int.from_bytes(data[offset + 1:start], "big")
+                    body = data[start:start + length]
+                    offset = start + length
+
+            if offset > len(data):
+                raise PgpError(f"Truncated packet of type {tag}")
+            yield Packet(tag, body)
+    except (IndexError, struct.error):
+        raise PgpError(f"Truncated packet at offset {offset}")
+
+
+def _read_mpi(body: bytes, offset: int) -> typing.Tuple[bytes, int]:
+    bits = struct.unpack(">H", body[offset:offset + 2])[0]
+    end = offset + 2 + (bits + 7) // 8
+    if end > len(body):
+        raise PgpError("Truncated multiprecision integer")
+    return body[offset + 2:end], end
+
+
+class PublicKey:
+    version: int
+    algorithm: int
+    created: int
+    fingerprint: str
+    key_id: str
+    is_subkey: bool
+
+    def __init__(self, packet: Packet):
+        body = packet.body
+        if not body:
+            raise PgpError("Empty public key packet")
+        self.is_subkey = packet.tag == TAG_PUBLIC_SUBKEY
+        self.version = body[0]
+
+        if self.version in (2, 3):
+            self.created = struct.unpack(">I", body[1:5])[0]
+            self.algorithm = body[7]
+            # Only RSA keys could be of version 3: the key id is the low 64 bits of the modulus
+            modulus, offset = _read_mpi(body, 8)
+            exponent, _ = _read_mpi(body, offset)
+            self.fingerprint = hashlib.md5(modulus + exponent).hexdigest().upper()
+            self.key_id = modulus[-8:].hex()
+        elif self.version == 4:
+            self.created = struct.unpack(">I", body[1:5])[0]
+            self.algorithm = body[5]
+            digest = hashlib.sha1(b"\x99" + struct.pack(">H", len(body)) + body).digest()
+            self.fingerprint = digest.hex().upper()
+            self.key_id = digest[-8:].hex()
+        elif self.version in (5, 6):
+            self.created = struct.unpack(">I", body[1:5])[0]
+            self.algorithm = body[5]
+            prefix = b"\x9a" if self.version == 5 else b"\x9b"
+            digest = hashlib.sha256(prefix + struct.pack(">I", len(body)) + body).digest()
+            self.fingerprint = digest.hex().upper()
+            self.key_id = digest[:8].hex()
+        else:
+            raise PgpError(f"Unsupported public key version {self.version}")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.key_id!r}, subkey={self.is_subkey})"
+
+
+def parse_public_keys(data: bytes) -> typing.List[PublicKey]:
+    """Primary keys and subkeys in the order they appear in the data"""
+    return [PublicKey(packet) for packet in iter_packets(data) if packet.tag in (TAG_PUBLIC_KEY, TAG_PUBLIC_SUBKEY)]
+
+
+def read_public_keys(path: str) -> typing.List[PublicKey]:
+    with open(path, "rb") as f:
+        return parse_public_keys(f.read())
+
+
+def _subpacket_length(data: bytes, offset: int) -> typing.Tuple[int, int]:
+    # Unlike packets, subpackets have no partial lengths
+    first = data[offset]
+    if first < 192:
+        return first, offset + 1
+    if first < 255:
+        return ((first - 192) << 8) + data[offset + 1] + 192, offset + 2
+    return struct.unpack(">I", data[offset + 1:offset + 5])[0], offset + 5
+
+
+def _iter_subpackets(data: bytes) -> typing.Iterator[typing.Tuple[int, bytes]]:
+    offset = 0
+    while offset < len(data):
+        length, offset = _subpacket_length(data, offset)
+        if length == 0 or offset + length > len(data):
+            raise PgpError("Broken signature subpacket")
+        yield data[offset] & 0x7f, data[offset + 1:offset + length]
+        offset += length
+
+
+class Signature:
+    version: int
+    signature_type: int
+    # Key id of the issuer, could be missing in malformed v4 signatures
+    key_id: typing.Optional[str]
+
+    def __init__(self, packet: Packet):
+        body = packet.body
+        if not body:
+            raise PgpError("Empty signature packet")
+        self.version = body[0]
+        self.key_id = None
+
+        try:
+            if self.version in (2, 3):
+                # version, length of hashed material (always 5), type, creation time, key id
+                self.signature_type = body[2]
+                self.key_id = body[7:15].hex()
+            elif self.version in (4, 5, 6):
+                self.signature_type = body[1]
+                length_size = 4 if self.version == 6 else 2
+                length_format = ">I" if length_size == 4 else ">H"
+                offset = 4
+                areas = []
+                for _ in range(2):
+                    length = struct.unpack(length_format, body[offset:offset + length_size])[0]
+                    offset += length_size
+                    areas.append(body[offset:offset + length])
+                    offset += length
+                self.key_id = self._find_issuer(areas)
+            else:
+                raise PgpError(f"Unsupported signature version {self.version}")
+        except (IndexError, struct.error):
+            raise PgpError("Truncated signature packet")
+
+    def _find_issuer(self, areas: typing.List[bytes]) -> typing.Optional[str]:
+        # The hashed area is preferred, since the unhashed one could be changed by anyone
+        for area in areas:
+            for subpacket_type, value in _iter_subpackets(area):
+                if subpacket_type == SUBPACKET_ISSUER_FINGERPRINT and len(value) > 8:
+                    fingerprint = value[1:]
+                    return (fingerprint[:8] if value[0] in (5, 6) else fingerprint[-8:]).hex()
+                if subpacket_type == SUBPACKET_ISSUER and len(value) == 8:
+                    return value.hex()
+        return None
+
+
+def parse_signature(data: bytes) -> Signature:
+    for packet in iter_packets(data):
+        if packet.tag == TAG_SIGNATURE:
+            return Signature(packet)
+    raise PgpError("There is no signature packet")
+
+
+def get_signature_key_id(data: bytes) -> typing.Optional[str]:
+    """Key id of the key made the signature, in the lowercase hex form rpm and gpg show"""
+    return parse_signature(data).key_id
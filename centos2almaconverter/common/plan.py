@@ -0,0 +1,207 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import json
+import typing
+
+from pleskdistup.common import action, log
+
+PHASE_CONVERT = "convert"
+PHASE_FINISH = "finish"
+
+DOWNTIME_START_STAGE = "Handle plesk related services"
+DOWNTIME_END_STAGE = "First plesk start"
+
+
+class PlannedStep:
+    phase: str
+    stage: str
+    action: str
+    duration: int
+    start: int
+
+    def __init__(self, phase: str, stage: str, action_name: str, duration: int, start: int):
+        self.phase = phase
+        self.stage = stage
+        self.action = action_name
+        self.duration = duration
+        self.start = start
+
+    @property
+    def end(self) -> int:
+        return self.start + self.duration
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {"phase": self.phase, "stage": self.stage, "action": self.action, "start": self.start, "duration": self.duration}
+
+
+class PlannedStage:
+    phase: str
+    name: str
+    start: int
+    end: int
+    steps: typing.List[PlannedStep]
+
+    def __init__(self, phase: str, name: str, start: int):
+        self.phase = phase
+        self.name = name
+        self.start = start
+        self.end = start
+        self.steps = []
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+
+class PlanSimulation:
+    stages: typing.List[PlannedStage]
+    skipped: typing.List[typing.Tuple[str, str]]
+
+    def __init__(self):
+        self.stages = []
+        self.skipped = []
+
+    def phase_duration(self, phase: str) -> int:
+        stages = [stage for stage in self.stages if stage.phase == phase]
+        if not stages:
+            return 0
+        return stages[-1].end - stages[0].start
+
+    @property
+    def duration(self) -> int:
+        return self.stages[-1].end if self.stages else 0
+
+    @property
+    def critical_path(self) -> typing.List[PlannedStep]:
+        """Steps which define the total duration: everything that runs when no other step is running"""
+        path = []
+        for stage in self.stages:
+            path += _critical_chain(stage)
+        return path
+
+    def _stage(self, phase: str, name: str) -> typing.Optional[PlannedStage]:
+        for stage in self.stages:
+            if stage.phase == phase and stage.name == name:
+                return stage
+        return None
+
+    @property
+    def downtime(self) -> typing.Optional[typing.Tuple[int, int]]:
+        """Period when Plesk services are stopped: from the moment they are stopped on the conversion
+        phase until they are started again on the finishing phase, after the reboot
+        """
+        start = self._stage(PHASE_CONVERT, DOWNTIME_START_STAGE)
+        end = self._stage(PHASE_FINISH, DOWNTIME_END_STAGE)
+        if start is None or end is None:
+            return None
+        return start.start, end.end
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        downtime = self.downtime
+        return {
+            "duration": self.duration,
+            "phases": {phase: self.phase_duration(phase) for phase in (PHASE_CONVERT, PHASE_FINISH)},
+            "downtime": {"start": downtime[0], "end": downtime[1], "duration": downtime[1] - downtime[0]} if downtime else None,
+            "stages": [{"phase": stage.phase, "name": stage.name, "start": stage.start, "duration": stage.duration,
+                        "actions": [step.to_dict() for step in stage.steps]} for stage in self.stages],
+            "critical_path": [step.to_dict() for step in self.critical_path],
+            "skipped": [{"stage": stage, "action": name} for stage, name in self.skipped],
+        }
+
+
+def _critical_chain(stage: PlannedStage) -> typing.List[PlannedStep]:
+    # Steps of a stage could overlap, so the chain is traced back from the step finishing last
+    # through steps finishing exactly when the next step of the chain starts
+    if not stage.steps:
+        return []
+    chain = [max(stage.steps, key=lambda step: step.end)]
+    while chain[-1].start > stage.start:
+        predecessors = [step for step in stage.steps if step.end == chain[-1].start and step not in chain]
+        if not predecessors:
+            break
+        chain.append(max(predecessors, key=lambda step: step.duration))
+    return list(reversed(chain))
+
+
+def _is_required(act: action.ActiveAction) -> bool:
+    try:
+        return act.is_required()
+    except Exception as e:
+        # The simulation should not fail because of a single action, consider it required to not underestimate the plan
+        log.debug(f"Unable to find out if action {act.name!r} is required, considering it is: {e}")
+        return True
+
+
+def _estimate(act: action.ActiveAction, phase: str) -> int:
+    try:
+        return int(act.estimate_prepare_time() if phase == PHASE_CONVERT else act.estimate_post_time())
+    except Exception as e:
+        log.debug(f"Unable to estimate time of action {act.name!r}: {e}")
+        return 1
+
+
+def _schedule_stage(stage: PlannedStage, actions: typing.List[action.ActiveAction],
+                    durations: typing.Dict[int, int]) -> None:
+    for act in actions:
+        step = PlannedStep(stage.phase, stage.name, act.name, durations[id(act)], stage.end)
+        stage.steps.append(step)
+        stage.end = step.end
+
+
+def simulate(actions_map: typing.Dict[str, typing.Iterable[action.ActiveAction]],
+             schedule_stage: typing.Callable[[PlannedStage, typing.List[action.ActiveAction], typing.Dict[int, int]], None] = _schedule_stage,
+             ) -> PlanSimulation:
+    """Simulate both phases of the conversion with actual estimates of required actions.
+
+    Prepare steps are executed on the conversion phase in the order of stages, post steps
+    are executed on the finishing phase in the reverse order of stages and actions.
+    Actions of a stage are scheduled by schedule_stage, one by one by default.
+    """
+    simulation = PlanSimulation()
+    required = {}
+    for stage_name, actions in actions_map.items():
+        for act in actions:
+            required[id(act)] = _is_required(act)
+            if not required[id(act)]:
+                simulation.skipped.append((stage_name, act.name))
+
+    offset = 0
+    for phase, stages in ((PHASE_CONVERT, list(actions_map.items())),
+                          (PHASE_FINISH, [(name, list(reversed(list(actions)))) for name, actions in reversed(list(actions_map.items()))])):
+        for stage_name, actions in stages:
+            actions = [act for act in actions if required[id(act)]]
+            stage = PlannedStage(phase, stage_name, offset)
+            schedule_stage(stage, actions, {id(act): _estimate(act, phase) for act in actions})
+            simulation.stages.append(stage)
+            offset = stage.end
+
+    return simulation
+
+
+def _format_duration(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours:02d}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+def format_text(simulation: PlanSimulation, longest: int = 10) -> str:
+    lines = ["Simulated conversion plan:"]
+    for phase in (PHASE_CONVERT, PHASE_FINISH):
+        lines.append(f"\t{phase} phase: {_format_duration(simulation.phase_duration(phase))}")
+        for stage in simulation.stages:
+            if stage.phase == phase and stage.steps:
+                lines.append(f"\t\t{stage.name}: {_format_duration(stage.duration)}")
+    lines.append(f"\ttotal: {_format_duration(simulation.duration)}")
+
+    downtime = simulation.downtime
+    if downtime is not None:
+        lines.append(f"Plesk services and websites are expected to be down for {_format_duration(downtime[1] - downtime[0])}, "
+                     f"starting {_format_duration(downtime[0])} after the conversion start")
+
+    lines.append("Longest actions on the critical path:")
+    for step in sorted(simulation.critical_path, key=lambda step: step.duration, reverse=True)[:longest]:
+        lines.append(f"\t{_format_duration(step.duration)} {step.phase} / {step.stage} / {step.action}")
+    return "\n".join(lines)
+
+
+def write_json(simulation: PlanSimulation, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(simulation.to_dict(), f, indent=4)
@@ -0,0 +1,225 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+import typing
+
+from pleskdistup.common import action, log
+
+from centos2almaconverter.common import rpmdb
+
+
+class CheckInput:
+    """Something a check result depends on. The fingerprint changes when the input is changed."""
+
+    def fingerprint(self) -> str:
+        raise NotImplementedError("Not implemented fingerprint method")
+
+
+class FileInput(CheckInput):
+    def __init__(self, path: str):
+        self.path = path
+
+    def fingerprint(self) -> str:
+        try:
+            with open(self.path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return "missing"
+
+    def __repr__(self) -> str:
+        return f"file {self.path!r}"
+
+
+class DirectoryInput(CheckInput):
+    """Directory content. By default only names of entries are taken into account, which is
+    the only reliable option for pseudo filesystems like /sys. With the 'stat' flag modification
+    time and size of files are included as well.
+    """
+
+    def __init__(self, path: str, recursive: bool = False, stat: bool = True):
+        self.path = path
+        self.recursive = recursive
+        self.stat = stat
+
+    def _entries(self) -> typing.Iterator[str]:
+        for root, dirs, filenames in os.walk(self.path):
+            dirs.sort()
+            for name in sorted(dirs + filenames):
+                path = os.path.join(root, name)
+                if not self.stat:
+                    yield path
+                    continue
+                try:
+                    stat = os.lstat(path)
+                except FileNotFoundError:
+                    continue
+                yield f"{path}\t{stat.st_mode}\t{stat.st_size}\t{stat.st_mtime_ns}"
+            if not self.recursive:
+                break
+
+    def fingerprint(self) -> str:
+        if not os.path.isdir(self.path):
+            return "missing"
+        digest = hashlib.sha256()
+        for entry in self._entries():
+            digest.update(entry.encode("utf-8", "surrogateescape") + b"\n")
+        return digest.hexdigest()
+
+    def __repr__(self) -> str:
+        return f"directory {self.path!r}"
+
+
+class RpmdbInput(CheckInput):
+    def fingerprint(self) -> str:
+        return hashlib.sha256(repr(rpmdb.get_rpmdb_state()).encode()).hexdigest()
+
+    def __repr__(self) -> str:
+        return "rpm database"
+
+
+class CommandInput(CheckInput):
+    """Output of a cheap command, like 'uname -r'"""
+
+    def __init__(self, command: typing.List[str]):
+        self.command = command
+
+    def fingerprint(self) -> str:
+        result = subprocess.run(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        return hashlib.sha256(str(result.returncode).encode() + b"\n" + result.stdout).hexdigest()
+
+    def __repr__(self) -> str:
+        return f"command {' '.join(self.command)!r}"
+
+
+def get_inputs(check: action.CheckAction) -> typing.Optional[typing.List[CheckInput]]:
+    # Checks declare their inputs with the 'inputs' attribute. Checks without the declaration
+    # depend on something we can't track (e.g. network), so their results are never cached
+    return getattr(check, "inputs", None)
+
+
+def declare_inputs(check: action.CheckAction, inputs: typing.List[CheckInput]) -> action.CheckAction:
+    """Declare inputs for a check we can't change, e.g. one from the common framework"""
+    check.inputs = inputs
+    return check
+
+
+def _check_key(check: action.CheckAction) -> str:
+    # Checks of the same class could be parametrized, so the simple attributes are included.
+    # The key is calculated before the check is executed, so the description is still a template.
+    parameters = {name: value for name, value in sorted(vars(check).items())
+                  if name != "inputs" and isinstance(value, (str, int, float, bool, type(None), list, tuple))}
+    key = json.dumps([type(check).__module__, type(check).__qualname__, parameters], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class PrecheckCache:
+    """Results of checks stored in the state directory between runs, keyed by the fingerprint of check inputs"""
+    path: str
+    salt: str
+
+    def __init__(self, path: str, salt: str = ""):
+        self.path = path
+        self.salt = salt
+        self._lock = threading.Lock()
+        self._entries: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            log.warn(f"Unable to read pre-checks cache {self.path!r}, it will be recreated: {e}")
+
+    def fingerprint(self, inputs: typing.List[CheckInput]) -> str:
+        digest = hashlib.sha256(self.salt.encode())
+        for check_input in inputs:
+            digest.update(f"{check_input!r}\t{check_input.fingerprint()}\n".encode("utf-8", "surrogateescape"))
+        return digest.hexdigest()
+
+    def get(self, key: str, fingerprint: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        return entry
+
+    def put(self, key: str, fingerprint: str, result: bool, description: str) -> None:
+        with self._lock:
+            self._entries[key] = {
+                "fingerprint": fingerprint,
+                "result": result,
+                "description": description,
+                "checked_at": time.time(),
+            }
+            tmp_path = self.path + ".tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp_path, "w") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                log.warn(f"Unable to store pre-checks cache {self.path!r}: {e}")
+
+
+class CachedCheck(action.CheckAction):
+    """Proxy taking the check result from the cache when inputs of the check did not change"""
+    CACHED_SUFFIX = " (cached)"
+
+    def __init__(self, cache: PrecheckCache, check: action.CheckAction):
+        self._cache = cache
+        self._check = check
+        self._key = _check_key(check)
+        self._from_cache = False
+        self._description_override: typing.Optional[str] = None
+
+    @property
+    def check(self) -> action.CheckAction:
+        return self._check
+
+    @property
+    def exclusive(self) -> bool:
+        return getattr(self._check, "exclusive", False)
+
+    @property
+    def name(self) -> str:
+        if self._from_cache:
+            return self._check.name + self.CACHED_SUFFIX
+        return self._check.name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self._check.name = value
+
+    @property
+    def description(self) -> str:
+        if self._description_override is not None:
+            return self._description_override
+        return self._check.description
+
+    @description.setter
+    def description(self, value: str) -> None:
+        self._description_override = value
+
+    def _do_check(self) -> bool:
+        inputs = get_inputs(self._check)
+        fingerprint = self._cache.fingerprint(inputs)
+
+        entry = self._cache.get(self._key, fingerprint)
+        if entry is not None:
+            self._from_cache = True
+            self._description_override = entry["description"]
+            log.info(f"Result of the check {self._check.name!r} is taken from the cache, since {', '.join(repr(i) for i in inputs)} did not change")
+            return entry["result"]
+
+        result = self._check.do_check()
+        self._cache.put(self._key, fingerprint, result, self._check.description)
+        return result
+
+
+def make_cached(checks: typing.List[action.CheckAction], cache_path: str, salt: str = "") -> typing.List[action.CheckAction]:
+    cache = PrecheckCache(cache_path, salt)
+    return [CachedCheck(cache, check) if get_inputs(check) is not None else check for check in checks]
@@ -0,0 +1,219 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import collections
+import fnmatch
+import os
+import threading
+import typing
+import urllib.parse
+
+from pleskdistup.common import log, rpm
+
+REPOSITORIES_DIRECTORY = "/etc/yum.repos.d"
+
+HOST_TYPE_LOCAL = "local"
+HOST_TYPE_IP = "ip"
+HOST_TYPE_NONE = "none"
+HOST_TYPE_HOSTNAME = "hostname"
+
+
+def is_repository_enabled(repo: typing.Any) -> bool:
+    for line in repo.additional:
+        if line.startswith("enabled="):
+            return line.split("=")[1].strip() == "1"
+    return True
+
+
+def get_repository_links(repo: typing.Any) -> typing.List[str]:
+    return [link for link in (repo.url, repo.metalink, repo.mirrorlist) if link]
+
+
+def get_repository_schemes(repo: typing.Any) -> typing.Set[str]:
+    return set(urllib.parse.urlparse(link.strip()).scheme.lower() for link in get_repository_links(repo))
+
+
+def expand_repository_link(link: str, releasever: str = "7", basearch: str = "x86_64") -> str:
+    return link.strip().replace("$releasever", releasever).replace("$basearch", basearch)
+
+
+def get_repository_probe_urls(repo: typing.Any) -> typing.List[str]:
+    """Remote links of the repository with yum variables substituted, so they could be requested directly"""
+    urls = [expand_repository_link(link) for link in get_repository_links(repo)]
+    return [url for url in urls if urllib.parse.urlparse(url).scheme.lower() in ("http", "https")]
+
+
+def get_repository_gpgkeys(repo: typing.Any) -> typing.List[str]:
+    keys = []
+    for line in repo.additional:
+        if line.startswith("gpgkey="):
+            # Several keys could be listed separated by spaces or commas
+            keys += [key for key in line.split("=", 1)[1].replace(",", " ").split() if key]
+    return keys
+
+
+def get_repository_host_type(repo: typing.Any) -> str:
+    if "file" in get_repository_schemes(repo):
+        return HOST_TYPE_LOCAL
+    if rpm.repository_has_none_link(repo):
+        return HOST_TYPE_NONE
+    if rpm.repository_source_is_ip(repo):
+        return HOST_TYPE_IP
+    return HOST_TYPE_HOSTNAME
+
+
+class RepositoryFile:
+    """Parsed .repo file together with the stat data it was parsed with."""
+    path: str
+    mtime_ns: int
+    size: int
+
+    def __init__(self, path: str, mtime_ns: int, size: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self._repositories: typing.Optional[typing.List[typing.Any]] = None
+        self._error: typing.Optional[Exception] = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def is_actual(self, stat: os.stat_result) -> bool:
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+    @property
+    def repositories(self) -> typing.List[typing.Any]:
+        # Parsing errors are kept and re-raised on every request, so callers handle them the same
+        # way they would handle errors from rpm.extract_repodata
+        if self._repositories is None and self._error is None:
+            try:
+                self._repositories = list(rpm.extract_repodata(self.path))
+            except (FileNotFoundError, ValueError) as e:
+                self._error = e
+        if self._error is not None:
+            raise self._error
+        return self._repositories
+
+
+class RepositoryInventory:
+    """In-memory inventory of repositories from /etc/yum.repos.d.
+
+    Every repository file is parsed only once. The inventory is validated on each request
+    by the modification time and the size of files, so changes made by actions in between
+    are picked up without reparsing the rest of the directory.
+    """
+    directory: str
+
+    def __init__(self, directory: str = REPOSITORIES_DIRECTORY):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._files: typing.Dict[str, RepositoryFile] = {}
+        self._indexes_valid = False
+        self._by_id: typing.Dict[str, typing.List[typing.Tuple[str, typing.Any]]] = {}
+        self._by_scheme: typing.Dict[str, typing.List[typing.Tuple[str, typing.Any]]] = {}
+        self._by_host_type: typing.Dict[str, typing.List[typing.Tuple[str, typing.Any]]] = {}
+        self._by_enabled: typing.Dict[bool, typing.List[typing.Tuple[str, typing.Any]]] = {}
+
+    def _refresh(self) -> None:
+        if not os.path.isdir(self.directory):
+            if self._files:
+                self._files = {}
+                self._indexes_valid = False
+            return
+
+        actual_files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                known = self._files.get(entry.path)
+                if known is not None and known.is_actual(stat):
+                    actual_files[entry.path] = known
+                else:
+                    actual_files[entry.path] = RepositoryFile(entry.path, stat.st_mtime_ns, stat.st_size)
+                    self._indexes_valid = False
+
+        if actual_files.keys() != self._files.keys():
+            self._indexes_valid = False
+        self._files = actual_files
+
+    def _rebuild_indexes(self) -> None:
+        by_id = collections.defaultdict(list)
+        by_scheme = collections.defaultdict(list)
+        by_host_type = collections.defaultdict(list)
+        by_enabled = collections.defaultdict(list)
+
+        for path in self.find_files(["*.repo"]):
+            try:
+                repositories = self._files[path].repositories
+            except (FileNotFoundError, ValueError) as e:
+                log.warn(f"Unable to parse repository file {path!r}: {e}")
+                continue
+
+            for repo in repositories:
+                record = (path, repo)
+                by_id[repo.id].append(record)
+                for scheme in get_repository_schemes(repo):
+                    by_scheme[scheme].append(record)
+                by_host_type[get_repository_host_type(repo)].append(record)
+                by_enabled[is_repository_enabled(repo)].append(record)
+
+        self._by_id = dict(by_id)
+        self._by_scheme = dict(by_scheme)
+        self._by_host_type = dict(by_host_type)
+        self._by_enabled = dict(by_enabled)
+        self._indexes_valid = True
+
+    def _actual_index(self, index_name: str) -> typing.Dict[typing.Any, typing.List[typing.Tuple[str, typing.Any]]]:
+        with self._lock:
+            self._refresh()
+            if not self._indexes_valid:
+                self._rebuild_indexes()
+            return getattr(self, index_name)
+
+    def find_files(self, patterns: typing.Iterable[str]) -> typing.List[str]:
+        """The same as files.find_files_case_insensitive, but without walking the directory again"""
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        patterns = [pattern.lower() for pattern in patterns]
+
+        with self._lock:
+            self._refresh()
+            return sorted(path for path, repofile in self._files.items()
+                          if any(fnmatch.fnmatch(repofile.name.lower(), pattern) for pattern in patterns))
+
+    def get_repositories(self, path: str) -> typing.List[typing.Any]:
+        with self._lock:
+            self._refresh()
+            if path not in self._files:
+                raise FileNotFoundError(f"Repository file {path!r} does not exist")
+            return self._files[path].repositories
+
+    def repositories(self, patterns: typing.Iterable[str] = ("*.repo",)) -> typing.List[typing.Tuple[str, typing.Any]]:
+        return [(path, repo) for path in self.find_files(patterns) for repo in self.get_repositories(path)]
+
+    def by_id(self, repo_id: str) -> typing.List[typing.Tuple[str, typing.Any]]:
+        return list(self._actual_index("_by_id").get(repo_id, []))
+
+    def ids(self) -> typing.Dict[str, typing.List[typing.Tuple[str, typing.Any]]]:
+        return {repo_id: list(records) for repo_id, records in self._actual_index("_by_id").items()}
+
+    def by_scheme(self, scheme: str) -> typing.List[typing.Tuple[str, typing.Any]]:
+        return list(self._actual_index("_by_scheme").get(scheme.lower(), []))
+
+    def by_host_type(self, host_type: str) -> typing.List[typing.Tuple[str, typing.Any]]:
+        return list(self._actual_index("_by_host_type").get(host_type, []))
+
+    def by_enabled(self, enabled: bool = True) -> typing.List[typing.Tuple[str, typing.Any]]:
+        return list(self._actual_index("_by_enabled").get(enabled, []))
+
+
+_inventories: typing.Dict[str, RepositoryInventory] = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(directory: str = REPOSITORIES_DIRECTORY) -> RepositoryInventory:
+    with _inventories_lock:
+        if directory not in _inventories:
+            _inventories[directory] = RepositoryInventory(directory)
+        return _inventories[directory]
@@ -0,0 +1,157 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import collections
+import os
+import subprocess
+import threading
+import typing
+
+from pleskdistup.common import log
+
+from centos2almaconverter.common import pgp
+
+RPM_BINARY = "/usr/bin/rpm"
+RPMDB_FILES = [
+    "/var/lib/rpm/Packages",
+    "/var/lib/rpm/rpmdb.sqlite",
+]
+
+_FIELDS_SEPARATOR = "\t"
+# Signature tags are queried raw, rpm shows binary tags as hex strings. This way we get the exact
+# key id from the signature packet instead of searching it in the human readable ':pgpsig' form.
+_QUERY_FORMAT = _FIELDS_SEPARATOR.join([
+    "%{NAME}", "%{EPOCH}", "%{VERSION}", "%{RELEASE}", "%{ARCH}", "%{SIZE}",
+    "%{SIGPGP}", "%{RSAHEADER}",
+]) + "\n"
+
+
+def _parse_key_id(signature: str) -> typing.Optional[str]:
+    # Missing tags are shown as '(none)'
+    if not signature or signature == "(none)":
+        return None
+    try:
+        return pgp.get_signature_key_id(bytes.fromhex(signature))
+    except ValueError as e:
+        log.debug(f"Unable to parse package signature: {e}")
+        return None
+
+
+class Package:
+    __slots__ = ("name", "epoch", "version", "release", "arch", "size", "key_id")
+
+    def __init__(self, name: str, epoch: typing.Optional[int], version: str, release: str,
+                 arch: str, size: int, key_id: typing.Optional[str]):
+        self.name = name
+        self.epoch = epoch
+        self.version = version
+        self.release = release
+        self.arch = arch
+        self.size = size
+        self.key_id = key_id
+
+    @property
+    def evr(self) -> str:
+        if self.epoch:
+            return f"{self.epoch}:{self.version}-{self.release}"
+        return f"{self.version}-{self.release}"
+
+    @property
+    def nvra(self) -> str:
+        # The same format 'rpm -q' uses to show installed packages
+        return f"{self.name}-{self.version}-{self.release}.{self.arch}"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r}, {self.evr!r}, {self.arch!r})"
+
+    @classmethod
+    def from_query_line(cls, line: str) -> "Package":
+        name, epoch, version, release, arch, size, sigpgp, rsaheader = line.split(_FIELDS_SEPARATOR)
+        return cls(
+            name,
+            int(epoch) if epoch.isdigit() else None,
+            version,
+            release,
+            arch,
+            int(size) if size.isdigit() else 0,
+            _parse_key_id(sigpgp) or _parse_key_id(rsaheader),
+        )
+
+
+class InstalledPackages:
+    """Snapshot of the rpm database made by a single 'rpm -qa' call, indexed by package name."""
+
+    def __init__(self, packages: typing.Iterable[Package]):
+        self._by_name: typing.Dict[str, typing.List[Package]] = collections.defaultdict(list)
+        # Packages could be requested not only by name, but also in the name-version-release form
+        self._specs: typing.Set[str] = set()
+        self._count = 0
+        for package in packages:
+            self._by_name[package.name].append(package)
+            self._specs.update((
+                f"{package.name}-{package.version}",
+                f"{package.name}-{package.version}-{package.release}",
+                package.nvra,
+            ))
+            self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> typing.Iterator[Package]:
+        for packages in self._by_name.values():
+            yield from packages
+
+    def get(self, name: str) -> typing.List[Package]:
+        return list(self._by_name.get(name, []))
+
+    def is_installed(self, spec: str) -> bool:
+        return spec in self._by_name or spec in self._specs
+
+    def filter_installed(self, specs: typing.Iterable[str]) -> typing.List[str]:
+        """The same as rpm.filter_installed_packages, but without calling rpm for every package"""
+        return [spec for spec in specs if self.is_installed(spec)]
+
+
+def get_rpmdb_state() -> typing.Tuple[typing.Tuple[str, int, int], ...]:
+    state = []
+    for path in RPMDB_FILES:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        state.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(state)
+
+
+def load_installed_packages() -> InstalledPackages:
+    output = subprocess.check_output([RPM_BINARY, "-qa", "--queryformat", _QUERY_FORMAT], universal_newlines=True)
+    return InstalledPackages(Package.from_query_line(line) for line in output.splitlines() if line)
+
+
+_lock = threading.Lock()
+_snapshot: typing.Optional[InstalledPackages] = None
+_snapshot_state: typing.Optional[typing.Tuple[typing.Tuple[str, int, int], ...]] = None
+
+
+def get_installed_packages() -> InstalledPackages:
+    """Returns snapshot of installed packages. The snapshot is shared by all actions and checks
+    and rebuilt only when the rpm database is changed.
+    """
+    global _snapshot, _snapshot_state
+
+    with _lock:
+        state = get_rpmdb_state()
+        if _snapshot is None or state != _snapshot_state:
+            _snapshot = load_installed_packages()
+            _snapshot_state = state
+            log.debug(f"Loaded {len(_snapshot)} installed packages from the rpm database")
+        return _snapshot
+
+
+def invalidate() -> None:
+    # Should be called by anyone who changes the rpm database in a way that
+    # could be missed by the database files modification time check
+    global _snapshot, _snapshot_state
+
+    with _lock:
+        _snapshot = None
+        _snapshot_state = None
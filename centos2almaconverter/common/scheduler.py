@@ -0,0 +1,354 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import os
+import threading
+import typing
+
+from pleskdistup.common import action, log
+
+from centos2almaconverter.common import plan, workers
+
+# Resources actions declare in the 'resources' class attribute. An action holds a resource
+# exclusively unless it is wrapped by shared(), which means the action only reads it.
+RESOURCE_RPMDB = "rpmdb"
+RESOURCE_PACKAGE_TRANSACTIONS = "package-transactions"
+RESOURCE_LEAPP_CONFIGS = "leapp-configs"
+RESOURCE_REPOSITORIES = "repositories"
+RESOURCE_NETWORK = "network"
+RESOURCE_PLESK_INSTALLER = "plesk-installer"
+RESOURCE_MOTD = "motd"
+
+_SHARED_PREFIX = "shared:"
+_PATH_PREFIX = "path:"
+
+STEP_PREPARE = "prepare"
+STEP_POST = "post"
+
+_PENDING = "pending"
+_RUNNING = "running"
+_DONE = "done"
+_SKIPPED = "skipped"
+_FAILED = "failed"
+_CANCELLED = "cancelled"
+_REVERTED = "reverted"
+_FINAL_STATES = (_DONE, _SKIPPED, _FAILED, _CANCELLED, _REVERTED)
+
+
+def systemd_unit(name: str) -> str:
+    return f"systemd:{name}"
+
+
+def path(file_path: str) -> str:
+    # Paths conflict with everything inside them, so a directory covers all its files
+    return _PATH_PREFIX + os.path.normpath(file_path)
+
+
+def shared(resource: str) -> str:
+    return _SHARED_PREFIX + resource
+
+
+def get_resources(act: action.ActiveAction) -> typing.Optional[typing.Dict[str, bool]]:
+    """Resources used by the action mapped to True if the action holds them exclusively.
+    None means the action declares nothing, so it conflicts with any other action.
+    """
+    if isinstance(act, ScheduledAction):
+        act = act.wrapped
+
+    declared = getattr(act, "resources", None)
+    if declared is None:
+        return None
+
+    resources: typing.Dict[str, bool] = {}
+    for resource in declared:
+        exclusive = not resource.startswith(_SHARED_PREFIX)
+        if not exclusive:
+            resource = resource[len(_SHARED_PREFIX):]
+        resources[resource] = resources.get(resource, False) or exclusive
+    return resources
+
+
+def _same_resource(first: str, second: str) -> bool:
+    if first == second:
+        return True
+    if first.startswith(_PATH_PREFIX) and second.startswith(_PATH_PREFIX):
+        first, second = first[len(_PATH_PREFIX):], second[len(_PATH_PREFIX):]
+        return first.startswith(second.rstrip("/") + "/") or second.startswith(first.rstrip("/") + "/")
+    return False
+
+
+def conflicts(first: action.ActiveAction, second: action.ActiveAction) -> bool:
+    first_resources = get_resources(first)
+    second_resources = get_resources(second)
+    if first_resources is None or second_resources is None:
+        return True
+
+    for first_resource, first_exclusive in first_resources.items():
+        for second_resource, second_exclusive in second_resources.items():
+            if (first_exclusive or second_exclusive) and _same_resource(first_resource, second_resource):
+                return True
+    return False
+
+
+class ScheduledAction(action.ActiveAction):
+    """Proxy for an action executed by StageScheduler.
+    The framework still calls actions of the stage one by one in the usual order,
+    but the proxy only waits for the step executed in the background.
+    Reverts are passed to the action as is, so they stay sequential.
+    """
+
+    def __init__(self, scheduler: "StageScheduler", act: action.ActiveAction):
+        self._scheduler = scheduler
+        self._action = act
+
+    @property
+    def wrapped(self) -> action.ActiveAction:
+        return self._action
+
+    @property
+    def name(self) -> str:
+        return self._action.name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self._action.name = value
+
+    def is_required(self) -> bool:
+        return self._scheduler.is_required(self)
+
+    def _is_required(self) -> bool:
+        return self._scheduler.is_required(self)
+
+    def _prepare_action(self) -> action.ActionResult:
+        return self._scheduler.run(self, STEP_PREPARE)
+
+    def _post_action(self) -> action.ActionResult:
+        return self._scheduler.run(self, STEP_POST)
+
+    def _revert_action(self) -> action.ActionResult:
+        return self._scheduler.revert(self)
+
+    def estimate_prepare_time(self) -> int:
+        return self._action.estimate_prepare_time()
+
+    def estimate_post_time(self) -> int:
+        return self._action.estimate_post_time()
+
+    def estimate_revert_time(self) -> int:
+        return self._action.estimate_revert_time()
+
+
+def _invoke(act: action.ActiveAction, step: str) -> action.ActionResult:
+    if step == STEP_PREPARE:
+        return act.invoke_prepare()
+    return act.invoke_post()
+
+
+class _StepRun:
+    """One step of stage actions, executed in the order the framework would execute them.
+
+    An action is started when every previous action it conflicts with is finished and there is
+    a free worker. After a failure no action following the failed one is started anymore.
+    """
+    step: str
+    proxies: typing.List[ScheduledAction]
+
+    def __init__(self, proxies: typing.List[ScheduledAction], step: str, jobs: int):
+        self.step = step
+        self.proxies = proxies
+        self.jobs = jobs
+        self._dependencies = [[previous for previous in range(index) if conflicts(proxies[index], proxies[previous])]
+                              for index in range(len(proxies))]
+        self._states = [_PENDING] * len(proxies)
+        self._results: typing.List[typing.Optional[action.ActionResult]] = [None] * len(proxies)
+        self._errors: typing.List[typing.Optional[BaseException]] = [None] * len(proxies)
+        self._failed_at: typing.Optional[int] = None
+        self._condition = threading.Condition()
+        self._pool = workers.WorkerPool(jobs, name=f"stage-{step}")
+        threading.Thread(target=self._schedule, name=f"stage-{step}-scheduler", daemon=True).start()
+
+    def index(self, proxy: ScheduledAction) -> typing.Optional[int]:
+        for index, candidate in enumerate(self.proxies):
+            if candidate is proxy:
+                return index
+        return None
+
+    def _ready(self, index: int) -> bool:
+        return all(self._states[dependency] in (_DONE, _SKIPPED) for dependency in self._dependencies[index])
+
+    def _schedule(self) -> None:
+        try:
+            with self._condition:
+                while True:
+                    running = self._states.count(_RUNNING)
+                    for index, state in enumerate(self._states):
+                        if state != _PENDING:
+                            continue
+                        if self._failed_at is not None and index > self._failed_at:
+                            self._states[index] = _CANCELLED
+                        elif running < self.jobs and self._ready(index):
+                            self._states[index] = _RUNNING
+                            running += 1
+                            self._pool.submit(lambda index=index: self._run(index), self.proxies[index].name)
+
+                    if all(state in _FINAL_STATES for state in self._states):
+                        self._condition.notify_all()
+                        return
+                    self._condition.wait()
+        finally:
+            self._pool.shutdown()
+
+    def _run(self, index: int) -> None:
+        act = self.proxies[index].wrapped
+        result, error = None, None
+        try:
+            if act.is_required():
+                log.debug(f"Starting {self.step} step of action {act.name!r}")
+                result = _invoke(act, self.step)
+                state = _DONE
+            else:
+                state = _SKIPPED
+        except BaseException as e:
+            error = e
+            state = _FAILED
+
+        with self._condition:
+            self._states[index] = state
+            self._results[index] = result
+            self._errors[index] = error
+            if state == _FAILED and (self._failed_at is None or index < self._failed_at):
+                self._failed_at = index
+            self._condition.notify_all()
+
+    def wait(self, index: int) -> typing.Tuple[str, typing.Optional[action.ActionResult], typing.Optional[BaseException]]:
+        with self._condition:
+            while self._states[index] not in _FINAL_STATES:
+                self._condition.wait()
+            return self._states[index], self._results[index], self._errors[index]
+
+    def wait_all(self) -> None:
+        with self._condition:
+            while not all(state in _FINAL_STATES for state in self._states):
+                self._condition.wait()
+
+    def revert_following(self, index: int) -> None:
+        """Revert actions placed after the failed one, but already prepared concurrently.
+        The framework doesn't know they were executed, so it reverts only the previous ones.
+        """
+        self.wait_all()
+        for following in reversed(range(index + 1, len(self.proxies))):
+            if self._states[following] != _DONE:
+                continue
+            act = self.proxies[following].wrapped
+            log.info(f"Reverting action {act.name!r} prepared concurrently with the failed one")
+            try:
+                act.invoke_revert()
+            except Exception as e:
+                log.err(f"Unable to revert action {act.name!r}: {e}")
+            with self._condition:
+                self._states[following] = _REVERTED
+
+    def is_reverted(self, index: int) -> bool:
+        with self._condition:
+            return self._states[index] == _REVERTED
+
+
+class StageScheduler:
+    """Runs non-conflicting actions of one stage concurrently.
+
+    Actions declare resources they use in the 'resources' attribute. Two actions conflict when they
+    use the same resource and at least one of them holds it exclusively; actions without declared
+    resources conflict with all the others. A conflicting action is never started before the previous
+    one is finished, so the stage result is the same as for sequential execution.
+
+    Steps are started in the background when the framework invokes the first action of the stage.
+    Post steps are executed in the reverse order, the same way the framework does it.
+    """
+    jobs: int
+
+    def __init__(self, actions: typing.Iterable[action.ActiveAction], jobs: int):
+        self.jobs = jobs
+        self.proxies = [ScheduledAction(self, act) for act in actions]
+        self._runs: typing.Dict[str, _StepRun] = {}
+        self._lock = threading.Lock()
+
+    def _current_run(self, proxy: ScheduledAction) -> typing.Optional[_StepRun]:
+        with self._lock:
+            for run in self._runs.values():
+                if run.index(proxy) is not None:
+                    return run
+        return None
+
+    def _start(self, proxy: ScheduledAction, step: str) -> _StepRun:
+        with self._lock:
+            if step not in self._runs:
+                order = self.proxies if step == STEP_PREPARE else list(reversed(self.proxies))
+                # Actions before the first invoked one were skipped by the framework
+                first = [index for index, candidate in enumerate(order) if candidate is proxy][0]
+                self._runs[step] = _StepRun(order[first:], step, self.jobs)
+                log.debug(f"Started {step} step of {len(order) - first} actions in {self.jobs} threads")
+            return self._runs[step]
+
+    def is_required(self, proxy: ScheduledAction) -> bool:
+        run = self._current_run(proxy)
+        if run is None:
+            return proxy.wrapped.is_required()
+
+        state, _, _ = run.wait(run.index(proxy))
+        if state == _SKIPPED:
+            return False
+        if state == _CANCELLED:
+            return proxy.wrapped.is_required()
+        return True
+
+    def run(self, proxy: ScheduledAction, step: str) -> action.ActionResult:
+        run = self._start(proxy, step)
+        index = run.index(proxy)
+        if index is None:
+            return _invoke(proxy.wrapped, step)
+
+        state, result, error = run.wait(index)
+        if state == _FAILED:
+            if step == STEP_PREPARE:
+                run.revert_following(index)
+            else:
+                run.wait_all()
+            raise error
+        if state == _CANCELLED:
+            return _invoke(proxy.wrapped, step)
+        if result is None:
+            return action.ActionResult()
+        return result
+
+    def revert(self, proxy: ScheduledAction) -> action.ActionResult:
+        run = self._runs.get(STEP_PREPARE)
+        index = run.index(proxy) if run is not None else None
+        if index is not None and run.is_reverted(index):
+            log.debug(f"Action {proxy.name!r} is reverted already")
+            return action.ActionResult()
+        return proxy.wrapped.invoke_revert()
+
+
+def make_concurrent(actions: typing.List[action.ActiveAction], jobs: int) -> typing.List[action.ActiveAction]:
+    if jobs <= 1 or len(actions) <= 1:
+        return actions
+    return StageScheduler(actions, jobs).proxies
+
+
+def plan_stage(jobs: int) -> typing.Callable[..., None]:
+    """Stage scheduling for plan.simulate that follows StageScheduler. Stages which are not
+    executed by the scheduler are simulated sequentially.
+    """
+    def schedule(stage: plan.PlannedStage, actions: typing.List[action.ActiveAction], durations: typing.Dict[int, int]) -> None:
+        concurrent = all(isinstance(act, ScheduledAction) for act in actions)
+        free_at = [stage.start] * (jobs if concurrent else 1)
+        ends: typing.List[int] = []
+        for index, act in enumerate(actions):
+            ready_at = max([ends[previous] for previous in range(index) if not concurrent or conflicts(act, actions[previous])],
+                           default=stage.start)
+            worker = min(range(len(free_at)), key=lambda worker: free_at[worker])
+            step = plan.PlannedStep(stage.phase, stage.name, act.name, durations[id(act)], max(ready_at, free_at[worker]))
+            free_at[worker] = step.end
+            ends.append(step.end)
+            stage.steps.append(step)
+            stage.end = max(stage.end, step.end)
+
+    return schedule
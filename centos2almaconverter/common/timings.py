@@ -0,0 +1,224 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import json
+import os
+import statistics
+import threading
+import time
+import typing
+
+from pleskdistup.common import action, log
+
+from centos2almaconverter.common import rpmdb
+
+# The history is kept outside of the state directory, because the state directory
+# could be removed at the end of the conversion, and the next runs need the history
+HISTORY_PATH = "/var/lib/centos2alma/actions_timings.json"
+# Only the latest runs are kept, older ones describe a server which likely looks different now
+HISTORY_RUNS = 20
+
+STEP_PREPARE = "prepare"
+STEP_POST = "post"
+STEP_REVERT = "revert"
+_STEP_METHODS = {
+    STEP_PREPARE: ("_prepare_action", "estimate_prepare_time"),
+    STEP_POST: ("_post_action", "estimate_post_time"),
+    STEP_REVERT: ("_revert_action", "estimate_revert_time"),
+}
+
+FEATURE_PACKAGES = "packages"
+FEATURE_DOMAINS = "domains"
+FEATURE_DATABASES_SIZE = "databases_size"
+
+VHOSTS_SYSTEM_DIRECTORY = "/var/www/vhosts/system"
+DATABASES_DIRECTORIES = ["/var/lib/mysql", "/var/lib/pgsql"]
+
+
+def _directory_size(path: str) -> int:
+    size = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _collect_features() -> typing.Dict[str, float]:
+    features: typing.Dict[str, float] = {}
+    try:
+        features[FEATURE_PACKAGES] = len(rpmdb.get_installed_packages())
+    except Exception as e:
+        log.debug(f"Unable to count installed packages for actions timings: {e}")
+    if os.path.isdir(VHOSTS_SYSTEM_DIRECTORY):
+        features[FEATURE_DOMAINS] = len(os.listdir(VHOSTS_SYSTEM_DIRECTORY))
+    # In megabytes, to keep the numbers in the history readable
+    features[FEATURE_DATABASES_SIZE] = sum(_directory_size(path) for path in DATABASES_DIRECTORIES) / (1024 * 1024)
+    return features
+
+
+_features: typing.Optional[typing.Dict[str, float]] = None
+_features_lock = threading.Lock()
+
+
+def get_host_features() -> typing.Dict[str, float]:
+    """Host properties durations of actions depend on. Collected once per run."""
+    global _features
+    with _features_lock:
+        if _features is None:
+            _features = _collect_features()
+        return _features
+
+
+def action_key(stage: str, act: action.ActiveAction) -> str:
+    return f"{stage}: {act.name}"
+
+
+class TimingsHistory:
+    """Durations of actions measured by previous runs on the server.
+
+    Every run adds a record with host features and durations of each action step,
+    stages and the whole phase. The record is written after every finished step,
+    so durations measured before a failure are kept as well.
+    """
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.runs: typing.List[typing.Dict[str, typing.Any]] = []
+        try:
+            with open(self.path, "r") as f:
+                self.runs = json.load(f).get("runs", [])
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError, AttributeError) as e:
+            log.warn(f"Unable to read actions timings history {self.path!r}, it will be recreated: {e}")
+        self._current: typing.Optional[typing.Dict[str, typing.Any]] = None
+
+    def start_run(self, phase: str) -> None:
+        with self._lock:
+            self._current = {
+                "phase": phase,
+                "started_at": time.time(),
+                "finished_at": None,
+                "features": None,
+                "actions": {},
+                "stages": {},
+            }
+
+    def record(self, stage: str, key: str, step: str, duration: float) -> None:
+        # Features are collected on the first record only, so runs with nothing to do stay cheap
+        features = get_host_features()
+        with self._lock:
+            if self._current is None:
+                return
+            if self._current["features"] is None:
+                self._current["features"] = features
+                self.runs = (self.runs + [self._current])[-HISTORY_RUNS:]
+
+            self._current["actions"].setdefault(key, {})[step] = round(duration, 3)
+            stages = self._current["stages"]
+            stages[stage] = round(stages.get(stage, 0.0) + duration, 3)
+            self._current["finished_at"] = time.time()
+            self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"runs": self.runs}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warn(f"Unable to store actions timings history {self.path!r}: {e}")
+
+    def samples(self, key: str, step: str) -> typing.List[typing.Tuple[typing.Dict[str, float], float]]:
+        with self._lock:
+            return [(run["features"] or {}, run["actions"][key][step])
+                    for run in self.runs if run is not self._current and step in run["actions"].get(key, {})]
+
+
+def estimate(samples: typing.List[typing.Tuple[typing.Dict[str, float], float]], feature: typing.Optional[str],
+             current: typing.Dict[str, float]) -> typing.Optional[float]:
+    """Estimate a duration from previous measurements, or None if there are none.
+
+    Without a feature the median of previous durations is used. With a feature, durations
+    are considered growing linearly with it: a line is fitted by least squares when there
+    are measurements for different feature values, otherwise the duration per feature unit is scaled.
+    """
+    if not samples:
+        return None
+
+    durations = [duration for _, duration in samples]
+    if feature is None or current.get(feature) is None:
+        return statistics.median(durations)
+
+    points = [(features[feature], duration) for features, duration in samples if features.get(feature)]
+    if not points:
+        return statistics.median(durations)
+
+    value = current[feature]
+    xs = [x for x, _ in points]
+    if len(set(xs)) >= 2:
+        mean_x = statistics.mean(xs)
+        mean_y = statistics.mean(y for _, y in points)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x in xs)
+        # A decreasing line is noise rather than a dependency, the plain scaling is safer then
+        if slope >= 0:
+            return mean_y + slope * (value - mean_x)
+
+    return statistics.median(y / x for x, y in points) * value
+
+
+class _Instrumented:
+    def __init__(self, history: TimingsHistory, stage: str, act: action.ActiveAction):
+        self.history = history
+        self.stage = stage
+        self.action = act
+        self.key = action_key(stage, act)
+        self.feature = getattr(act, "timing_feature", None)
+
+    def wrap_step(self, step: str, method: typing.Callable[[], action.ActionResult]) -> typing.Callable[[], action.ActionResult]:
+        def measured() -> action.ActionResult:
+            started_at = time.monotonic()
+            result = method()
+            self.history.record(self.stage, self.key, step, time.monotonic() - started_at)
+            return result
+        return measured
+
+    def wrap_estimate(self, step: str, method: typing.Callable[[], int]) -> typing.Callable[[], int]:
+        def estimated() -> int:
+            samples = self.history.samples(self.key, step)
+            if not samples:
+                return method()
+            value = estimate(samples, self.feature, get_host_features() if self.feature else {})
+            return max(1, int(round(value)))
+        return estimated
+
+
+_histories: typing.Dict[str, TimingsHistory] = {}
+_histories_lock = threading.Lock()
+
+
+def get_history(path: str = HISTORY_PATH) -> TimingsHistory:
+    with _histories_lock:
+        if path not in _histories:
+            _histories[path] = TimingsHistory(path)
+        return _histories[path]
+
+
+def instrument(actions_map: typing.Dict[str, typing.Iterable[action.ActiveAction]], phase: str, history_path: str = HISTORY_PATH) -> None:
+    """Measure steps of all actions and replace their static time estimates by ones learned
+    from the history. Actions without history keep their own estimates.
+    """
+    history = get_history(history_path)
+    history.start_run(phase)
+    for stage, actions in actions_map.items():
+        for act in actions:
+            instrumented = _Instrumented(history, stage, act)
+            for step, (step_method, estimate_method) in _STEP_METHODS.items():
+                if hasattr(act, step_method):
+                    setattr(act, step_method, instrumented.wrap_step(step, getattr(act, step_method)))
+                if hasattr(act, estimate_method):
+                    setattr(act, estimate_method, instrumented.wrap_estimate(step, getattr(act, estimate_method)))
@@ -0,0 +1,266 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import typing
+
+from pleskdistup.common import log, rpm, systemd, util
+
+from centos2almaconverter.common import metadata, rpmdb
+
+OPERATION_INSTALL = "install"
+OPERATION_REMOVE = "remove"
+OPERATION_SWAP = "swap"
+OPERATION_MODULE_ENABLE = "module enable"
+OPERATION_MODULE_DISABLE = "module disable"
+
+_MODULE_OPERATIONS = (OPERATION_MODULE_ENABLE, OPERATION_MODULE_DISABLE)
+
+
+class TransactionFailedError(Exception):
+    def __init__(self, requester: str, operation: "Operation", original_exception: Exception):
+        super().__init__(f"Package operation {operation} requested by {requester!r} failed: {original_exception}")
+        self.requester = requester
+        self.operation = operation
+        self.original_exception = original_exception
+
+
+class Operation:
+    kind: str
+    requester: str
+    remove: typing.List[str]
+    install: typing.List[str]
+    modules: typing.List[str]
+    repository: typing.Optional[str]
+    systemctl_stub: bool
+    on_success: typing.Optional[typing.Callable[[], None]]
+
+    def __init__(
+        self,
+        kind: str,
+        requester: str,
+        remove: typing.Optional[typing.List[str]] = None,
+        install: typing.Optional[typing.List[str]] = None,
+        modules: typing.Optional[typing.List[str]] = None,
+        repository: typing.Optional[str] = None,
+        systemctl_stub: bool = False,
+        on_success: typing.Optional[typing.Callable[[], None]] = None,
+    ):
+        self.kind = kind
+        self.requester = requester
+        self.remove = list(remove or [])
+        self.install = list(install or [])
+        self.modules = list(modules or [])
+        self.repository = repository
+        self.systemctl_stub = systemctl_stub
+        self.on_success = on_success
+
+    @property
+    def is_module_operation(self) -> bool:
+        return self.kind in _MODULE_OPERATIONS
+
+    @property
+    def isolated(self) -> bool:
+        # Operations bound to a specific repository or to the systemctl stub can't share
+        # a transaction with others, because the options affect the whole transaction
+        return self.repository is not None or self.systemctl_stub
+
+    def __str__(self) -> str:
+        if self.is_module_operation:
+            return f"'{self.kind} {' '.join(self.modules)}'"
+        details = []
+        if self.remove:
+            details.append(f"remove {', '.join(self.remove)}")
+        if self.install:
+            details.append(f"install {', '.join(self.install)}")
+        if self.repository:
+            details.append(f"from repository {self.repository}")
+        return f"'{self.kind}' ({'; '.join(details)})"
+
+
+class Transaction:
+    """Group of operations executed by a single package manager call for removal and a single one for installation"""
+    operations: typing.List[Operation]
+
+    def __init__(self, operations: typing.List[Operation]):
+        self.operations = operations
+
+    @property
+    def is_module_transaction(self) -> bool:
+        return self.operations[0].is_module_operation
+
+    def _run_module_operations(self, operations: typing.List[Operation]) -> None:
+        # Sequential operations of the same kind are merged, but the order of enabling
+        # and disabling is kept, since the last one defines the result
+        index = 0
+        while index < len(operations):
+            kind = operations[index].kind
+            modules = []
+            while index < len(operations) and operations[index].kind == kind:
+                modules += [module for module in operations[index].modules if module not in modules]
+                index += 1
+            util.logged_check_call([metadata.DNF_BINARY, "-q", "-y"] + kind.split() + modules)
+
+    def _run_package_operations(self, operations: typing.List[Operation]) -> None:
+        to_remove = []
+        to_install = []
+        for operation in operations:
+            to_remove += [pkg for pkg in operation.remove if pkg not in to_remove]
+            to_install += [pkg for pkg in operation.install if pkg not in to_install]
+
+        # Packages could be already removed by a previous attempt, and rpm fails to remove missing ones
+        to_remove = rpmdb.get_installed_packages().filter_installed(to_remove)
+        if to_remove:
+            rpm.remove_packages(to_remove)
+        if not to_install:
+            return
+
+        command = [metadata.DNF_BINARY, "install", "-y"] + metadata.get_metadata_cache(metadata.DNF_BINARY).cache_only_args()
+        if operations[0].repository is not None:
+            command += ["--repo", operations[0].repository]
+        command += to_install
+
+        if operations[0].systemctl_stub:
+            # Prevents post-install scripts from calling systemd daemon-reload and breaking the conversion service
+            with systemd.systemctl_stub():
+                util.logged_check_call(command)
+        else:
+            util.logged_check_call(command)
+
+    def _run(self, operations: typing.List[Operation]) -> None:
+        if self.is_module_transaction:
+            self._run_module_operations(operations)
+        else:
+            self._run_package_operations(operations)
+
+    def _is_applied(self, operation: Operation) -> bool:
+        if operation.is_module_operation:
+            return False
+        installed = rpmdb.get_installed_packages()
+        return not installed.filter_installed(operation.remove) and all(installed.is_installed(pkg) for pkg in operation.install)
+
+    def execute(self) -> None:
+        log.info(f"Executing package transaction of {len(self.operations)} operations requested by: "
+                 f"{', '.join(sorted(set(operation.requester for operation in self.operations)))}")
+        try:
+            self._run(self.operations)
+        except Exception as e:
+            if len(self.operations) == 1:
+                raise TransactionFailedError(self.operations[0].requester, self.operations[0], e)
+
+            # Run operations one by one to find out which action requested the broken one.
+            # The combined transaction could be applied partially, so operations are checked
+            # against the current rpm database, and the applied ones are not repeated.
+            log.warn(f"Combined package transaction failed: {e}. Retrying operations one by one.")
+            rpmdb.invalidate()
+            for operation in self.operations:
+                if self._is_applied(operation):
+                    log.debug(f"Package operation {operation} requested by {operation.requester!r} is applied already")
+                    continue
+                try:
+                    self._run([operation])
+                except Exception as e:
+                    raise TransactionFailedError(operation.requester, operation, e)
+
+        for operation in self.operations:
+            if operation.on_success is None:
+                continue
+            try:
+                operation.on_success()
+            except Exception as e:
+                raise TransactionFailedError(operation.requester, operation, e)
+
+
+class TransactionPlanner:
+    """Collects package operations from actions and executes them as the fewest ordered transactions possible.
+
+    Consecutive package operations share one transaction, module operations split them, because
+    they change the set of available packages. Isolated operations get a transaction of their own.
+    Full system update is requested by many actions, but performed only once at the very end.
+    """
+    pending: typing.List[Operation]
+    update_requesters: typing.List[str]
+
+    def __init__(self):
+        self.pending = []
+        self.update_requesters = []
+
+    def install(self, packages: typing.List[str], requester: str, repository: typing.Optional[str] = None,
+                systemctl_stub: bool = False, on_success: typing.Optional[typing.Callable[[], None]] = None) -> None:
+        self.pending.append(Operation(OPERATION_INSTALL, requester, install=packages, repository=repository,
+                                      systemctl_stub=systemctl_stub, on_success=on_success))
+
+    def remove(self, packages: typing.List[str], requester: str,
+               on_success: typing.Optional[typing.Callable[[], None]] = None) -> None:
+        self.pending.append(Operation(OPERATION_REMOVE, requester, remove=packages, on_success=on_success))
+
+    def swap(self, remove: typing.List[str], install: typing.List[str], requester: str,
+             repository: typing.Optional[str] = None, on_success: typing.Optional[typing.Callable[[], None]] = None) -> None:
+        self.pending.append(Operation(OPERATION_SWAP, requester, remove=remove, install=install,
+                                      repository=repository, on_success=on_success))
+
+    def module_enable(self, modules: typing.List[str], requester: str) -> None:
+        self.pending.append(Operation(OPERATION_MODULE_ENABLE, requester, modules=modules))
+
+    def module_disable(self, modules: typing.List[str], requester: str) -> None:
+        self.pending.append(Operation(OPERATION_MODULE_DISABLE, requester, modules=modules))
+
+    def update(self, requester: str) -> None:
+        self.update_requesters.append(requester)
+
+    def plan(self) -> typing.List[Transaction]:
+        transactions: typing.List[Transaction] = []
+        current: typing.List[Operation] = []
+
+        def close_current() -> None:
+            nonlocal current
+            if current:
+                transactions.append(Transaction(current))
+            current = []
+
+        for operation in self.pending:
+            if operation.isolated:
+                close_current()
+                transactions.append(Transaction([operation]))
+                continue
+
+            if current and current[0].is_module_operation != operation.is_module_operation:
+                close_current()
+            # Installing and removing the same package in one transaction changes the result, so keep the order
+            if current and any(pkg in existing.install for existing in current for pkg in operation.remove):
+                close_current()
+            current.append(operation)
+        close_current()
+
+        return transactions
+
+    def flush(self) -> None:
+        """Execute all pending operations except the final system update"""
+        transactions = self.plan()
+        self.pending = []
+        if transactions:
+            # Repositories could be changed by actions since the last call, so the cache is validated every time
+            metadata.get_metadata_cache(metadata.DNF_BINARY).warm()
+        for transaction in transactions:
+            transaction.execute()
+
+    def commit(self) -> None:
+        self.flush()
+
+        if self.update_requesters:
+            requesters = self.update_requesters
+            self.update_requesters = []
+            log.info(f"Updating the system as requested by: {', '.join(requesters)}")
+            cache = metadata.get_metadata_cache(metadata.DNF_BINARY)
+            cache.warm()
+            try:
+                util.logged_check_call([metadata.DNF_BINARY, "-y"] + cache.cache_only_args() + ["update"])
+            except Exception as e:
+                raise TransactionFailedError(", ".join(requesters), Operation("update", requesters[0]), e)
+
+
+_planner: typing.Optional[TransactionPlanner] = None
+
+
+def get_planner() -> TransactionPlanner:
+    global _planner
+    if _planner is None:
+        _planner = TransactionPlanner()
+    return _planner
@@ -0,0 +1,152 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import queue
+import threading
+import time
+import typing
+
+
+class Job:
+    """A piece of work executed by a WorkerPool.
+
+    Keeps the value returned by the target or the exception it raised,
+    so the caller could handle them in its own thread.
+    """
+    name: str
+    result: typing.Any
+    exception: typing.Optional[BaseException]
+    started_at: typing.Optional[float]
+    finished_at: typing.Optional[float]
+
+    def __init__(self, target: typing.Callable[[], typing.Any], name: str = ""):
+        self.target = target
+        self.name = name
+        self.result = None
+        self.exception = None
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        self.started_at = time.monotonic()
+        try:
+            self.result = self.target()
+        except BaseException as e:
+            self.exception = e
+        finally:
+            self.finished_at = time.monotonic()
+            self._done.set()
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        finished_at = self.finished_at if self.finished_at is not None else time.monotonic()
+        return finished_at - self.started_at
+
+    def wait(self, timeout: typing.Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def wait_deadline(self, deadline: typing.Optional[float], stalled: typing.Optional[typing.Callable[[], bool]] = None) -> bool:
+        """Wait until the job is finished, but no longer than deadline seconds since the job was started.
+        Time spent in the queue is not counted, so a job is never punished for a busy pool. But when
+        the stalled callback reports the queue will not move anymore, the waiting for a job which is not
+        started yet is stopped. Returns True if the job is finished.
+        """
+        if deadline is None:
+            return self.wait()
+
+        while not self.done:
+            if self.started_at is None:
+                if stalled is not None and stalled():
+                    return False
+                self.wait(0.5)
+                continue
+
+            remaining = self.started_at + deadline - time.monotonic()
+            if remaining <= 0:
+                return self.done
+            self.wait(min(remaining, 0.5))
+        return True
+
+    def get(self) -> typing.Any:
+        self.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+class WorkerPool:
+    """Bounded pool of daemon threads.
+
+    We don't use concurrent.futures here because its workers are joined on interpreter exit,
+    so one hung subprocess would prevent the utility from exiting at all.
+    """
+    workers: int
+
+    def __init__(self, workers: int, name: str = "worker"):
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[typing.Optional[Job]]" = queue.Queue()
+        self._running: typing.Dict[int, Job] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(index,), name=f"{name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self, index: int) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._running[index] = job
+            try:
+                job.run()
+            finally:
+                with self._lock:
+                    del self._running[index]
+
+    def is_stalled(self, deadline: float) -> bool:
+        """All workers are busy with jobs running longer than deadline seconds,
+        so queued jobs will not be started in any reasonable time
+        """
+        with self._lock:
+            running = list(self._running.values())
+        return len(running) == self.workers and all(job.duration > deadline for job in running)
+
+    def submit(self, target: typing.Callable[[], typing.Any], name: str = "") -> Job:
+        job = Job(target, name)
+        self._queue.put(job)
+        return job
+
+    def shutdown(self) -> None:
+        # Running jobs are not interrupted, idle workers just stop waiting for new ones
+        for _ in self._threads:
+            self._queue.put(None)
+
+
+def run_concurrently(
+    targets: typing.Iterable[typing.Tuple[str, typing.Callable[[], typing.Any]]],
+    workers: int,
+    name: str = "worker",
+) -> typing.List[Job]:
+    """Run all the targets in a bounded pool and wait for all of them.
+    Jobs are returned in the same order as targets, exceptions are kept inside the jobs.
+    """
+    pool = WorkerPool(workers, name)
+    try:
+        jobs = [pool.submit(target, target_name) for target_name, target in targets]
+        for job in jobs:
+            job.wait()
+        return jobs
+    finally:
+        pool.shutdown()
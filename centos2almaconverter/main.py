@@ -1,13 +1,43 @@
 #!/usr/bin/python3
 # Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
 
+import argparse
 import sys
+import typing
 
 import pleskdistup.main
 import pleskdistup.registry
 
 import centos2almaconverter.upgrader
+from centos2almaconverter import actions as centos2alma_actions
+from centos2almaconverter.common import awstats, deferred, leapp_output, mariadb_dump, mariadb_upgrade, offline_bundle
+
+# The default state directory of the conversion framework for the utility
+DEFAULT_STATE_DIR = "/usr/local/psa/var/centos2alma"
+
+
+def get_state_dir(args: typing.List[str]) -> str:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--state-dir", default=DEFAULT_STATE_DIR)
+    return parser.parse_known_args(args)[0].state_dir
+
 
 if __name__ == "__main__":
+    # Building the offline bundle and deferred tasks are separate modes, which don't involve the conversion framework
+    if len(sys.argv) > 1 and sys.argv[1] == "--build-offline-bundle":
+        sys.exit(offline_bundle.main(sys.argv[2:], centos2alma_actions.LeapInstallation().pkgs_to_install))
+    if len(sys.argv) > 1 and sys.argv[1] == "--restore-mariadb-dump":
+        sys.exit(mariadb_dump.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--recreate-awstats-configs":
+        sys.exit(awstats.main(sys.argv[2:]))
+    # Called by the systemd service after the conversion. Modules with task handlers, like awstats, are imported above
+    if len(sys.argv) > 1 and sys.argv[1] == "--run-deferred-tasks":
+        sys.exit(deferred.main(sys.argv[2:]))
+
     pleskdistup.registry.register_upgrader(centos2almaconverter.upgrader.Centos2AlmaConverterFactory())
-    sys.exit(pleskdistup.main.main())
+    result = pleskdistup.main.main()
+    if "--status" in sys.argv[1:]:
+        leapp_output.print_status(get_state_dir(sys.argv[1:]))
+        mariadb_upgrade.print_status()
+        deferred.print_status()
+    sys.exit(result)
@@ -8,6 +8,8 @@ import typing
 import sys
 
 from centos2almaconverter import actions as centos2alma_actions
+from centos2almaconverter.common import checks as concurrent_checks
+from centos2almaconverter.common import downtime, feedback_archive, gpg_keys, offline_bundle, pg_upgrade, plan, precheck_cache, repositories, scheduler, timings
 from pleskdistup import actions as common_actions
 from pleskdistup.common import action, dist, feedback, files, php, util, version
 from pleskdistup.phase import Phase
@@ -33,17 +35,41 @@ class Centos2AlmaConverter(DistUpgrader):
     _distro_to = dist.AlmaLinux("8")
 
     _pre_reboot_delay = 45
+    # Stages with many independent actions, which could be executed concurrently with --parallel-actions
+    _parallel_stages = ["Prepare configurations", "Handle packages and services"]
 
     def __init__(self):
         super().__init__()
 
         self.upgrade_postgres_allowed = False
+        self.postgres_upgrade_mode = pg_upgrade.MODE_AUTO
+        self.postgres_upgrade_jobs = 4
         self.remove_unknown_perl_modules = False
         self.disable_spamassasin_plugins = False
         self.amavis_upgrade_allowed = False
         self.allow_raid_devices = False
         self.remove_leapp_logs = False
         self.allow_old_script_version = False
+        self.precheck_jobs = 1
+        self.precheck_timeout = None
+        self.check_repositories_availability = False
+        self.packages_metadata_max_age = None
+        self.precheck_cache = False
+        self.offline_bundle = None
+        self.abort_on_leapp_inhibitor = False
+        self.awstats_jobs = 1
+        self.defer_awstats_configs = False
+        self.defer_post_tasks = False
+        self.mariadb_dump_directory = None
+        self.mariadb_dump_jobs = 4
+        self.mariadb_upgrade_jobs = 1
+        self.defer_mariadb_databases_check = False
+        self.plan_output = None
+        self.parallel_actions = 1
+        self.gpg_keys_cache = None
+        self.gpg_keys_cache_ttl = gpg_keys.CACHE_TTL
+        self.minimize_downtime = False
+        self._offline_bundle = None
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(From {self._distro_from}, To {self._distro_to})"
@@ -79,11 +105,11 @@ class Centos2AlmaConverter(DistUpgrader):
         feed: feedback.Feedback,
     ) -> feedback.Feedback:
 
-        feed.collect_actions += [
+        feed.collect_actions += feedback_archive.concurrent_collectors([
             feedback.collect_installed_packages_yum,
             feedback.collect_plesk_version,
             feedback.collect_kernel_modules,
-        ]
+        ])
 
         feed.attached_files += [
             "/etc/fstab",
@@ -102,7 +128,7 @@ class Centos2AlmaConverter(DistUpgrader):
         for grub_directory in ("/etc/grub.d", "/boot/grub", "/boot/grub2"):
             feed.attached_files += files.find_files_case_insensitive(grub_directory, ["*"])
 
-        for repofile in files.find_files_case_insensitive("/etc/yum.repos.d", ["*.repo*"]):
+        for repofile in repositories.get_inventory().find_files(["*.repo*"]):
             feed.attached_files.append(repofile)
 
         for gpgfile in files.find_files_case_insensitive("/etc/leapp/files/vendors.d/rpm-gpg", ["*"]):
@@ -111,7 +137,7 @@ class Centos2AlmaConverter(DistUpgrader):
         for gpgfile in files.find_files_case_insensitive("/etc/leapp/repos.d/system_upgrade/common/files/rpm-gpg", ["*"], recursive=True):
             feed.attached_files.append(gpgfile)
 
-        return feed
+        return feedback_archive.StreamingFeedback.wrap(feed)
 
     def construct_actions(
         self,
@@ -124,29 +150,33 @@ class Centos2AlmaConverter(DistUpgrader):
         actions_map = {
             "Status informing": [
                 common_actions.HandleConversionStatus(options.status_flag_path, options.completion_flag_path),
+                # Post actions are executed in the reverse order, so tasks deferred by the rest of actions are known here
+                centos2alma_actions.StartDeferredTasks(os.path.abspath(sys.argv[0])),
                 common_actions.AddFinishSshLoginMessage(new_os),  # Executed at the finish phase only
                 common_actions.AddInProgressSshLoginMessage(new_os),
             ],
             "Leapp installation": [
-                centos2alma_actions.LeapInstallation(remove_logs_on_finish=self.remove_leapp_logs),
+                centos2alma_actions.LeapInstallation(remove_logs_on_finish=self.remove_leapp_logs, bundle=self._get_offline_bundle(options),
+                                                     defer_cleanup=self.defer_post_tasks),
             ],
             "Prepare finihsing systemd service": [
                 common_actions.AddUpgradeSystemdService(os.path.abspath(sys.argv[0]), options),
             ],
             "Prepare configurations": [
+                # Post actions are executed in the reverse order, so package operations requested
+                # by the rest of actions on the finishing stage are committed here
+                centos2alma_actions.CommitPackageTransactions(),
                 common_actions.RevertChangesInGrub(),
                 centos2alma_actions.PrepareLeappConfigurationBackup(),
                 centos2alma_actions.RemoveOldMigratorThirparty(),
-                centos2alma_actions.FetchKernelCareGPGKey(),
-                centos2alma_actions.FetchPleskGPGKey(),
-                centos2alma_actions.FetchImunifyGPGKey(),
+            ] + self._get_fetch_gpg_keys_actions(options) + [
                 centos2alma_actions.LeapReposConfiguration(),
                 centos2alma_actions.LeapChoicesConfiguration(),
                 centos2alma_actions.FixEpelPythonPackageMappings(),
                 centos2alma_actions.AdoptKolabRepositories(),
                 centos2alma_actions.AdoptSOGo(),
                 centos2alma_actions.AdoptAtomicRepositories(),
-                centos2alma_actions.FixupImunify(),
+                centos2alma_actions.FixupImunify(self._get_local_gpg_keys_cache(options)),
                 common_actions.UpdatePlesk(),
                 centos2alma_actions.PostgresReinstallModernPackage(),
                 centos2alma_actions.FixNamedConfig(),
@@ -155,11 +185,13 @@ class Centos2AlmaConverter(DistUpgrader):
                 common_actions.SetMinDovecotDhParamSize(dhparam_size=2048),
                 common_actions.RestoreDovecotConfiguration(options.state_dir),
                 common_actions.RestoreRoundcubeConfiguration(options.state_dir),
-                centos2alma_actions.RecreateAwstatConfigurationFiles(),
+                centos2alma_actions.RecreateAwstatConfigurationFiles(options.state_dir, jobs=self.awstats_jobs,
+                                                                     defer=self.defer_awstats_configs or self.defer_post_tasks),
                 common_actions.UninstallTuxcareEls(),
                 common_actions.PreserveMariadbConfig(),
                 common_actions.SubstituteSshPermitRootLoginConfigured(),
                 centos2alma_actions.UseSystemResolveForLeappContainer(),
+                centos2alma_actions.CommitLeappConfiguration(),
             ],
             "Handle plesk related services": [
                 common_actions.DisablePleskRelatedServicesDuringUpgrade(),
@@ -167,34 +199,48 @@ class Centos2AlmaConverter(DistUpgrader):
                 common_actions.HandlePleskFirewallService(),
             ],
             "Handle packages and services": [
+                # Packages requested by actions of the stage are installed before Plesk services are enabled
+                centos2alma_actions.CommitPackageTransactions(),
                 centos2alma_actions.FixOsVendorPhpFpmConfiguration(),
                 common_actions.RebundleRubyApplications(),
                 centos2alma_actions.ReinstallPhpmyadminPleskComponents(),
                 centos2alma_actions.ReinstallRoundcubePleskComponents(),
                 centos2alma_actions.ReinstallConflictPackages(options.state_dir),
-                centos2alma_actions.ReinstallPerlCpanModules(options.state_dir),
+                centos2alma_actions.ReinstallPerlCpanModules(options.state_dir, defer_cleanup=self.defer_post_tasks),
                 centos2alma_actions.DisableSuspiciousKernelModules(),
                 common_actions.HandleUpdatedSpamassassinConfig(),
                 common_actions.DisableSelinuxDuringUpgrade(),
                 centos2alma_actions.RestoreMissingNginx(),
                 common_actions.ReinstallAmavisAntivirus(),
                 centos2alma_actions.HandleInternetxRepository(),
+                centos2alma_actions.CommitLeappConfiguration(),
             ],
             "First plesk start": [
                 common_actions.StartPleskBasicServices(),
             ],
+            "Commit package transactions": [
+                # Packages requested by databases update and repositories adoption are installed before Plesk is started
+                centos2alma_actions.CommitPackageTransactions(),
+            ],
             "Remove conflicting packages": [
                 centos2alma_actions.RemovingPleskConflictPackages(),
                 centos2alma_actions.RemovePleskOutdatedPackages(),
             ],
+            "Dump databases": [
+            ],
             "Update databases": [
-                centos2alma_actions.UpdateMariadbDatabase(),
+                centos2alma_actions.UpdateMariadbDatabase(jobs=self.mariadb_upgrade_jobs,
+                                                          defer_user_databases=self.defer_mariadb_databases_check),
                 centos2alma_actions.UpdateModernMariadb(),
                 centos2alma_actions.AddMysqlConnector(),
+                centos2alma_actions.CommitLeappConfiguration(),
             ],
             "Do convert": [
                 centos2alma_actions.AdoptRepositories(),
-                centos2alma_actions.DoCentos2AlmaConvert(leapp_ovl_size=self.leapp_ovl_size),
+                centos2alma_actions.DoCentos2AlmaConvert(leapp_ovl_size=self.leapp_ovl_size,
+                                                         abort_on_inhibitor=self.abort_on_leapp_inhibitor,
+                                                         state_dir=options.state_dir,
+                                                         run_preupgrade=not self.minimize_downtime),
             ],
             # This stage includes actions that need to be completed before the adopt repositories
             # on the final stage. This is necessary because AdoptRepositories performs a `dnf update`,
@@ -228,21 +274,76 @@ class Centos2AlmaConverter(DistUpgrader):
                 ]
             })
 
+        if self.mariadb_dump_directory is not None:
+            actions_map = util.merge_dicts_of_lists(actions_map, {
+                "Dump databases": [
+                    centos2alma_actions.DumpMariadbDatabases(self.mariadb_dump_directory, jobs=self.mariadb_dump_jobs),
+                ]
+            })
+
         if self.upgrade_postgres_allowed:
             actions_map = util.merge_dicts_of_lists(actions_map, {
                 "Prepare configurations": [
-                    centos2alma_actions.PostgresDatabasesUpdate(),
+                    centos2alma_actions.PostgresDatabasesUpdate(mode=self.postgres_upgrade_mode, jobs=self.postgres_upgrade_jobs),
                 ]
             })
 
+        if self.minimize_downtime:
+            actions_map = util.merge_dicts_of_lists(downtime.move_non_disruptive(actions_map), {
+                downtime.NON_DISRUPTIVE_STAGE: [
+                    centos2alma_actions.CommitLeappConfiguration(),
+                    # Inhibitors are found before websites go down. The system is checked before packages are removed
+                    # and leapp configuration is finished, so the result is only advisory: 'leapp upgrade' repeats the checks
+                    centos2alma_actions.DoLeappPreupgrade(leapp_ovl_size=self.leapp_ovl_size,
+                                                          abort_on_inhibitor=self.abort_on_leapp_inhibitor,
+                                                          state_dir=options.state_dir,
+                                                          advisory=True),
+                ]
+            })
+
+        timings.instrument(actions_map, str(phase))
+        downtime.instrument(actions_map, options.state_dir)
+        for stage in self._parallel_stages:
+            actions_map[stage] = scheduler.make_concurrent(actions_map[stage], self.parallel_actions)
+
+        if getattr(options, "show_plan", False):
+            self._show_plan_simulation(actions_map)
         return actions_map
 
+    def _show_plan_simulation(self, actions_map: typing.Dict[str, typing.List[action.ActiveAction]]) -> None:
+        simulation = plan.simulate(actions_map, schedule_stage=scheduler.plan_stage(self.parallel_actions))
+        print(plan.format_text(simulation) + "\n")
+        if self.plan_output is not None:
+            plan.write_json(simulation, self.plan_output)
+
+    def _get_offline_bundle(self, options: typing.Any) -> typing.Optional[offline_bundle.OfflineBundle]:
+        if self.offline_bundle is None:
+            return None
+        if self._offline_bundle is None:
+            self._offline_bundle = offline_bundle.OfflineBundle(self.offline_bundle, os.path.join(options.state_dir, "centos2alma_offline_bundle"))
+        return self._offline_bundle
+
+    def _get_fetch_gpg_keys_actions(self, options: typing.Any) -> typing.List[action.ActiveAction]:
+        bundle = self._get_offline_bundle(options)
+        if bundle is not None:
+            return [centos2alma_actions.FetchGPGKeysFromBundle(bundle, offline_bundle.GPG_KEYS_REPOSITORY_FILES)]
+        return [centos2alma_actions.FetchGPGKeys(offline_bundle.GPG_KEYS_REPOSITORY_FILES, self._get_gpg_keys_cache(options))]
+
+    def _get_gpg_keys_cache(self, options: typing.Any) -> gpg_keys.KeyCache:
+        directory = self.gpg_keys_cache if self.gpg_keys_cache is not None else os.path.join(options.state_dir, gpg_keys.CACHE_DIRECTORY)
+        return gpg_keys.get_cache(directory, self.gpg_keys_cache_ttl)
+
+    def _get_local_gpg_keys_cache(self, options: typing.Any) -> gpg_keys.KeyCache:
+        # Keys extracted from the rpm database belong to this server, so they are never put to a shared cache
+        return gpg_keys.get_cache(os.path.join(options.state_dir, gpg_keys.CACHE_DIRECTORY), self.gpg_keys_cache_ttl)
+
     def get_check_actions(self, options: typing.Any, phase: Phase) -> typing.List[action.CheckAction]:
         if phase is Phase.FINISH:
             return [centos2alma_actions.AssertDistroIsAlmalinux8()]
 
         FIRST_SUPPORTED_BY_ALMA_8_PHP_VERSION = "5.6"
         ALMALINUX8_AMAVIS_REQUIRED_RAM = 1.5 * 1024 * 1024 * 1024
+        network_probes_cache_path = os.path.join(options.state_dir, "centos2alma_network_probes.json")
         checks = [
             common_actions.AssertPleskVersionIsAvailable(),
             common_actions.AssertPleskInstallerNotInProgress(),
@@ -260,9 +361,9 @@ class Centos2AlmaConverter(DistUpgrader):
             centos2alma_actions.AssertIPRepositoryNotPresent(),
             centos2alma_actions.AssertCentosEOLedRepositoriesNotPresent(),
             centos2alma_actions.AssertThereIsNoRepositoryDuplicates(),
-            centos2alma_actions.AssertMariadbRepoAvailable(),
+            centos2alma_actions.AssertMariadbRepoAvailable(network_probes_cache_path),
             common_actions.AssertNotInContainer(),
-            centos2alma_actions.AssertPackagesUpToDate(),
+            centos2alma_actions.AssertPackagesUpToDate(self.packages_metadata_max_age),
             centos2alma_actions.CheckOutdatedLetsencryptExtensionRepository(),
             centos2alma_actions.AssertPleskRepositoriesNotNoneLink(),
             centos2alma_actions.AssertNoAbsoluteLinksInRoot(),
@@ -270,9 +371,9 @@ class Centos2AlmaConverter(DistUpgrader):
             common_actions.AssertNoMoreThenOneKernelDevelInstalled(),
             common_actions.AssertEnoughRamForAmavis(ALMALINUX8_AMAVIS_REQUIRED_RAM, self.amavis_upgrade_allowed),
             common_actions.AssertSshPermitRootLoginConfigured(skip_known_substitudes=True),
-            common_actions.AssertFstabOrderingIsFine(),
-            common_actions.AssertFstabHasDirectRaidDevices(self.allow_raid_devices),
-            common_actions.AssertFstabHasNoDuplicates(),
+            precheck_cache.declare_inputs(common_actions.AssertFstabOrderingIsFine(), [precheck_cache.FileInput("/etc/fstab")]),
+            precheck_cache.declare_inputs(common_actions.AssertFstabHasDirectRaidDevices(self.allow_raid_devices), [precheck_cache.FileInput("/etc/fstab")]),
+            precheck_cache.declare_inputs(common_actions.AssertFstabHasNoDuplicates(), [precheck_cache.FileInput("/etc/fstab")]),
             centos2alma_actions.AssertCentosSignedKernelInstalled(),
             common_actions.AssertPackageAvailable(
                 "dnf",
@@ -289,15 +390,27 @@ class Centos2AlmaConverter(DistUpgrader):
             checks.append(centos2alma_actions.AssertOutdatedPostgresNotInstalled())
         else:
             checks.append(centos2alma_actions.AssertPostgresLocaleMatchesSystemOne())
+            checks.append(centos2alma_actions.AssertSpaceForPostgresUpgrade(self.postgres_upgrade_mode))
         if not self.remove_unknown_perl_modules:
-            checks.append(centos2alma_actions.AssertThereIsNoUnknownPerlCpanModules())
+            checks.append(centos2alma_actions.AssertThereIsNoUnknownPerlCpanModules(options.state_dir))
         if not self.disable_spamassasin_plugins:
             checks.append(common_actions.AssertSpamassassinAdditionalPluginsDisabled())
 
+        if self._get_offline_bundle(options) is not None:
+            checks.append(centos2alma_actions.AssertOfflineBundleIsValid(self._get_offline_bundle(options)))
+
+        if self.check_repositories_availability:
+            checks.append(centos2alma_actions.AssertEnabledRepositoriesAvailable(network_probes_cache_path))
+
         if not self.allow_old_script_version:
             checks.append(common_actions.AssertScriptVersionUpToDate("https://github.com/plesk/centos2alma", "centos2alma", version.DistupgradeToolVersion(get_version())))
 
-        return checks
+        if self.precheck_cache:
+            # Results are dropped on the script update, because checks themselves could be changed
+            checks = precheck_cache.make_cached(checks, os.path.join(options.state_dir, "centos2alma_precheck_cache.json"),
+                                                salt=f"{get_version()}-{get_revision()}")
+
+        return concurrent_checks.make_concurrent(checks, self.precheck_jobs, self.precheck_timeout)
 
     def parse_args(self, args: typing.Sequence[str]) -> None:
         DESC_MESSAGE = f"""Use this script to convert {str(self._distro_from)} server with Plesk to {str(self._distro_to)}. The process consists of the following general stages:
@@ -324,6 +437,12 @@ For assistance, submit an issue here {self.issues_url} and attach the feedback a
         parser.add_argument("--upgrade-postgres", action="store_true", dest="upgrade_postgres_allowed", default=False,
                             help="Upgrade all hosted PostgreSQL databases. To avoid data loss, create backups of all "
                                  "hosted PostgreSQL databases before calling this option.")
+        parser.add_argument("--postgres-upgrade-mode", choices=pg_upgrade.MODES, dest="postgres_upgrade_mode", default=pg_upgrade.MODE_AUTO,
+                            help="How PostgreSQL databases are transferred to the new cluster by pg_upgrade. The 'link' mode uses hard links "
+                                 "instead of copying, so it is fast and requires almost no additional space, but the old cluster can't be "
+                                 "started after the upgrade. By default, the 'link' mode is used when the filesystem supports hard links.")
+        parser.add_argument("--postgres-upgrade-jobs", type=int, dest="postgres_upgrade_jobs", default=4,
+                            help="Number of simultaneous pg_upgrade jobs. Default is 4.")
         parser.add_argument("--remove-unknown-perl-modules", action="store_true", dest="remove_unknown_perl_modules", default=False,
                             help="Allow to remove unknown perl modules installed from cpan. In this case all modules installed "
                                  "by cpan will be removed. Note that it could lead to some issues with perl scripts")
@@ -339,9 +458,64 @@ For assistance, submit an issue here {self.issues_url} and attach the feedback a
                             help="Remove leapp logs after the conversion. By default, the logs are removed after the conversion.")
         parser.add_argument("--allow-old-script-version", action="store_true", dest="allow_old_script_version", default=False,
                             help="Allow to run the script with an old version. By default, the script checks for a new version on GitHub and does not allow to run with an old one.")
+        parser.add_argument("--precheck-jobs", type=int, dest="precheck_jobs", default=1,
+                            help="Run up to the specified number of independent pre-checks simultaneously. "
+                                 "Checks that restart services are always executed alone. By default, checks are executed one by one.")
+        parser.add_argument("--precheck-timeout", type=int, dest="precheck_timeout", default=None,
+                            help="Consider a pre-check failed if it does not finish in the specified number of seconds.")
+        parser.add_argument("--check-repositories-availability", action="store_true", dest="check_repositories_availability", default=False,
+                            help="Check that every enabled repository is accessible before the conversion. Successful checks are cached for an hour.")
+        parser.add_argument("--packages-metadata-max-age", type=int, dest="packages_metadata_max_age", default=None,
+                            help="Reuse package repositories metadata younger than the specified number of seconds when checking "
+                                 "if packages are up to date. By default, the metadata is downloaded again on every check.")
+        parser.add_argument("--precheck-cache", action="store_true", dest="precheck_cache", default=False,
+                            help="Reuse results of previous pre-checks when the files, directories and packages they depend on did not change. "
+                                 "Results taken from the cache are marked as cached.")
+        parser.add_argument("--offline-bundle", type=str, dest="offline_bundle", default=None,
+                            help="Install leapp packages, elevate-release and GPG keys from the bundle in the specified directory or URL "
+                                 "instead of upstream repositories. The bundle is built by 'centos2alma --build-offline-bundle <directory>'.")
+        parser.add_argument("--abort-on-leapp-inhibitor", action="store_true", dest="abort_on_leapp_inhibitor", default=False,
+                            help="Stop leapp preupgrade as soon as the first inhibitor is found instead of waiting for all leapp checks to finish.")
+        parser.add_argument("--awstats-jobs", type=int, dest="awstats_jobs", default=1,
+                            help="Recreate awstats configuration files for the specified number of domains simultaneously on the finishing stage.")
+        parser.add_argument("--defer-awstats-configs", action="store_true", dest="defer_awstats_configs", default=False,
+                            help="Recreate awstats configuration files after the final reboot, when Plesk services are running already, "
+                                 "instead of doing it on the finishing stage.")
+        parser.add_argument("--defer-post-tasks", action="store_true", dest="defer_post_tasks", default=False,
+                            help="Execute slow finishing tasks Plesk does not depend on, like awstats configuration files recreation "
+                                 "and removal of leapp files, in the background after the conversion is finished. "
+                                 "The progress is shown by --status.")
+        parser.add_argument("--dump-mariadb-databases", type=str, dest="mariadb_dump_directory", default=None,
+                            help="Dump all MariaDB databases to the specified directory before the database server is upgraded. "
+                                 "The databases could be restored by 'centos2alma --restore-mariadb-dump <directory>'.")
+        parser.add_argument("--mariadb-dump-jobs", type=int, dest="mariadb_dump_jobs", default=4,
+                            help="Dump the specified number of MariaDB databases simultaneously. Default is 4.")
+        parser.add_argument("--mariadb-upgrade-jobs", type=int, dest="mariadb_upgrade_jobs", default=1,
+                            help="Check and upgrade the specified number of MariaDB databases simultaneously after the conversion. "
+                                 "System tables are always upgraded first.")
+        parser.add_argument("--defer-mariadb-databases-check", action="store_true", dest="defer_mariadb_databases_check", default=False,
+                            help="Check and upgrade MariaDB databases of customers in the background after Plesk is started. "
+                                 "Only system tables and databases of Plesk itself are upgraded before that.")
+        parser.add_argument("--plan-output", type=str, dest="plan_output", default=None,
+                            help="Store the simulated conversion plan shown by --show-plan in the specified file in JSON format. "
+                                 "The file contains durations of phases, stages and actions, the critical path and the expected downtime.")
+        parser.add_argument("--parallel-actions", type=int, dest="parallel_actions", default=1,
+                            help="Execute up to the specified number of actions of the same stage simultaneously. "
+                                 "Only actions that do not use the same resources, like the rpm database or leapp configuration files, "
+                                 "are executed together. By default actions are executed one by one.")
+        parser.add_argument("--gpg-keys-cache", type=str, dest="gpg_keys_cache", default=None,
+                            help="Directory of the GPG keys cache. By default the cache is kept in the state directory. "
+                                 "The directory could be shared between many servers to fetch every key only once.")
+        parser.add_argument("--gpg-keys-cache-ttl", type=int, dest="gpg_keys_cache_ttl", default=gpg_keys.CACHE_TTL,
+                            help="Time in seconds cached GPG keys are used without revalidation. Default is one day.")
+        parser.add_argument("--minimize-downtime", action="store_true", dest="minimize_downtime", default=False,
+                            help="Execute actions that do not affect Plesk services, including the leapp preupgrade check, "
+                                 "before the services are stopped. The measured downtime is reported at the end of the conversion.")
         options = parser.parse_args(args)
 
         self.upgrade_postgres_allowed = options.upgrade_postgres_allowed
+        self.postgres_upgrade_mode = options.postgres_upgrade_mode
+        self.postgres_upgrade_jobs = options.postgres_upgrade_jobs
         self.remove_unknown_perl_modules = options.remove_unknown_perl_modules
         self.disable_spamassasin_plugins = options.disable_spamassasin_plugins
         self.amavis_upgrade_allowed = options.amavis_upgrade_allowed
@@ -349,6 +523,25 @@ For assistance, submit an issue here {self.issues_url} and attach the feedback a
         self.allow_raid_devices = options.allow_raid_devices
         self.remove_leapp_logs = options.remove_leapp_logs
         self.allow_old_script_version = options.allow_old_script_version
+        self.precheck_jobs = options.precheck_jobs
+        self.precheck_timeout = options.precheck_timeout
+        self.check_repositories_availability = options.check_repositories_availability
+        self.packages_metadata_max_age = options.packages_metadata_max_age
+        self.precheck_cache = options.precheck_cache
+        self.offline_bundle = options.offline_bundle
+        self.abort_on_leapp_inhibitor = options.abort_on_leapp_inhibitor
+        self.awstats_jobs = options.awstats_jobs
+        self.defer_awstats_configs = options.defer_awstats_configs
+        self.defer_post_tasks = options.defer_post_tasks
+        self.mariadb_dump_directory = options.mariadb_dump_directory
+        self.mariadb_dump_jobs = options.mariadb_dump_jobs
+        self.mariadb_upgrade_jobs = options.mariadb_upgrade_jobs
+        self.defer_mariadb_databases_check = options.defer_mariadb_databases_check
+        self.plan_output = options.plan_output
+        self.parallel_actions = options.parallel_actions
+        self.gpg_keys_cache = options.gpg_keys_cache
+        self.gpg_keys_cache_ttl = options.gpg_keys_cache_ttl
+        self.minimize_downtime = options.minimize_downtime
 
 
 class Centos2AlmaConverterFactory(DistUpgraderFactory):
@@ -0,0 +1,89 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import threading
+import time
+import unittest
+
+from pleskdistup.common import action
+
+from centos2almaconverter.common import checks
+
+
+class _Check(action.CheckAction):
+    def __init__(self, name, result=True, release=None, exclusive=False):
+        self.name = name
+        self.description = f"{name} failed"
+        self.result = result
+        self.release = release
+        self.exclusive = exclusive
+        self.called = False
+
+    def _do_check(self):
+        self.called = True
+        if self.release is not None:
+            self.release.wait()
+        return self.result
+
+
+class ConcurrentCheckExecutorTests(unittest.TestCase):
+    def setUp(self):
+        # Hung checks are released at the end, so worker threads don't outlive the test
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def _run(self, proxies, timeout=10):
+        results = []
+
+        def run():
+            for proxy in proxies:
+                results.append(proxy.do_check())
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), "checks did not finish")
+        return results
+
+    def test_results(self):
+        proxies = checks.make_concurrent([_Check("first"), _Check("second", result=False), _Check("third")], jobs=2, deadline=5)
+        self.assertEqual(self._run(proxies), [True, False, True])
+        self.assertEqual(proxies[1].description, "second failed")
+
+    def test_hung_check_times_out(self):
+        proxies = checks.make_concurrent([_Check("hung", release=self.release), _Check("trivial")], jobs=2, deadline=0.5)
+        self.assertEqual(self._run(proxies), [False, True])
+        self.assertIn("did not finish in 0.5 seconds", proxies[0].description)
+
+    def test_queued_checks_behind_hung_one(self):
+        queued = [_Check("first"), _Check("second")]
+        proxies = checks.make_concurrent([_Check("hung", release=self.release)] + queued, jobs=1, deadline=0.5)
+        started_at = time.monotonic()
+        self.assertEqual(self._run(proxies), [False, False, False])
+        self.assertLess(time.monotonic() - started_at, 5)
+        self.assertFalse(any(check.called for check in queued))
+        for proxy in proxies[1:]:
+            self.assertIn("was not started", proxy.description)
+            self.assertIn("hung", proxy.description)
+
+    def test_queued_checks_run_by_free_workers(self):
+        queued = [_Check("first"), _Check("second")]
+        proxies = checks.make_concurrent([_Check("hung", release=self.release)] + queued, jobs=2, deadline=0.5)
+        self.assertEqual(self._run(proxies), [False, True, True])
+
+    def test_exclusive_check_skipped_while_hung_check_runs(self):
+        exclusive = _Check("exclusive", exclusive=True)
+        proxies = checks.make_concurrent([_Check("hung", release=self.release), exclusive], jobs=2, deadline=0.5)
+        self.assertEqual(self._run(proxies), [False, False])
+        self.assertFalse(exclusive.called)
+        self.assertIn("hung", proxies[1].description)
+
+    def test_exclusive_check_after_others(self):
+        exclusive = _Check("exclusive", exclusive=True)
+        proxies = checks.make_concurrent([exclusive, _Check("first")], jobs=2, deadline=5)
+        self.assertEqual(self._run(proxies), [True, True])
+        self.assertTrue(exclusive.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
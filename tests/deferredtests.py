@@ -0,0 +1,69 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from centos2almaconverter.common import deferred
+
+
+def _fail(params):
+    raise RuntimeError(f"unable to process {params['name']}")
+
+
+deferred.register_handler("test-fail", _fail)
+deferred.register_handler("test-pass", lambda params: None)
+
+
+class RunDeferredTasksTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.queue_path = os.path.join(self.directory, "deferred_tasks.json")
+        self.addCleanup(unittest.mock.patch.stopall)
+        unittest.mock.patch.object(deferred, "QUEUE_PATH", self.queue_path).start()
+        unittest.mock.patch.object(deferred, "SERVICE_PATH", os.path.join(self.directory, "deferred.service")).start()
+        unittest.mock.patch.object(deferred, "SERVICE_WANTS_PATH", os.path.join(self.directory, "wants", "deferred.service")).start()
+        # The login message is published by the framework, only the calls are checked
+        self.motd = unittest.mock.patch.object(deferred, "motd").start()
+        deferred.install_service("/usr/local/bin/centos2alma")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_all_done(self):
+        deferred.get_queue().add("test-pass", "first task", {"name": "first"})
+        self.assertEqual(deferred.main([]), 0)
+        self.assertEqual([task.state for task in deferred.get_queue().tasks()], [deferred.STATE_DONE])
+        self.motd.add_finish_ssh_login_message.assert_not_called()
+        self.motd.publish_finish_ssh_login_message.assert_not_called()
+        self.assertFalse(os.path.lexists(deferred.SERVICE_PATH))
+
+    def test_failures_published_in_login_message(self):
+        queue = deferred.get_queue()
+        queue.add("test-fail", "broken task", {"name": "broken"})
+        queue.add("test-pass", "working task", {"name": "working"})
+
+        self.assertEqual(deferred.main([]), 1)
+        self.assertEqual([(task.state, task.error) for task in queue.tasks()],
+                         [(deferred.STATE_FAILED, "unable to process broken"), (deferred.STATE_DONE, None)])
+
+        self.motd.add_finish_ssh_login_message.assert_called_once()
+        message = self.motd.add_finish_ssh_login_message.call_args[0][0]
+        self.assertIn("- broken task", message)
+        self.assertNotIn("working task", message)
+        self.motd.publish_finish_ssh_login_message.assert_called_once_with()
+        self.assertGreater(self.motd.method_calls.index(unittest.mock.call.publish_finish_ssh_login_message()),
+                           self.motd.method_calls.index(unittest.mock.call.add_finish_ssh_login_message(message)))
+        self.assertFalse(os.path.lexists(deferred.SERVICE_WANTS_PATH))
+
+    def test_retry_failed(self):
+        deferred.get_queue().add("test-fail", "broken task", {"name": "broken"})
+        self.assertEqual(deferred.main([]), 1)
+        self.assertEqual(deferred.main([]), 0)
+        self.assertEqual(deferred.main(["--retry-failed"]), 1)
+        self.assertEqual(deferred.get_queue().tasks()[0].attempts, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+-- Audit database layout of leapp, res/schema/audit-layout.sql with migrations applied
+CREATE TABLE IF NOT EXISTS execution (
+  id            INTEGER PRIMARY KEY NOT NULL,
+  context       VARCHAR(36)         NOT NULL,
+  kind          VARCHAR(256)        NOT NULL DEFAULT 'help',
+  configuration TEXT                DEFAULT NULL,
+  stamp         TIMESTAMP           NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS host (
+  id        INTEGER PRIMARY KEY NOT NULL,
+  context   VARCHAR(36)         NOT NULL REFERENCES execution (context),
+  hostname  VARCHAR(255)        NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS message_data (
+  hash  VARCHAR(64)  PRIMARY KEY NOT NULL,
+  data  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS data_source (
+  id        INTEGER PRIMARY KEY NOT NULL,
+  context   VARCHAR(36)         NOT NULL REFERENCES execution (context),
+  host_id   INTEGER             NOT NULL REFERENCES host (id),
+  actor     VARCHAR(1024)       NOT NULL DEFAULT '',
+  phase     VARCHAR(1024)       NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS message (
+  id                 INTEGER PRIMARY KEY NOT NULL,
+  context            VARCHAR(36)         NOT NULL REFERENCES execution (context),
+  stamp              TIMESTAMP           NOT NULL,
+  topic              VARCHAR(1024)       NOT NULL,
+  type               VARCHAR(1024)       NOT NULL,
+  data_source_id     INTEGER             NOT NULL REFERENCES data_source (id),
+  message_data_hash  VARCHAR(64)         NOT NULL REFERENCES message_data (hash)
+);
+
+CREATE TABLE IF NOT EXISTS audit (
+  id              INTEGER PRIMARY KEY NOT NULL,
+  event           VARCHAR(256)        NOT NULL REFERENCES message_data (hash),
+  stamp           TIMESTAMP           NOT NULL,
+  context         VARCHAR(36)         NOT NULL REFERENCES execution (context),
+  data_source_id  INTEGER             REFERENCES data_source (id),
+  message_id      INTEGER             REFERENCES message (id),
+  data            TEXT                DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS metadata (
+  hash      VARCHAR(64) PRIMARY KEY NOT NULL,
+  metadata  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS entity (
+  id             INTEGER PRIMARY KEY NOT NULL,
+  context        VARCHAR(36)         NOT NULL REFERENCES execution (context),
+  kind           VARCHAR(256)        NOT NULL DEFAULT '',
+  name           VARCHAR(1024)       NOT NULL DEFAULT '',
+  metadata_hash  VARCHAR(64)         NOT NULL REFERENCES metadata (hash),
+  UNIQUE (context, kind, name)
+);
+
+CREATE VIEW IF NOT EXISTS messages_data AS
+  SELECT
+    message.id           AS id,
+    message.context      AS context,
+    message.stamp        AS stamp,
+    message.topic        AS topic,
+    message.type         AS type,
+    message_data.data    AS message_data,
+    message_data.hash    AS message_hash,
+    data_source.actor    AS actor,
+    data_source.phase    AS phase,
+    host.hostname        AS hostname
+  FROM
+    message
+  JOIN
+    data_source ON data_source.id = message.data_source_id
+  JOIN
+    host ON host.id = data_source.host_id
+  JOIN
+    message_data ON message_data.hash = message.message_data_hash;
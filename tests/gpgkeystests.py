@@ -0,0 +1,76 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from centos2almaconverter.common import gpg_keys
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ARMORED_KEY_PATH = os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test")
+BINARY_KEY_PATH = os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test.gpg")
+TEST_KEY_FINGERPRINT = "7F83053373937C600F1A31B673BF565B2D712078"
+
+
+def _copy_from(source_path):
+    return lambda path: shutil.copyfile(source_path, path)
+
+
+def _store_keys(directory, server, count):
+    # Every server stores its own sources, like servers sharing the cache directory do
+    cache = gpg_keys.KeyCache(directory)
+    for index in range(count):
+        key_path = ARMORED_KEY_PATH if index % 2 else BINARY_KEY_PATH
+        cache.fetch_local(f"rpmdb:{server}-{index}", _copy_from(key_path))
+
+
+class KeyCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _index(self):
+        with open(os.path.join(self.directory, "index.json")) as f:
+            return json.load(f)
+
+    def test_fetch_local(self):
+        cache = gpg_keys.KeyCache(self.directory)
+        path = cache.fetch_local("rpmdb:test", _copy_from(ARMORED_KEY_PATH))
+        with open(path, "rb") as f, open(ARMORED_KEY_PATH, "rb") as expected:
+            self.assertEqual(f.read(), expected.read())
+        self.assertEqual(self._index()["rpmdb:test"]["fingerprints"], [TEST_KEY_FINGERPRINT])
+        self.assertEqual(gpg_keys.KeyCache(self.directory).fetch_local("rpmdb:test", lambda path: self.fail("extracted again")), path)
+
+    def test_not_a_key(self):
+        cache = gpg_keys.KeyCache(self.directory)
+        with self.assertRaises(gpg_keys.KeyVerificationError):
+            cache.fetch_local("rpmdb:broken", _copy_from(os.path.join(FIXTURES_PATH, "leapp-audit-layout.sql")))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_save_merges_index_of_other_processes(self):
+        first = gpg_keys.KeyCache(self.directory)
+        second = gpg_keys.KeyCache(self.directory)
+        first.fetch_local("rpmdb:first", _copy_from(ARMORED_KEY_PATH))
+        second.fetch_local("rpmdb:second", _copy_from(BINARY_KEY_PATH))
+        first.save()
+        self.assertEqual(sorted(self._index()), ["rpmdb:first", "rpmdb:second"])
+
+    def test_concurrent_writers(self):
+        processes = [multiprocessing.Process(target=_store_keys, args=(self.directory, server, 10)) for server in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertEqual(len(self._index()), 40)
+        self.assertEqual(set(os.listdir(os.path.join(self.directory, "objects"))), {entry["digest"] for entry in self._index().values()})
+        self.assertFalse([name for name in os.listdir(self.directory) if name.startswith(".tmp-")])
+
+
+if __name__ == "__main__":
+    unittest.main()
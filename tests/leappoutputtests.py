@@ -0,0 +1,112 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from centos2almaconverter.common import leapp_output
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CONTEXT = "0d9b8f6e-6c2a-4b0e-9a7d-2f1c3e4d5a6b"
+
+
+class LeappDatabaseWatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "leapp.db")
+        with open(os.path.join(FIXTURES_PATH, "leapp-audit-layout.sql")) as f:
+            layout = f.read()
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(layout)
+        self.connection.execute("INSERT INTO execution (context, kind) VALUES (?, 'preupgrade')", (CONTEXT,))
+        self.connection.execute("INSERT INTO host (id, context, hostname) VALUES (1, ?, 'localhost')", (CONTEXT,))
+        self.connection.commit()
+        self.watcher = leapp_output.LeappDatabaseWatcher(self.path)
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory)
+
+    def _store_message(self, actor, model, payload, stamp=None):
+        # The same way leapp stores messages produced by actors
+        if stamp is None:
+            stamp = datetime.datetime.utcnow().isoformat() + "Z"
+        data = json.dumps(payload, sort_keys=True)
+        data_hash = hashlib.sha256(data.encode()).hexdigest()
+        cursor = self.connection.execute("INSERT INTO data_source (context, host_id, actor, phase) VALUES (?, 1, ?, 'Checks')",
+                                         (CONTEXT, actor))
+        self.connection.execute("INSERT OR IGNORE INTO message_data (hash, data) VALUES (?, ?)", (data_hash, data))
+        self.connection.execute(
+            "INSERT INTO message (context, stamp, topic, type, data_source_id, message_data_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            (CONTEXT, stamp, "ReportTopic" if model == "Report" else "SystemInfoTopic", model, cursor.lastrowid, data_hash),
+        )
+        self.connection.commit()
+
+    def _store_report(self, actor, title, groups, stamp=None):
+        report = {"title": title, "summary": f"{title} summary", "groups": groups, "severity": "high"}
+        self._store_message(actor, "Report", {"report": json.dumps(report)}, stamp)
+
+    def test_inhibitor(self):
+        self._store_report("check_os_release", "Unsupported OS", ["inhibitor", "sanity"])
+        inhibitors = self.watcher.poll()
+        self.assertEqual([(inhibitor.title, inhibitor.summary, inhibitor.actor, inhibitor.source) for inhibitor in inhibitors],
+                         [("Unsupported OS", "Unsupported OS summary", "check_os_release", leapp_output.SOURCE_DATABASE)])
+        self.assertTrue(self.watcher.enabled)
+
+    def test_old_flags(self):
+        report = {"title": "Old inhibitor", "summary": "", "flags": ["inhibitor"]}
+        self._store_message("old_actor", "Report", {"report": json.dumps(report)})
+        self.assertEqual([inhibitor.title for inhibitor in self.watcher.poll()], ["Old inhibitor"])
+
+    def test_only_new_inhibitor_reports(self):
+        self._store_report("check_os_release", "Previous run", ["inhibitor"], stamp="2020-01-01T00:00:00.000000Z")
+        self._store_report("check_memory", "Just a warning", ["sanity"])
+        self._store_message("scan_packages", "InstalledRPM", {"items": []})
+        self._store_report("check_os_release", "First", ["inhibitor"])
+        self.assertEqual([inhibitor.title for inhibitor in self.watcher.poll()], ["First"])
+
+        self._store_report("check_kernel", "Second", ["inhibitor"])
+        self.assertEqual([inhibitor.title for inhibitor in self.watcher.poll()], ["Second"])
+        self.assertEqual(self.watcher.poll(), [])
+
+    def test_missing_database(self):
+        watcher = leapp_output.LeappDatabaseWatcher(os.path.join(self.directory, "missing.db"))
+        self.assertEqual(watcher.poll(), [])
+        self.assertTrue(watcher.enabled)
+
+    def test_unknown_layout_disables_watcher(self):
+        self.connection.execute("DROP VIEW messages_data")
+        self.connection.commit()
+        self.assertEqual(self.watcher.poll(), [])
+        self.assertFalse(self.watcher.enabled)
+
+
+class StatusTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, leapp_output.STATE_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_running(self):
+        inhibitors = [leapp_output.Inhibitor("Unsupported OS", "summary", "check_os_release", leapp_output.SOURCE_DATABASE)]
+        leapp_output.save_state(self.path, "running", "Checks", "check_memory", inhibitors)
+        self.assertEqual(leapp_output.format_status(leapp_output.load_state(self.path)),
+                         "Leapp preupgrade: running, phase: Checks, actor: check_memory, inhibitors found: 1\n"
+                         "\tUnsupported OS (check_os_release)")
+
+    def test_finished(self):
+        leapp_output.save_state(self.path, "finished", "Reports", None, [])
+        self.assertEqual(leapp_output.format_status(leapp_output.load_state(self.path)), "Leapp preupgrade: finished")
+
+    def test_missing_state(self):
+        self.assertIsNone(leapp_output.load_state(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
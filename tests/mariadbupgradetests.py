@@ -0,0 +1,65 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from centos2almaconverter.common import mariadb_upgrade
+
+
+class CheckDatabasesTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "mariadb_upgrade.json")
+        self.checked = []
+        self.failing = set()
+
+        def check_database(name, env):
+            self.checked.append(name)
+            if name in self.failing:
+                raise Exception(f"{name} is broken")
+
+        self.addCleanup(unittest.mock.patch.stopall)
+        unittest.mock.patch.object(mariadb_upgrade, "check_database", check_database).start()
+        unittest.mock.patch.object(mariadb_upgrade.mariadb_dump, "client_env", return_value={}).start()
+        unittest.mock.patch.object(mariadb_upgrade.mariadb_dump, "get_database_size", return_value=0).start()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_progress_removed_when_all_done(self):
+        errors = mariadb_upgrade.check_databases(["psa", "db1", "db2"], 2, mariadb_upgrade.Progress(self.path))
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(self.checked), ["db1", "db2", "psa"])
+        self.assertFalse(os.path.exists(self.path))
+
+        # The next conversion checks everything again
+        mariadb_upgrade.check_databases(["psa", "db1", "db2"], 2, mariadb_upgrade.Progress(self.path))
+        self.assertEqual(len(self.checked), 6)
+
+    def test_failed_attempt_continued(self):
+        self.failing = {"db2"}
+        errors = mariadb_upgrade.check_databases(["psa", "db1", "db2"], 1, mariadb_upgrade.Progress(self.path))
+        self.assertEqual(list(errors), ["db2"])
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(mariadb_upgrade.format_status(mariadb_upgrade.Progress(self.path)), "MariaDB databases checked: 2 of 3, failed: 1")
+
+        self.failing = set()
+        self.checked = []
+        self.assertEqual(mariadb_upgrade.check_databases(["psa", "db1", "db2"], 1, mariadb_upgrade.Progress(self.path)), {})
+        self.assertEqual(self.checked, ["db2"])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_progress_kept_for_deferred_databases(self):
+        mariadb_upgrade.Progress(self.path).mark_pending(["db1", "db2"])
+        mariadb_upgrade.check_databases(["psa"], 1, mariadb_upgrade.Progress(self.path))
+        self.assertEqual(mariadb_upgrade.format_status(mariadb_upgrade.Progress(self.path)), "MariaDB databases checked: 1 of 3")
+
+        # The deferred task checks the rest of databases later
+        mariadb_upgrade.check_databases(["db1", "db2"], 2, mariadb_upgrade.Progress(self.path))
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import unittest.mock
+
+from centos2almaconverter.common import metadata
+
+DNF_OUTPUT = """Updating Subscription Management repositories.
+Errors during downloading metadata for repository 'broken':
+  - Curl error (6): Couldn't resolve host name for http://broken.example.com/repodata/repomd.xml [Could not resolve host: broken.example.com]
+Error: Failed to download metadata for repo 'broken': Cannot download repomd.xml: Cannot download repodata/repomd.xml: All mirrors were tried
+Ignoring repositories: broken, other-broken
+Metadata cache created.
+"""
+
+YUM_OUTPUT = """Loaded plugins: fastestmirror
+http://broken.example.com/repodata/repomd.xml: [Errno 14] curl#6 - "Could not resolve host: broken.example.com; Unknown error"
+Trying other mirror.
+failure: repodata/repomd.xml from broken: [Errno 256] No more mirrors to try.
+Cannot retrieve repository metadata (repomd.xml) for repository: other-broken. Please verify its path and try again
+Metadata Cache Created
+"""
+
+# Makes 'makecache' fail for repositories listed in FAILED_REPOSITORIES, the way dnf does
+PACKAGE_MANAGER_SCRIPT = """#!/bin/sh
+echo "$@" >> "$CALLS_LOG"
+enabled=$(echo "$@" | sed -n 's/.*--enablerepo=\\([^ ]*\\).*/\\1/p')
+skip=$(echo "$@" | grep -c 'skip_if_unavailable=1')
+failed=""
+for repo in $(echo "$enabled" | tr ',' ' '); do
+    case " $FAILED_REPOSITORIES " in *" $repo "*) failed="$failed $repo";; esac
+done
+if [ -z "$failed" ]; then
+    echo "Metadata cache created."
+    exit 0
+fi
+for repo in $failed; do
+    echo "Error: Failed to download metadata for repo '$repo': Cannot download repomd.xml"
+done
+[ "$skip" = "1" ] && exit 0
+exit 1
+"""
+
+
+class ParseFailedRepositoriesTests(unittest.TestCase):
+    def test_dnf(self):
+        self.assertEqual(metadata.parse_failed_repositories(DNF_OUTPUT), {"broken", "other-broken"})
+
+    def test_yum(self):
+        self.assertEqual(metadata.parse_failed_repositories(YUM_OUTPUT), {"broken", "other-broken"})
+
+    def test_success(self):
+        self.assertEqual(metadata.parse_failed_repositories("Metadata cache created.\n"), set())
+
+
+class MetadataCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.package_manager = os.path.join(self.directory, "dnf")
+        with open(self.package_manager, "w") as f:
+            f.write(PACKAGE_MANAGER_SCRIPT)
+        os.chmod(self.package_manager, os.stat(self.package_manager).st_mode | stat.S_IXUSR)
+        self.calls_log = os.path.join(self.directory, "calls")
+
+        self.addCleanup(unittest.mock.patch.stopall)
+        unittest.mock.patch.dict(os.environ, {"CALLS_LOG": self.calls_log, "FAILED_REPOSITORIES": ""}).start()
+        self.cache = metadata.MetadataCache(self.package_manager)
+        repositories = {"base": ("http://base", None, None), "appstream": ("http://appstream", None, None),
+                        "broken": ("http://broken", None, None)}
+        unittest.mock.patch.object(self.cache, "_enabled_repositories", return_value=repositories).start()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _calls(self):
+        with open(self.calls_log) as f:
+            return [line.split() for line in f.read().splitlines()]
+
+    def test_single_call(self):
+        self.cache.warm()
+        calls = self._calls()
+        self.assertEqual(len(calls), 1)
+        self.assertIn("--enablerepo=base,appstream,broken", calls[0])
+        self.assertIn("--setopt=*.skip_if_unavailable=1", calls[0])
+        self.assertTrue(self.cache.is_warm())
+        self.assertEqual(self.cache.cache_only_args(), ["-C"])
+
+        self.cache.warm()
+        self.assertEqual(len(self._calls()), 1)
+
+    def test_failed_repository_retried_alone(self):
+        os.environ["FAILED_REPOSITORIES"] = "broken"
+        self.cache.warm()
+        calls = self._calls()
+        self.assertEqual(len(calls), 2)
+        self.assertIn("--enablerepo=broken", calls[1])
+        self.assertNotIn("--setopt=*.skip_if_unavailable=1", calls[1])
+        self.assertEqual(self.cache.failed_repositories, {"broken"})
+        self.assertFalse(self.cache.is_warm())
+
+        # Only the failed repository is refreshed by the next warm up
+        os.environ["FAILED_REPOSITORIES"] = ""
+        self.cache.warm()
+        self.assertIn("--enablerepo=broken", self._calls()[2])
+        self.assertTrue(self.cache.is_warm())
+
+    def test_max_age(self):
+        self.cache.warm(max_age=3600, refresh=True)
+        self.assertIn("--setopt=*.metadata_expire=3600", self._calls()[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
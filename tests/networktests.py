@@ -0,0 +1,179 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import http.server
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+
+from centos2almaconverter.common import network
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive is only supported by HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == "/missing":
+            self._reply(404, b"not found")
+        elif self.path == "/big":
+            # No Content-Length, so the probe must stop reading by itself
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(b"x" * (network._PROBE_BODY_LIMIT + 1024))
+        else:
+            self._reply(200, b"content of " + self.path.encode())
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests = []
+        self.connections = 0
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+
+class HttpClientTests(unittest.TestCase):
+    def setUp(self):
+        # Requests must go to the local server directly, even if the environment has a proxy
+        self.environ = unittest.mock.patch.dict(os.environ, {}, clear=True)
+        self.environ.start()
+        self.server = _Server()
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = network.HttpClient(connect_timeout=5, read_timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.environ.stop()
+
+    def test_get(self):
+        response = self.client.get(self.base_url + "/file?name=value")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.ok)
+        self.assertEqual(response.body, b"content of /file?name=value")
+        self.assertEqual(response.headers["Content-Length"], str(len(response.body)))
+
+    def test_not_found(self):
+        response = self.client.get(self.base_url + "/missing")
+        self.assertEqual(response.status, 404)
+        self.assertFalse(response.ok)
+
+    def test_connection_reused(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.base_url + "/file").status, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_unsupported_scheme(self):
+        with self.assertRaises(ValueError):
+            self.client.get("ftp://127.0.0.1/file")
+
+    def test_probe_many(self):
+        urls = [self.base_url + "/first", self.base_url + "/missing", self.base_url + "/first", self.base_url + "/big"]
+        results = self.client.probe_many(urls)
+        self.assertEqual(list(results), [self.base_url + "/first", self.base_url + "/missing", self.base_url + "/big"])
+        self.assertTrue(results[self.base_url + "/first"].ok)
+        self.assertFalse(results[self.base_url + "/missing"].ok)
+        self.assertEqual(results[self.base_url + "/missing"].status, 404)
+        self.assertTrue(results[self.base_url + "/big"].ok)
+        self.assertEqual(self.server.requests.count("/first"), 1)
+
+    def test_probe_connection_refused(self):
+        self.server.shutdown()
+        self.server.server_close()
+        result = self.client.probe(self.base_url + "/first")
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.status)
+        self.assertIsNotNone(result.error)
+
+
+class ProbeCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.environ = unittest.mock.patch.dict(os.environ, {}, clear=True)
+        self.environ.start()
+        self.server = _Server()
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.directory, "state", "probes.json")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+        self.environ.stop()
+
+    def _probe(self, urls, ttl=network.DEFAULT_CACHE_TTL):
+        client = network.HttpClient(connect_timeout=5, read_timeout=5, cache_path=self.cache_path, cache_ttl=ttl)
+        try:
+            return client.probe_many(urls)
+        finally:
+            client.close()
+
+    def test_successful_probes_cached_between_runs(self):
+        urls = [self.base_url + "/first", self.base_url + "/missing"]
+        results = self._probe(urls)
+        self.assertFalse(results[self.base_url + "/first"].cached)
+
+        results = self._probe(urls)
+        self.assertTrue(results[self.base_url + "/first"].cached)
+        self.assertEqual(results[self.base_url + "/first"].status, 200)
+        self.assertFalse(results[self.base_url + "/missing"].cached)
+        self.assertEqual(sorted(self.server.requests), ["/first", "/missing", "/missing"])
+
+        with open(self.cache_path) as f:
+            self.assertEqual(list(json.load(f)), [self.base_url + "/first"])
+
+    def test_expired_entries(self):
+        cache = network.ProbeCache(self.cache_path, ttl=10)
+        cache.put(network.ProbeResult(self.base_url + "/first", True, status=200))
+        with unittest.mock.patch("time.time", return_value=time.time() + 20):
+            self.assertIsNone(cache.get(self.base_url + "/first"))
+            cache.save()
+        with open(self.cache_path) as f:
+            self.assertEqual(json.load(f), {})
+
+    def test_failed_probe_drops_entry(self):
+        cache = network.ProbeCache(self.cache_path)
+        cache.put(network.ProbeResult(self.base_url + "/first", True, status=200))
+        cache.put(network.ProbeResult(self.base_url + "/first", False, error="Connection refused"))
+        self.assertIsNone(cache.get(self.base_url + "/first"))
+
+    def test_broken_cache_file(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, "w") as f:
+            f.write("{broken")
+        cache = network.ProbeCache(self.cache_path)
+        self.assertIsNone(cache.get(self.base_url + "/first"))
+        cache.put(network.ProbeResult(self.base_url + "/first", True, status=200))
+        cache.save()
+        self.assertIsNotNone(network.ProbeCache(self.cache_path).get(self.base_url + "/first"))
+
+
+if __name__ == "__main__":
+    unittest.main()
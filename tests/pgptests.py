@@ -0,0 +1,133 @@
+# Copyright 1999 - 2026. Plesk International GmbH. All rights reserved.
+import hashlib
+import os
+import struct
+import unittest
+
+from centos2almaconverter.common import pgp
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The key was generated by gpg, the values are taken from 'gpg --list-keys --with-colons'
+TEST_KEY_FINGERPRINT = "7F83053373937C600F1A31B673BF565B2D712078"
+TEST_SUBKEY_FINGERPRINT = "F76CD08DEF67645A03946E2F3F191FD542859701"
+
+# 'gpg --detach-sign' made by the test key: the issuer is set by both the hashed issuer fingerprint
+# and the unhashed issuer subpackets, that is how rpm 4.14+ shows SIGPGP and RSAHEADER tags
+GPG_SIGNATURE = (
+    "88b30400010a001d1621047f83053373937c600f1a31b673bf565b2d71207805026ad2dfc8000a091073bf565b2d71207857340400"
+    "b6ea8fe17b43d6b786a67589f99be3ea39165fc8831bcc2994559b7fb4273785cd1ca3e075d483a41ee06f781f451829b04ed50641"
+    "dba6d379356bf8910f724c435a46171e19e883dc1d57d29d55f14d10f8ef113b1b4a7242b0c6aeb11a05a9a50cb1bd9d16f2c7c3bd"
+    "3135150abf5b0229df73e17eb73b7b5589b764bcc8ab"
+)
+
+# Old rpm signs packages by v3 signatures
+V3_SIGNATURE = (
+    "8900350305005a9f5e0c24c6a8a7f4a80eb50108a1b30100e0d2747b9ab7abb6eb65e0373fa1b428a28bd6d8a2380106dcc080f580"
+    "05ee14"
+)
+
+# The issuer is set only in the unhashed area, like in RSAHEADER of packages signed by old tools
+V4_UNHASHED_ISSUER_SIGNATURE = (
+    "89003c04000108000605025a9f5e0c000a091024c6a8a7f4a80eb5abcd01008e38a1ea5c681c8e9a08f1af465f1f07d33d931de8f7"
+    "1af45ecbe957751c9a86"
+)
+
+
+def _mpi(value: bytes) -> bytes:
+    return struct.pack(">H", len(value) * 8 - (8 - value[0].bit_length())) + value
+
+
+def _make_v3_key() -> bytes:
+    modulus = hashlib.sha512(b"modulus").digest()
+    body = bytes([3]) + struct.pack(">IHB", 1262304000, 0, 1) + _mpi(modulus) + _mpi(b"\x01\x00\x01")
+    return bytes([0x99]) + struct.pack(">H", len(body)) + body
+
+
+class PublicKeysTests(unittest.TestCase):
+    def test_armored_key(self):
+        keys = pgp.read_public_keys(os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test"))
+        self.assertEqual([key.fingerprint for key in keys], [TEST_KEY_FINGERPRINT, TEST_SUBKEY_FINGERPRINT])
+        self.assertEqual([key.is_subkey for key in keys], [False, True])
+        self.assertEqual([key.version for key in keys], [4, 4])
+        self.assertEqual(keys[0].key_id, "73bf565b2d712078")
+        self.assertEqual(keys[1].key_id, "3f191fd542859701")
+
+    def test_binary_key(self):
+        keys = pgp.read_public_keys(os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test.gpg"))
+        self.assertEqual([key.fingerprint for key in keys], [TEST_KEY_FINGERPRINT, TEST_SUBKEY_FINGERPRINT])
+
+    def test_armored_and_binary_keys_are_the_same(self):
+        with open(os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test"), "rb") as f:
+            armored = f.read()
+        with open(os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test.gpg"), "rb") as f:
+            binary = f.read()
+        self.assertEqual(pgp.dearmor(armored), binary)
+        self.assertEqual(pgp.dearmor(binary), binary)
+
+    def test_several_armored_blocks(self):
+        with open(os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test"), "rb") as f:
+            armored = f.read()
+        keys = pgp.parse_public_keys(armored + b"\n" + armored)
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(keys[2].fingerprint, TEST_KEY_FINGERPRINT)
+
+    def test_v3_key(self):
+        keys = pgp.parse_public_keys(_make_v3_key())
+        self.assertEqual(len(keys), 1)
+        modulus = hashlib.sha512(b"modulus").digest()
+        self.assertEqual(keys[0].version, 3)
+        self.assertEqual(keys[0].created, 1262304000)
+        self.assertEqual(keys[0].key_id, modulus[-8:].hex())
+        self.assertEqual(keys[0].fingerprint, hashlib.md5(modulus + b"\x01\x00\x01").hexdigest().upper())
+
+    def test_unsupported_key_version(self):
+        with self.assertRaises(pgp.PgpError):
+            pgp.parse_public_keys(bytes([0x99, 0x00, 0x05, 7, 0, 0, 0, 0]))
+
+    def test_garbage(self):
+        with self.assertRaises(pgp.PgpError):
+            pgp.parse_public_keys(b"not a key at all")
+
+    def test_truncated_key(self):
+        with open(os.path.join(FIXTURES_PATH, "RPM-GPG-KEY-test.gpg"), "rb") as f:
+            binary = f.read()
+        with self.assertRaises(pgp.PgpError):
+            pgp.parse_public_keys(binary[:100])
+
+    def test_broken_armor(self):
+        with self.assertRaises(pgp.PgpError):
+            pgp.parse_public_keys(b"-----BEGIN PGP PUBLIC KEY BLOCK-----\n\n!!!!\n-----END PGP PUBLIC KEY BLOCK-----\n")
+
+
+class SignatureTests(unittest.TestCase):
+    def test_gpg_signature(self):
+        signature = pgp.parse_signature(bytes.fromhex(GPG_SIGNATURE))
+        self.assertEqual(signature.version, 4)
+        self.assertEqual(signature.signature_type, 0)
+        self.assertEqual(signature.key_id, "73bf565b2d712078")
+
+    def test_v3_signature(self):
+        signature = pgp.parse_signature(bytes.fromhex(V3_SIGNATURE))
+        self.assertEqual(signature.version, 3)
+        self.assertEqual(signature.key_id, "24c6a8a7f4a80eb5")
+
+    def test_unhashed_issuer(self):
+        self.assertEqual(pgp.get_signature_key_id(bytes.fromhex(V4_UNHASHED_ISSUER_SIGNATURE)), "24c6a8a7f4a80eb5")
+
+    def test_signature_without_issuer(self):
+        body = bytes([4, 0, 1, 8]) + struct.pack(">H", 6) + bytes([5, 2]) + struct.pack(">I", 1) + struct.pack(">H", 0) + b"\xab\xcd"
+        signature = bytes([0x88, len(body)]) + body
+        self.assertIsNone(pgp.get_signature_key_id(signature))
+
+    def test_no_signature_packet(self):
+        with self.assertRaises(pgp.PgpError):
+            pgp.parse_signature(_make_v3_key())
+
+    def test_truncated_signature(self):
+        with self.assertRaises(pgp.PgpError):
+            pgp.get_signature_key_id(bytes.fromhex(GPG_SIGNATURE)[:20])
+
+
+if __name__ == "__main__":
+    unittest.main()